@@ -0,0 +1,108 @@
+"""Compares the performance of each neighbour search backend used in
+micelle clustering across a range of system sizes. Molecular
+positions are randomly distributed in a cubic periodic cell at a fixed
+number density, so that the cell dimensions grow with the number of
+molecules as they would in `SurfactantSimulationBuilder`.
+
+Run from the repository root with:
+
+    python benchmarks/neighbour_backends.py
+"""
+import argparse
+import time
+
+import numpy as np
+from scipy.sparse import spmatrix
+
+from surfactant_example.micelle.neighbours import (
+    NEIGHBOUR_BACKENDS, neighbour_adjacency
+)
+
+#: Default numbers of molecules to benchmark
+DEFAULT_SIZES = [500, 1000, 2000, 5000, 10000, 20000, 50000]
+
+
+def random_system(n_molecules, density, seed=0):
+    """Generates random coordinates for n_molecules in a cubic
+    periodic cell with a number density in molecules nm-3"""
+
+    random = np.random.RandomState(seed)
+    cell_dim = np.full(3, (n_molecules / density) ** (1 / 3))
+    coord = random.uniform(0, 1, size=(n_molecules, 3)) * cell_dim
+
+    return coord, cell_dim
+
+
+def time_backend(coord, cell_dim, r_thresh, backend, repeat=3):
+    """Returns the fastest wall time in seconds taken to build the
+    adjacency matrix for coord using backend, as well as the number
+    of neighbouring pairs found"""
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        adjacency_matrix = neighbour_adjacency(
+            coord, cell_dim, r_thresh, backend=backend)
+        timings.append(time.perf_counter() - start)
+
+    if isinstance(adjacency_matrix, spmatrix):
+        n_pairs = adjacency_matrix.nnz // 2
+    else:
+        n_pairs = np.count_nonzero(adjacency_matrix) // 2
+
+    return min(timings), n_pairs
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+        help='Numbers of molecules to benchmark')
+    parser.add_argument(
+        '--backends', nargs='+', default=NEIGHBOUR_BACKENDS,
+        choices=NEIGHBOUR_BACKENDS,
+        help='Neighbour search backends to benchmark')
+    parser.add_argument(
+        '--density', type=float, default=0.5,
+        help='Number density of molecules in nm-3')
+    parser.add_argument(
+        '--r-thresh', type=float, default=1.25,
+        help='Upper threshold on clustering radial distance in nm')
+    parser.add_argument(
+        '--max-dense', type=int, default=10000,
+        help='Largest number of molecules to benchmark with the dense '
+             'backend, which requires O(N^2) memory')
+    parser.add_argument(
+        '--repeat', type=int, default=3,
+        help='Number of repeats for each timing')
+    args = parser.parse_args(argv)
+
+    header = f"{'N':>8} " + ' '.join(
+        f"{backend + ' (s)':>14}" for backend in args.backends)
+    print(header)
+    print('-' * len(header))
+
+    for n_molecules in args.sizes:
+        coord, cell_dim = random_system(n_molecules, args.density)
+
+        row = f"{n_molecules:>8} "
+        n_pairs = set()
+        for backend in args.backends:
+            if backend == 'dense' and n_molecules > args.max_dense:
+                row += f"{'-':>14} "
+                continue
+            timing, pairs = time_backend(
+                coord, cell_dim, args.r_thresh, backend,
+                repeat=args.repeat)
+            n_pairs.add(pairs)
+            row += f"{timing:>14.4f} "
+
+        # All backends are expected to identify identical neighbours
+        if len(n_pairs) > 1:
+            row += ' (pair counts differ between backends)'
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
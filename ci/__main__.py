@@ -8,8 +8,7 @@ PYTHON_VERSIONS = ["3.6"]
 
 ADDITIONAL_CORE_DEPS = [
     "numpy>=1.13.0",
-    "scipy>=1.2.1",
-    "networkx==2.4-1"
+    "scipy>=1.2.1"
 ]
 
 
@@ -1,8 +1,8 @@
 from traits.api import (
-    Unicode, Property, Instance, cached_property)
+    Either, Unicode, Property, Instance, cached_property)
 from traitsui.api import View, Item, InstanceEditor, Group
 
-from surfactant_example.ingredient import Ingredient
+from surfactant_example.ingredient import Ingredient, IngredientProxy
 from surfactant_example.utilities import process_variable_name
 
 from .base_template import BaseTemplate
@@ -16,8 +16,9 @@ class IngredientTemplate(BaseTemplate):
     #  Required Attributes
     # --------------------
 
-    #: Simulation experiment Ingredient
-    ingredient = Instance(Ingredient)
+    #: Simulation experiment Ingredient, or a proxy that loads it
+    #: on demand
+    ingredient = Either(Instance(Ingredient), Instance(IngredientProxy))
 
     # ------------------
     #     Properties
@@ -1,5 +1,11 @@
+import numpy as np
+
 from force_bdss.api import BaseDataSource, DataValue, Slot
 
+from .cost_surface import (
+    concentration_grid, cost_surface, prune_cost_surface
+)
+
 
 class CostDataSource(BaseDataSource):
     """Class that calculates cost of fragment materials
@@ -11,7 +17,9 @@ class CostDataSource(BaseDataSource):
 
         total_cost = formulation.price
 
-        pass_mark = (total_cost < model.threshold)
+        # Formulation batches pass only if every point is below
+        # the threshold
+        pass_mark = bool(np.all(total_cost < model.threshold))
 
         model.notify_pass_mark(pass_mark)
 
@@ -19,6 +27,42 @@ class CostDataSource(BaseDataSource):
                 DataValue(type="COST", value=total_cost)
             ]
 
+    def cost_surface(self, model, ingredients, sample_values):
+        """Calculates the cost of every point in a grid of
+        concentration parameters in a single vectorised pass, and
+        identifies those that pass the model threshold. This allows
+        failing points to be pruned before any simulations are run.
+
+        Parameters
+        ----------
+        model: CostDataSourceModel
+            Model containing the cost threshold
+        ingredients: list of Ingredient
+            Ingredients of each formulation, with the solvent last
+        sample_values: list of array_like
+            Sample values of the concentration parameter of each
+            non-solvent Ingredient
+
+        Returns
+        -------
+        grid: numpy.array, shape=(n_points, n_ingredients - 1)
+            Concentrations of each non-solvent Ingredient at each point
+        costs: numpy.array of float
+            Cost of formulation at each point
+        gradient: numpy.array of float
+            Derivative of cost with respect to each concentration
+        passing: numpy.array of bool
+            Whether each point passes the cost threshold
+        """
+
+        prices = [ingredient.price for ingredient in ingredients]
+        grid = concentration_grid(sample_values)
+
+        costs, gradient = cost_surface(prices, grid)
+        passing = prune_cost_surface(costs, grid, model.threshold)
+
+        return grid, costs, gradient, passing
+
     def slots(self, model):
         return (
             (
@@ -0,0 +1,85 @@
+import numpy as np
+
+
+def concentration_grid(sample_values):
+    """Returns every combination of concentration sample values as a
+    2D array, in the same order as `itertools.product`
+
+    Parameters
+    ----------
+    sample_values: list of array_like
+        Sample values of each concentration parameter
+
+    Returns
+    -------
+    grid: numpy.array, shape=(n_points, n_parameters)
+        Concentrations of each parameter (columns) at each grid
+        point (rows)
+    """
+
+    if not sample_values:
+        return np.zeros((1, 0))
+
+    meshes = np.meshgrid(
+        *[np.asarray(values, dtype=float) for values in sample_values],
+        indexing='ij')
+
+    return np.stack(meshes, axis=-1).reshape(-1, len(sample_values))
+
+
+def cost_surface(prices, concentrations):
+    """Calculates the price of many formulations, where the final
+    ingredient is a solvent present in excess. Since concentrations
+    by mass % sum to 100, the price is linear in the concentration of
+    each non-solvent ingredient and can be evaluated analytically.
+
+    Parameters
+    ----------
+    prices: array_like of float
+        Price in $USD / kg of each ingredient, with the solvent last
+    concentrations: array_like of float, shape=(n_points, n_prices - 1)
+        Concentrations by mass % of each non-solvent ingredient at
+        each point
+
+    Returns
+    -------
+    costs: numpy.array of float
+        Price of formulation in $USD / kg at each point
+    gradient: numpy.array of float
+        Derivative of price with respect to the concentration of each
+        non-solvent ingredient, which is the same at every point
+    """
+
+    prices = np.asarray(prices, dtype=float)
+
+    # Each ingredient displaces an equal mass of solvent
+    gradient = (prices[:-1] - prices[-1]) / 100
+    costs = prices[-1] + np.asarray(concentrations, dtype=float) @ gradient
+
+    return costs, gradient
+
+
+def prune_cost_surface(costs, concentrations, threshold):
+    """Returns a mask selecting points with a cost below threshold,
+    which also leave a valid concentration of solvent
+
+    Parameters
+    ----------
+    costs: array_like of float
+        Price of formulation at each point
+    concentrations: array_like of float, shape=(n_points, n_ingredients)
+        Concentrations by mass % of each non-solvent ingredient at
+        each point
+    threshold: float
+        Upper threshold for cost of formulation in $USD
+
+    Returns
+    -------
+    passing: numpy.array of bool
+        Whether each point should proceed to further evaluation
+    """
+
+    solvent_conc = 100 - np.sum(concentrations, axis=-1)
+    valid = (0 < solvent_conc) & (solvent_conc < 100)
+
+    return valid & (np.asarray(costs) < threshold)
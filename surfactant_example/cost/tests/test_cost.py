@@ -48,6 +48,20 @@ class TestCostDataSource(TestCase, UnittestTools):
 
         self.assertAlmostEqual(128.422499999, res[0].value)
 
+    def test_cost_surface(self):
+
+        self.model.threshold = 20
+
+        grid, costs, gradient, passing = self.data_source.cost_surface(
+            self.model, self.formulation.ingredients,
+            [[4, 12], [4], [0.5]])
+
+        self.assertListEqual(
+            [[4, 4, 0.5], [12, 4, 0.5]], grid.tolist())
+        self.assertAlmostEqual(20.4225, costs[1])
+        self.assertEqual(3, len(gradient))
+        self.assertListEqual([True, False], passing.tolist())
+
     def test_notify_pass_mark(self):
         pass_mark = True
 
@@ -0,0 +1,54 @@
+from itertools import product
+from unittest import TestCase
+
+import numpy as np
+
+from surfactant_example.cost.cost_surface import (
+    concentration_grid, cost_surface, prune_cost_surface
+)
+
+
+class TestCostSurface(TestCase):
+
+    def setUp(self):
+        self.prices = [100, 200, 1, 0.5]
+        self.sample_values = [[4, 12], [0, 4, 8], [0.5]]
+
+    def test_concentration_grid(self):
+
+        grid = concentration_grid(self.sample_values)
+
+        self.assertEqual((6, 3), grid.shape)
+        self.assertListEqual(
+            [list(point) for point in product(*self.sample_values)],
+            grid.tolist())
+
+        self.assertEqual((1, 0), concentration_grid([]).shape)
+
+    def test_cost_surface(self):
+
+        grid = concentration_grid([[12], [4], [0.5]])
+        costs, gradient = cost_surface(self.prices, grid)
+
+        self.assertAlmostEqual(20.4225, costs[0])
+        np.testing.assert_allclose(
+            [0.995, 1.995, 0.005], gradient)
+
+        # Gradient is consistent with finite differences
+        grid = concentration_grid(self.sample_values)
+        costs, gradient = cost_surface(self.prices, grid)
+        shifted, _ = cost_surface(self.prices, grid + [1, 0, 0])
+        np.testing.assert_allclose(gradient[0], shifted - costs)
+
+    def test_prune_cost_surface(self):
+
+        grid = np.array([[12, 4, 0.5],
+                         [4, 0, 0.5],
+                         [60, 40, 0.5]])
+        costs, _ = cost_surface(self.prices, grid)
+
+        passing = prune_cost_surface(costs, grid, 20)
+        self.assertListEqual([False, True, False], passing.tolist())
+
+        passing = prune_cost_surface(costs, grid, 1000)
+        self.assertListEqual([True, True, False], passing.tolist())
@@ -22,6 +22,13 @@ class DatabaseDataSource(BaseDataSource):
                 DataValue(type="INGREDIENT", value=ingredient)
             ]
 
+    def prefetch_ingredients(self, names, n_workers=None):
+        """Load a collection of Ingredients up front, so that all of
+        their topology files are parsed concurrently before the first
+        evaluation, rather than one Ingredient at a time"""
+        return self._gromacs_database.get_ingredients(
+            names, n_workers=n_workers)
+
     def slots(self, model):
 
         input_slots = tuple()
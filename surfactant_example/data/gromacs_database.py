@@ -1,15 +1,29 @@
 import json
+import logging
+import os
+from functools import partial
+from types import MappingProxyType
+
+from traits.api import (
+    HasStrictTraits, Dict, Instance, Property, Tuple, Unicode,
+    cached_property
+)
 
-from traits.api import HasStrictTraits, Dict, Property, Unicode
-
-from force_gromacs.api import GromacsMoleculeReader
-from force_gromacs.data_sources.fragment.fragment_data_source import (
+from force_gromacs.data_sources.fragment.fragment_data_source import (  # noqa
     MissingFragmentException
 )
 
 from surfactant_example.ingredient.ingredient import Ingredient
+from surfactant_example.ingredient.ingredient_proxy import IngredientProxy
 
 from .gromacs_files.path import get_file
+from .ingredient_store import (
+    IngredientStore, StaleIngredientStoreException,
+    compile_ingredient_store
+)
+from .topology_cache import TopologyCache, TOPOLOGY_CACHE
+
+log = logging.getLogger(__name__)
 
 
 class GromacsDatabase(HasStrictTraits):
@@ -19,21 +33,103 @@ class GromacsDatabase(HasStrictTraits):
     #: File path for JSON containing database of Gromacs objects
     file_path = Unicode()
 
-    #: Reader for Gromacs .itp molecule files
-    _reader = GromacsMoleculeReader()
+    #: File path for an optional compiled ingredient store. If
+    #: provided, Ingredients are loaded from the store on demand
+    #: instead of the JSON database. A store compiled from file_path
+    #: is recompiled if it is out of date.
+    store_path = Unicode()
+
+    #: Compiled ingredient store, if store_path is provided
+    _store = Property(
+        Instance(IngredientStore), depends_on='store_path')
 
-    #: Cache for storing loaded fragments
-    _fragment_cache = Dict()
+    #: Cache of fragments parsed from Gromacs .itp molecule files,
+    #: shared between all instances by default
+    _topology_cache = Instance(TopologyCache)
 
-    #: Parsed data from JSON database
+    #: Parsed data from JSON database, indexed by Ingredient name
     _data = Property(Dict, depends_on='file_path')
 
+    #: Ingredient names in JSON database, indexed by role
+    _roles = Property(Dict, depends_on='file_path')
+
+    #: Read-only index of parsed JSON database, containing both
+    #: _data and _roles
+    _index = Tuple()
+
+    #: File path and modification time of JSON database when _index
+    #: was last parsed
+    _index_key = Tuple()
+
     def _file_path_default(self):
         return get_file("chemical_database.json")
 
+    def __topology_cache_default(self):
+        return TOPOLOGY_CACHE
+
+    @cached_property
+    def _get__store(self):
+        if not self.store_path:
+            return None
+
+        try:
+            return IngredientStore(file_path=self.store_path)
+        except StaleIngredientStoreException as error:
+            # Only stores compiled from this database can be rebuilt
+            if error.source != os.path.abspath(self.file_path):
+                raise
+            log.warning(f"{error}, recompiling")
+
+        compile_ingredient_store(self, self.store_path)
+        return IngredientStore(file_path=self.store_path)
+
     def _get__data(self):
         """Update _data attribute if new file path defined"""
-        return self._load_data(self.file_path)
+        return self._load_index()[0]
+
+    def _get__roles(self):
+        """Update _roles attribute if new file path defined"""
+        return self._load_index()[1]
+
+    def _load_index(self):
+        """Parse the JSON database once, only reloading it if either
+        file_path or the file modification time has changed"""
+
+        index_key = (
+            self.file_path, os.stat(self.file_path).st_mtime_ns)
+
+        if index_key != self._index_key:
+            self._index = self._build_index(
+                self._load_data(self.file_path))
+            self._index_key = index_key
+
+        return self._index
+
+    def _build_index(self, data):
+        """Build read-only views of the chemical Ingredient data,
+        indexed by name and role. Fragment file paths are resolved
+        once, when the index is built."""
+
+        ingredients = {}
+        roles = {}
+
+        for name, ingredient_data in data.items():
+            ingredient_data = dict(ingredient_data)
+            fragment_data = [
+                dict(fragment)
+                for fragment in ingredient_data.get("fragments", [])
+            ]
+            self._parse_fragment_data(fragment_data)
+            ingredient_data["fragments"] = tuple(
+                MappingProxyType(fragment) for fragment in fragment_data
+            )
+
+            ingredients[name] = MappingProxyType(ingredient_data)
+            roles.setdefault(ingredient_data["role"], []).append(name)
+
+        roles = {role: tuple(names) for role, names in roles.items()}
+
+        return MappingProxyType(ingredients), MappingProxyType(roles)
 
     def _load_data(self, file_path):
         """Load JSON file containing chemical Ingredient data"""
@@ -73,36 +169,31 @@ class GromacsDatabase(HasStrictTraits):
         matching `symbol` atribute is loaded from topology
         file"""
 
-        fragments = self._reader.read(topology)
+        # Obtain a copy of the fragment loaded from Gromacs molecule
+        # file, which is only parsed once per process
+        fragment = self._topology_cache.get_fragment(topology, symbol)
 
-        # Identify fragment loaded from Gromacs molecule
-        # file and update attributes with those from database
-        for fragment in fragments:
-            if fragment.symbol == symbol:
-                # Update fragment in file with additional
-                # attribute data
-                for key, value in kwargs.items():
-                    setattr(fragment, key, value)
-                return fragment
+        # Update fragment with additional attribute data from database
+        for key, value in kwargs.items():
+            setattr(fragment, key, value)
 
-        raise MissingFragmentException
+        return fragment
 
     def get_ingredient(self, name):
         """Return an Ingredient instance from data that is obtained
         using the name argument as a query"""
 
-        ingredient_data = self._data[name]
-        fragment_data = ingredient_data.pop("fragments", None)
-        self._parse_fragment_data(fragment_data)
+        if self._store is not None:
+            return self._store.get_ingredient(name)
+
+        ingredient_data = dict(self._data[name])
+        fragment_data = ingredient_data.pop("fragments")
 
-        ingredient_fragments = []
-        for kwargs in fragment_data:
-            try:
-                fragment = self._fragment_cache[kwargs['symbol']]
-            except KeyError:
-                fragment = self.get_fragment(**kwargs)
-                self._fragment_cache[fragment.symbol] = fragment
-            ingredient_fragments.append(fragment)
+        # Each Ingredient receives its own copy of every fragment,
+        # loaded through the topology cache
+        ingredient_fragments = [
+            self.get_fragment(**kwargs) for kwargs in fragment_data
+        ]
 
         ingredient = Ingredient(
             name=name,
@@ -112,13 +203,52 @@ class GromacsDatabase(HasStrictTraits):
 
         return ingredient
 
-    def get_role(self, role):
-        """Return a list of Ingredient instance from data that have
-        a matching role attribute as input argument"""
+    def get_ingredients(self, names, n_workers=None):
+        """Return Ingredient instances for a collection of names,
+        resolving them all up front. Topology files shared between
+        Ingredients are only parsed once, and any uncached files are
+        parsed concurrently.
 
-        ingredients = []
-        for key, value in self._data.items():
-            if value['role'] == role:
-                ingredients.append(self.get_ingredient(key))
+        Parameters
+        ----------
+        names: iterable of str
+            Names of Ingredients to load
+        n_workers: int, optional
+            Maximum number of threads used to parse topology files
+
+        Returns
+        -------
+        ingredients: dict of str: Ingredient
+            Ingredient instances, indexed by name in order of first
+            appearance in names
+        """
 
-        return ingredients
+        names = list(dict.fromkeys(names))
+
+        if self._store is None:
+            requests = {
+                (kwargs['topology'], kwargs['symbol'])
+                for name in names
+                for kwargs in self._data[name]["fragments"]
+            }
+            self._topology_cache.prefetch(requests, n_workers=n_workers)
+
+        return {name: self.get_ingredient(name) for name in names}
+
+    def get_role(self, role):
+        """Return a list of IngredientProxy instances from data that
+        have a matching role attribute as input argument. Each full
+        Ingredient is only loaded when first required."""
+
+        if self._store is not None:
+            return self._store.get_role(role)
+
+        return [
+            IngredientProxy(
+                name=name,
+                role=self._data[name]["role"],
+                price=self._data[name].get("price", 0),
+                loader=partial(self.get_ingredient, name)
+            )
+            for name in self._roles.get(role, ())
+        ]
@@ -0,0 +1,324 @@
+"""Compiles a JSON chemical database into an indexed SQLite ingredient
+store. Ingredients are only materialised when requested, so that
+opening a store takes constant time regardless of the size of the
+chemical library. Their fragments are parsed from Gromacs '.itp'
+topology files on demand, through the shared topology cache.
+
+A store records the schema version and modification time of the JSON
+database it was compiled from, and cannot be opened once either is
+out of date.
+
+Compile a store from the command line with:
+
+    python -m surfactant_example.data.ingredient_store \
+        chemical_database.json ingredients.db
+"""
+import argparse
+import json
+import os
+import sqlite3
+from functools import partial
+from threading import RLock
+
+from traits.api import HasStrictTraits, Any, Instance, Unicode
+
+from surfactant_example.ingredient.ingredient import Ingredient
+from surfactant_example.ingredient.ingredient_proxy import IngredientProxy
+
+from .topology_cache import TopologyCache, TOPOLOGY_CACHE
+
+#: Version of the ingredient store schema
+STORE_VERSION = 2
+
+#: SQL statements that create an empty ingredient store
+STORE_SCHEMA = """
+CREATE TABLE metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE ingredients (
+    position INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    role TEXT NOT NULL,
+    price REAL,
+    data TEXT NOT NULL
+);
+CREATE TABLE fragments (
+    ingredient INTEGER NOT NULL REFERENCES ingredients(position),
+    position INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (ingredient, position)
+);
+CREATE INDEX ingredients_role ON ingredients(role);
+CREATE INDEX ingredients_price ON ingredients(price);
+CREATE INDEX fragments_symbol ON fragments(symbol);
+"""
+
+
+class StaleIngredientStoreException(Exception):
+    """Raised if an ingredient store was compiled with a different
+    schema version, or from a JSON database that has since changed"""
+
+    def __init__(self, message, source=None):
+        super(StaleIngredientStoreException, self).__init__(message)
+        #: File path of JSON database the store was compiled from
+        self.source = source
+
+
+def compile_ingredient_store(database, store_path):
+    """Converts all Ingredients in a GromacsDatabase into an indexed
+    SQLite store. The fields of each fragment, including its resolved
+    topology file path, are stored as JSON alongside each Ingredient.
+
+    Parameters
+    ----------
+    database: GromacsDatabase
+        Database containing Ingredients to compile
+    store_path: str
+        File path of SQLite ingredient store. Any existing file is
+        replaced once compilation is complete
+    """
+
+    tmp_path = f"{store_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    connection = sqlite3.connect(tmp_path)
+    try:
+        with connection:
+            connection.executescript(STORE_SCHEMA)
+            connection.executemany(
+                "INSERT INTO metadata VALUES (?, ?)",
+                [("version", str(STORE_VERSION)),
+                 ("source", os.path.abspath(database.file_path)),
+                 ("source_mtime",
+                  str(os.stat(database.file_path).st_mtime_ns))]
+            )
+
+            for position, (name, data) in enumerate(
+                    database._data.items()):
+                ingredient_data = dict(data)
+                fragment_data = ingredient_data.pop("fragments")
+
+                connection.execute(
+                    "INSERT INTO ingredients VALUES (?, ?, ?, ?, ?)",
+                    (position, name, ingredient_data["role"],
+                     ingredient_data.get("price"),
+                     json.dumps(ingredient_data))
+                )
+                connection.executemany(
+                    "INSERT INTO fragments VALUES (?, ?, ?, ?)",
+                    [(position, index, kwargs["symbol"],
+                      json.dumps(dict(kwargs)))
+                     for index, kwargs in enumerate(fragment_data)]
+                )
+    finally:
+        connection.close()
+
+    os.replace(tmp_path, store_path)
+
+
+class IngredientStore(HasStrictTraits):
+    """Class that can query a compiled SQLite ingredient store, and
+    materialise Ingredient objects on demand. Provides the same
+    `get_ingredient` and `get_role` methods as GromacsDatabase."""
+
+    #: File path of compiled SQLite ingredient store
+    file_path = Unicode()
+
+    #: Cache of fragments parsed from Gromacs .itp molecule files,
+    #: shared between all instances by default
+    _topology_cache = Instance(TopologyCache)
+
+    #: Read only connection to the ingredient store
+    _connection = Any()
+
+    #: Lock protecting the connection when shared between threads
+    _lock = Any()
+
+    def __init__(self, *args, **kwargs):
+        """Opens the ingredient store
+
+        Raises
+        ------
+        StaleIngredientStoreException: if the store is out of date
+        """
+        super(IngredientStore, self).__init__(*args, **kwargs)
+
+        try:
+            self._check_metadata()
+        except StaleIngredientStoreException:
+            self._connection.close()
+            raise
+
+    def __lock_default(self):
+        return RLock()
+
+    def __topology_cache_default(self):
+        return TOPOLOGY_CACHE
+
+    def _file_path_changed(self):
+        """Open a read only connection to the new ingredient store.
+        No data is loaded until it is queried."""
+        uri = f"file:{os.path.abspath(self.file_path)}?mode=ro"
+        self._connection = sqlite3.connect(
+            uri, uri=True, check_same_thread=False)
+
+    def _check_metadata(self):
+        """Ensure that the store uses the current schema version, and
+        that its JSON database has not changed since compilation"""
+
+        metadata = dict(self._execute("SELECT key, value FROM metadata"))
+        source = metadata.get("source")
+
+        if metadata.get("version") != str(STORE_VERSION):
+            raise StaleIngredientStoreException(
+                f"Ingredient store {self.file_path} has version "
+                f"{metadata.get('version')}, expected {STORE_VERSION}",
+                source=source)
+
+        try:
+            source_mtime = os.stat(source).st_mtime_ns
+        except OSError:
+            raise StaleIngredientStoreException(
+                f"JSON database {source} of ingredient store "
+                f"{self.file_path} no longer exists",
+                source=source)
+
+        if str(source_mtime) != metadata.get("source_mtime"):
+            raise StaleIngredientStoreException(
+                f"JSON database {source} has changed since ingredient "
+                f"store {self.file_path} was compiled",
+                source=source)
+
+    def _execute(self, statement, parameters=()):
+        """Executes a SQL statement and returns all rows"""
+        with self._lock:
+            return self._connection.execute(
+                statement, parameters).fetchall()
+
+    @property
+    def source(self):
+        """File path and modification time of the JSON database that
+        the store was compiled from"""
+        metadata = dict(self._execute("SELECT key, value FROM metadata"))
+        return metadata["source"], int(metadata["source_mtime"])
+
+    def query(self, role=None, min_price=None, max_price=None,
+              symbol=None):
+        """Returns the names of all Ingredients matching every given
+        criteria, using indexes on each column
+
+        Parameters
+        ----------
+        role: str, optional
+            Role of Ingredient
+        min_price: float, optional
+            Lower bound on Ingredient price
+        max_price: float, optional
+            Upper bound on Ingredient price
+        symbol: str, optional
+            Symbol of a fragment contained in Ingredient
+
+        Returns
+        -------
+        names: list of str
+            Names of matching Ingredients, in database order
+        """
+
+        statement = "SELECT name FROM ingredients"
+        conditions = []
+        parameters = []
+
+        if role is not None:
+            conditions.append("role = ?")
+            parameters.append(role)
+        if min_price is not None:
+            conditions.append("price >= ?")
+            parameters.append(min_price)
+        if max_price is not None:
+            conditions.append("price <= ?")
+            parameters.append(max_price)
+        if symbol is not None:
+            conditions.append(
+                "position IN "
+                "(SELECT ingredient FROM fragments WHERE symbol = ?)")
+            parameters.append(symbol)
+
+        if conditions:
+            statement += " WHERE " + " AND ".join(conditions)
+        statement += " ORDER BY position"
+
+        return [name for name, in self._execute(statement, parameters)]
+
+    def get_ingredient(self, name):
+        """Return an Ingredient instance from data that is obtained
+        using the name argument as a query"""
+
+        rows = self._execute(
+            "SELECT position, data FROM ingredients WHERE name = ?",
+            (name,))
+        if not rows:
+            raise KeyError(name)
+        position, data = rows[0]
+
+        fragments = []
+        for fragment_data, in self._execute(
+                "SELECT data FROM fragments WHERE ingredient = ? "
+                "ORDER BY position", (position,)):
+            kwargs = json.loads(fragment_data)
+
+            # Obtain a copy of the fragment loaded from Gromacs molecule
+            # file, and update it with attribute data from the store
+            fragment = self._topology_cache.get_fragment(
+                kwargs.pop("topology"), kwargs.pop("symbol"))
+            for key, value in kwargs.items():
+                setattr(fragment, key, value)
+            fragments.append(fragment)
+
+        return Ingredient(
+            name=name,
+            fragments=fragments,
+            **json.loads(data)
+        )
+
+    def get_role(self, role):
+        """Return a list of IngredientProxy instances from data that
+        have a matching role attribute as input argument. Each full
+        Ingredient is only loaded when first required."""
+
+        rows = self._execute(
+            "SELECT name, price FROM ingredients WHERE role = ? "
+            "ORDER BY position", (role,))
+
+        return [
+            IngredientProxy(
+                name=name,
+                role=role,
+                price=price or 0,
+                loader=partial(self.get_ingredient, name)
+            )
+            for name, price in rows
+        ]
+
+
+def main(argv=None):
+
+    from .gromacs_database import GromacsDatabase
+
+    parser = argparse.ArgumentParser(
+        description="Compiles a JSON chemical database into an indexed "
+                    "SQLite ingredient store")
+    parser.add_argument(
+        'database', help='File path of JSON chemical database')
+    parser.add_argument(
+        'store', help='File path of compiled SQLite ingredient store')
+    args = parser.parse_args(argv)
+
+    compile_ingredient_store(
+        GromacsDatabase(file_path=args.database), args.store)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""Persistent memo of the KPIs calculated by the simulation and micelle
+data sources, stored in a SQLite database so that it can be shared
+between MCO runs and evaluation subprocesses.
+
+Each completed simulation is keyed by its formulation ref and model
+settings, and each aggregation number by its simulation key and the
+micelle analysis parameters. Duplicate MCO points therefore neither
+re-run Gromacs nor re-analyse the trajectory.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from threading import Lock, RLock
+
+from traits.api import HasStrictTraits, Any, Unicode
+
+#: SQL statements that create an empty KPI memo
+MEMO_SCHEMA = """
+CREATE TABLE IF NOT EXISTS simulations (
+    key TEXT PRIMARY KEY,
+    results_path TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aggregation (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS statistics (
+    name TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS simulations_results_path
+    ON simulations(results_path);
+"""
+
+#: Names of all hit rate counters
+STATISTICS = (
+    'simulation_hits', 'simulation_misses',
+    'aggregation_hits', 'aggregation_misses'
+)
+
+#: KPI memos opened in this process, indexed by file path
+_memos = {}
+_memos_lock = Lock()
+
+
+def memo_key(*components):
+    """Returns the SHA1 digest of the JSON serialised components"""
+    serialised = json.dumps(components, sort_keys=True)
+    return hashlib.sha1(serialised.encode('utf-8')).hexdigest()
+
+
+def get_kpi_memo(file_path):
+    """Returns the KPIMemo stored at file_path, shared between all
+    data sources in this process"""
+
+    file_path = os.path.abspath(file_path)
+    with _memos_lock:
+        if file_path not in _memos:
+            _memos[file_path] = KPIMemo(file_path=file_path)
+        return _memos[file_path]
+
+
+class KPIMemo(HasStrictTraits):
+    """Class that stores the results of simulations and the aggregation
+    numbers calculated from them, along with counts of memo hits and
+    misses"""
+
+    #: File path of SQLite KPI memo
+    file_path = Unicode()
+
+    #: Connection to the KPI memo
+    _connection = Any()
+
+    #: Lock protecting the connection when shared between threads
+    _lock = Any()
+
+    def __lock_default(self):
+        return RLock()
+
+    def _file_path_changed(self):
+        """Open a connection to the KPI memo, creating it if it does
+        not already exist"""
+        self._connection = sqlite3.connect(
+            self.file_path, timeout=60, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.executescript(MEMO_SCHEMA)
+
+    def _query(self, statement, parameters=()):
+        """Executes a SQL query and returns the first row, or None"""
+        with self._lock:
+            return self._connection.execute(
+                statement, parameters).fetchone()
+
+    def _update(self, *statements):
+        """Executes a sequence of (statement, parameters) pairs as a
+        single transaction"""
+        with self._lock, self._connection:
+            for statement, parameters in statements:
+                self._connection.execute(statement, parameters)
+
+    def _count(self, name):
+        self._update(
+            ("INSERT OR IGNORE INTO statistics VALUES (?, 0)", (name,)),
+            ("UPDATE statistics SET count = count + 1 WHERE name = ?",
+             (name,))
+        )
+
+    def get_simulation(self, key):
+        """Returns the results file of a completed simulation, or None
+        if it has not been run or its results no longer exist"""
+
+        row = self._query(
+            "SELECT results_path FROM simulations WHERE key = ?", (key,))
+
+        if row is None or not os.path.exists(row[0]):
+            self._count('simulation_misses')
+            return None
+
+        self._count('simulation_hits')
+        return row[0]
+
+    def add_simulation(self, key, results_path):
+        """Stores the results file of a completed simulation. Any other
+        simulations that wrote to the same file are removed, since
+        their results have been overwritten."""
+        results_path = os.path.abspath(results_path)
+        self._update(
+            ("DELETE FROM simulations WHERE results_path = ?",
+             (results_path,)),
+            ("INSERT OR REPLACE INTO simulations VALUES (?, ?)",
+             (key, results_path))
+        )
+
+    def aggregation_key(self, results_path, parameters):
+        """Returns the key of an aggregation number calculated from a
+        simulation results file using the given analysis parameters,
+        or None if the simulation that produced the file is unknown"""
+
+        results_path = os.path.abspath(results_path)
+        row = self._query(
+            "SELECT key FROM simulations WHERE results_path = ?",
+            (results_path,))
+        if row is None:
+            return None
+
+        return memo_key(row[0], parameters)
+
+    def get_aggregation(self, key):
+        """Returns a stored aggregation number, or None"""
+
+        row = self._query(
+            "SELECT value FROM aggregation WHERE key = ?", (key,))
+
+        if row is None:
+            self._count('aggregation_misses')
+            return None
+
+        self._count('aggregation_hits')
+        return row[0]
+
+    def add_aggregation(self, key, value):
+        """Stores a calculated aggregation number"""
+        self._update((
+            "INSERT OR REPLACE INTO aggregation VALUES (?, ?)",
+            (key, float(value))))
+
+    def statistics(self):
+        """Returns the total number of hits and misses of simulations
+        and aggregation numbers in the memo"""
+
+        with self._lock:
+            counts = dict(self._connection.execute(
+                "SELECT name, count FROM statistics").fetchall())
+
+        return {name: counts.get(name, 0) for name in STATISTICS}
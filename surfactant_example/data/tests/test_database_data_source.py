@@ -60,3 +60,12 @@ class TestDatabaseDataSource(TestCase):
 
         ingredient = res[0].value
         self.assertEqual('Sodium Chloride', ingredient.name)
+
+    def test_prefetch_ingredients(self):
+
+        ingredients = self.data_source.prefetch_ingredients(
+            ['Water', 'Sodium Chloride', 'Water'])
+
+        self.assertListEqual(
+            ['Water', 'Sodium Chloride'], list(ingredients))
+        self.assertEqual('Water', ingredients['Water'].name)
@@ -1,6 +1,11 @@
+import os
+import shutil
+import threading
+from tempfile import TemporaryDirectory
 from unittest import TestCase, mock
 
 from .. gromacs_database import GromacsDatabase, MissingFragmentException
+from .. topology_cache import TopologyCache
 
 
 class TestGromacsDatabase(TestCase):
@@ -40,7 +45,6 @@ class TestGromacsDatabase(TestCase):
         self.assertEqual("Solvent", water.role)
         self.assertEqual(72.05952, water.mass)
         self.assertEqual(1, len(water.fragments))
-        self.assertEqual(1, len(self.gromacs_database._fragment_cache))
 
         salt = self.gromacs_database.get_ingredient('Sodium Chloride')
 
@@ -48,14 +52,22 @@ class TestGromacsDatabase(TestCase):
         self.assertEqual("Salt", salt.role)
         self.assertAlmostEqual(58.44280, salt.mass)
         self.assertEqual(2, len(salt.fragments))
-        self.assertEqual(3, len(self.gromacs_database._fragment_cache))
+
+        # Each Ingredient receives its own copy of every fragment
+        other_water = self.gromacs_database.get_ingredient('Water')
+        self.assertIsNot(water.fragments[0], other_water.fragments[0])
 
     def test_get_role(self):
 
-        surfactants = self.gromacs_database.get_role('Surfactant')
+        with mock.patch.object(
+                GromacsDatabase, 'get_fragment') as mock_get_fragment:
+            surfactants = self.gromacs_database.get_role('Surfactant')
 
         self.assertEqual(5, len(surfactants))
-        self.assertEqual(6, len(self.gromacs_database._fragment_cache))
+
+        # Fragments are only loaded once required
+        mock_get_fragment.assert_not_called()
+        self.assertFalse(surfactants[0].is_loaded)
 
         self.assertEqual("Sodium Dodecyl Sulfate", surfactants[0].name)
         self.assertEqual("Surfactant", surfactants[0].role)
@@ -81,3 +93,166 @@ class TestGromacsDatabase(TestCase):
         self.assertEqual("Surfactant", surfactants[4].role)
         self.assertEqual(420.3794, surfactants[4].mass)
         self.assertEqual(2, len(surfactants[4].fragments))
+
+    def test_get_ingredient_non_destructive(self):
+
+        first = self.gromacs_database.get_ingredient('Water')
+        second = self.gromacs_database.get_ingredient('Water')
+
+        self.assertEqual(first.name, second.name)
+        self.assertEqual(1, len(second.fragments))
+        self.assertIn("fragments", self.gromacs_database._data['Water'])
+
+    def test_data_cached(self):
+
+        with mock.patch.object(
+                GromacsDatabase, '_load_data',
+                wraps=self.gromacs_database._load_data) as mock_load:
+            self.gromacs_database.get_ingredient('Water')
+            self.gromacs_database.get_role('Solvent')
+            self.gromacs_database.get_ingredient('Water')
+
+            self.assertEqual(1, mock_load.call_count)
+
+        # Index is read only
+        with self.assertRaises(TypeError):
+            self.gromacs_database._data['Water']['role'] = 'Salt'
+
+    def test_roles(self):
+
+        self.assertTupleEqual(
+            ("Water",), self.gromacs_database._roles['Solvent'])
+        self.assertListEqual([], self.gromacs_database.get_role('Unknown'))
+
+    def test_data_invalidated(self):
+
+        with TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'database.json')
+            shutil.copy(self.gromacs_database.file_path, file_path)
+            self.gromacs_database.file_path = file_path
+            data = self.gromacs_database._data
+
+            self.assertIs(data, self.gromacs_database._data)
+
+            # Modifying the database file triggers a reload
+            stat = os.stat(file_path)
+            os.utime(
+                file_path,
+                ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+            self.assertIsNot(data, self.gromacs_database._data)
+
+    def test_topology_cache(self):
+
+        topology_cache = TopologyCache()
+        gromacs_database = GromacsDatabase(_topology_cache=topology_cache)
+
+        water = gromacs_database.get_ingredient('Water')
+        topology = gromacs_database._data['Water']['fragments'][0][
+            'topology']
+        self.assertDictEqual(
+            {"hits": 0, "misses": 1, "parsed": 1, "size": 1,
+             "maxsize": 256},
+            topology_cache.cache_info())
+
+        # Fragments are shared between database instances, but each
+        # receives its own copy
+        other_database = GromacsDatabase(_topology_cache=topology_cache)
+        other_water = other_database.get_ingredient('Water')
+        self.assertEqual(1, topology_cache.hits)
+        self.assertEqual(1, topology_cache.misses)
+        self.assertIsNot(water.fragments[0], other_water.fragments[0])
+        self.assertEqual(
+            water.fragments[0].symbol, other_water.fragments[0].symbol)
+
+        with mock.patch(
+                'force_gromacs.api'
+                '.GromacsMoleculeReader.read') as mock_read:
+            topology_cache.get_fragment(topology, 'W')
+            mock_read.assert_not_called()
+
+        topology_cache.clear()
+        self.assertDictEqual(
+            {"hits": 0, "misses": 0, "parsed": 0, "size": 0,
+             "maxsize": 256},
+            topology_cache.cache_info())
+
+    def test_topology_cache_lru(self):
+
+        topology_cache = TopologyCache(maxsize=2)
+        fragments = [
+            mock.Mock(symbol=symbol) for symbol in ['A', 'B', 'C']
+        ]
+
+        with mock.patch(
+                'force_gromacs.api'
+                '.GromacsMoleculeReader.read') as mock_read:
+            mock_read.return_value = fragments
+            topology_cache.get_fragment('some-topology.itp', 'A')
+
+            # Only the most recently parsed fragments are retained
+            self.assertEqual(2, topology_cache.cache_info()["size"])
+            topology_cache.get_fragment('some-topology.itp', 'C')
+            self.assertEqual(1, mock_read.call_count)
+            topology_cache.get_fragment('some-topology.itp', 'A')
+            self.assertEqual(2, mock_read.call_count)
+
+    def test_topology_cache_parse_unlocked(self):
+
+        topology_cache = TopologyCache()
+        acquired = []
+
+        def acquire_lock():
+            acquired.append(topology_cache._lock.acquire(timeout=1))
+            if acquired[-1]:
+                topology_cache._lock.release()
+
+        def read(topology):
+            # Other threads can use the cache while a file is parsed
+            thread = threading.Thread(target=acquire_lock)
+            thread.start()
+            thread.join()
+            return [mock.Mock(symbol='A')]
+
+        with mock.patch(
+                'force_gromacs.api'
+                '.GromacsMoleculeReader.read', side_effect=read):
+            topology_cache.get_fragment('some-topology.itp', 'A')
+
+        self.assertEqual([True], acquired)
+
+    def test_get_ingredients(self):
+
+        topology_cache = TopologyCache()
+        gromacs_database = GromacsDatabase(_topology_cache=topology_cache)
+        names = ['Water', 'Sodium Chloride', 'Sodium Dodecyl Sulfate',
+                 'Water']
+
+        with mock.patch.object(
+                TopologyCache, '_parse_topology') as mock_parse:
+            ingredients = gromacs_database.get_ingredients(
+                names, n_workers=2)
+            mock_parse.assert_not_called()
+
+        self.assertListEqual(
+            ['Water', 'Sodium Chloride', 'Sodium Dodecyl Sulfate'],
+            list(ingredients.keys()))
+        self.assertEqual("Water", ingredients['Water'].name)
+        self.assertEqual(2, len(ingredients['Sodium Chloride'].fragments))
+
+        # Each unique topology file is parsed once, and every fragment
+        # lookup is then served from the topology cache
+        topologies = {
+            kwargs['topology']
+            for name in names
+            for kwargs in gromacs_database._data[name]['fragments']
+        }
+        self.assertEqual(len(topologies), topology_cache.n_parsed)
+        self.assertEqual(0, topology_cache.misses)
+        self.assertEqual(
+            sum(len(gromacs_database._data[name]['fragments'])
+                for name in ingredients),
+            topology_cache.hits)
+
+        # Cached fragments are not parsed again
+        gromacs_database.get_ingredients(names)
+        self.assertEqual(len(topologies), topology_cache.n_parsed)
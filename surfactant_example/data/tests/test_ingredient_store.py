@@ -0,0 +1,128 @@
+import os
+import shutil
+import sqlite3
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from surfactant_example.data.gromacs_database import GromacsDatabase
+from surfactant_example.data.ingredient_store import (
+    IngredientStore, StaleIngredientStoreException,
+    compile_ingredient_store, main
+)
+
+
+class TestIngredientStore(TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.store_path = os.path.join(self.directory.name, 'store.db')
+        self.gromacs_database = GromacsDatabase()
+
+        compile_ingredient_store(self.gromacs_database, self.store_path)
+        self.store = IngredientStore(file_path=self.store_path)
+
+    def tearDown(self):
+        self.store._connection.close()
+        self.directory.cleanup()
+
+    def test_source(self):
+
+        source, mtime = self.store.source
+        self.assertEqual(self.gromacs_database.file_path, source)
+        self.assertEqual(
+            os.stat(self.gromacs_database.file_path).st_mtime_ns, mtime)
+
+    def test_query(self):
+
+        self.assertListEqual(
+            list(self.gromacs_database._data.keys()), self.store.query())
+        self.assertListEqual(
+            list(self.gromacs_database._roles['Surfactant']),
+            self.store.query(role='Surfactant'))
+        self.assertListEqual(['Water'], self.store.query(symbol='W'))
+        self.assertListEqual(
+            ['Water'], self.store.query(max_price=0.1))
+        self.assertListEqual(
+            [], self.store.query(role='Solvent', min_price=1.0))
+
+    def test_get_ingredient(self):
+
+        water = self.store.get_ingredient('Water')
+        expected = self.gromacs_database.get_ingredient('Water')
+
+        self.assertEqual(expected.name, water.name)
+        self.assertEqual(expected.role, water.role)
+        self.assertEqual(expected.price, water.price)
+        self.assertEqual(expected.mass, water.mass)
+        self.assertListEqual(
+            [fragment.symbol for fragment in expected.fragments],
+            [fragment.symbol for fragment in water.fragments])
+
+        with self.assertRaises(KeyError):
+            self.store.get_ingredient('Not an ingredient')
+
+    def test_get_role(self):
+
+        salts = self.store.get_role('Salt')
+        self.assertEqual(1, len(salts))
+        self.assertEqual("Sodium Chloride", salts[0].name)
+        self.assertEqual(2, len(salts[0].fragments))
+
+    def test_gromacs_database_store(self):
+
+        gromacs_database = GromacsDatabase(store_path=self.store_path)
+        water = gromacs_database.get_ingredient('Water')
+
+        self.assertEqual("Water", water.name)
+        self.assertEqual(
+            len(self.store.get_role('Surfactant')),
+            len(gromacs_database.get_role('Surfactant')))
+
+    def test_stale_store(self):
+
+        file_path = os.path.join(self.directory.name, 'database.json')
+        shutil.copy(self.gromacs_database.file_path, file_path)
+        store_path = os.path.join(self.directory.name, 'stale.db')
+        compile_ingredient_store(
+            GromacsDatabase(file_path=file_path), store_path)
+
+        # Changing the JSON database makes the store stale
+        stat = os.stat(file_path)
+        os.utime(
+            file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        with self.assertRaisesRegex(
+                StaleIngredientStoreException, 'has changed'):
+            IngredientStore(file_path=store_path)
+
+        # GromacsDatabase recompiles stores of its own JSON database
+        gromacs_database = GromacsDatabase(
+            file_path=file_path, store_path=store_path)
+        self.assertEqual(
+            'Water', gromacs_database.get_ingredient('Water').name)
+        self.assertEqual(
+            os.stat(file_path).st_mtime_ns,
+            gromacs_database._store.source[1])
+        gromacs_database._store._connection.close()
+
+        # Stores with an earlier schema version are also stale
+        connection = sqlite3.connect(store_path)
+        with connection:
+            connection.execute(
+                "UPDATE metadata SET value = '1' WHERE key = 'version'")
+        connection.close()
+        with self.assertRaisesRegex(
+                StaleIngredientStoreException, 'version 1'):
+            IngredientStore(file_path=store_path)
+
+        # Stores compiled from another JSON database are not replaced
+        with self.assertRaises(StaleIngredientStoreException):
+            GromacsDatabase(store_path=store_path).get_role('Salt')
+
+    def test_main(self):
+
+        store_path = os.path.join(self.directory.name, 'main.db')
+        main([self.gromacs_database.file_path, store_path])
+
+        store = IngredientStore(file_path=store_path)
+        self.assertListEqual(self.store.query(), store.query())
+        store._connection.close()
@@ -0,0 +1,86 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from surfactant_example.data.kpi_memo import (
+    KPIMemo, get_kpi_memo, memo_key
+)
+
+
+class TestKPIMemo(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, 'memo.db')
+        self.results_path = os.path.join(self.tmp_dir.name, 'results.gro')
+        with open(self.results_path, 'w') as outfile:
+            outfile.write('results')
+
+        self.memo = KPIMemo(file_path=self.file_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_memo_key(self):
+        key = memo_key('ps1-pi-12.0', 4000, {'r_thresh': 1.25})
+
+        self.assertEqual(40, len(key))
+        self.assertEqual(
+            key, memo_key('ps1-pi-12.0', 4000, {'r_thresh': 1.25}))
+        self.assertNotEqual(
+            key, memo_key('ps1-pi-12.0', 4000, {'r_thresh': 1.5}))
+
+    def test_simulation(self):
+        self.assertIsNone(self.memo.get_simulation('first'))
+
+        self.memo.add_simulation('first', self.results_path)
+        self.assertEqual(
+            self.results_path, self.memo.get_simulation('first'))
+
+        # Results that overwrite the same file replace the first
+        # simulation
+        self.memo.add_simulation('second', self.results_path)
+        self.assertIsNone(self.memo.get_simulation('first'))
+        self.assertEqual(
+            self.results_path, self.memo.get_simulation('second'))
+
+        # Deleted results are not returned
+        os.remove(self.results_path)
+        self.assertIsNone(self.memo.get_simulation('second'))
+
+        self.assertEqual(
+            {'simulation_hits': 2, 'simulation_misses': 3,
+             'aggregation_hits': 0, 'aggregation_misses': 0},
+            self.memo.statistics())
+
+    def test_aggregation(self):
+        parameters = {'r_thresh': 1.25}
+
+        # Results from unknown simulations cannot be memoised
+        self.assertIsNone(
+            self.memo.aggregation_key(self.results_path, parameters))
+
+        self.memo.add_simulation('first', self.results_path)
+        key = self.memo.aggregation_key(self.results_path, parameters)
+        self.assertEqual(memo_key('first', parameters), key)
+        self.assertNotEqual(
+            key, self.memo.aggregation_key(
+                self.results_path, {'r_thresh': 1.5}))
+
+        self.assertIsNone(self.memo.get_aggregation(key))
+        self.memo.add_aggregation(key, 21.5)
+        self.assertEqual(21.5, self.memo.get_aggregation(key))
+
+        # Memoised values and statistics persist between instances
+        memo = KPIMemo(file_path=self.file_path)
+        self.assertEqual(21.5, memo.get_aggregation(key))
+        self.assertEqual(
+            {'simulation_hits': 0, 'simulation_misses': 0,
+             'aggregation_hits': 2, 'aggregation_misses': 1},
+            memo.statistics())
+
+    def test_get_kpi_memo(self):
+        memo = get_kpi_memo(self.file_path)
+
+        self.assertIs(memo, get_kpi_memo(self.file_path))
+        self.assertEqual(self.file_path, memo.file_path)
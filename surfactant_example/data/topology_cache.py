@@ -0,0 +1,196 @@
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from threading import RLock
+
+from traits.api import HasStrictTraits, Any, Instance, Int
+
+from force_gromacs.api import GromacsMoleculeReader
+from force_gromacs.data_sources.fragment.fragment_data_source import (
+    MissingFragmentException
+)
+
+
+class TopologyCache(HasStrictTraits):
+    """Least recently used cache of GromacsFragment objects parsed from
+    Gromacs '.itp' topology files. Entries are keyed by the topology file
+    path, its modification time and the fragment symbol, so that each
+    file is only parsed once until it is changed. Copies of cached
+    fragments are returned, so that callers may update their attributes
+    freely.
+
+    Topology files are parsed without holding the cache lock, so that
+    concurrent lookups of different files are not serialised."""
+
+    #: Maximum number of fragments stored in the cache
+    maxsize = Int(256)
+
+    #: Number of fragment lookups returned from the cache
+    hits = Int(0)
+
+    #: Number of fragment lookups that required a topology file to
+    #: be parsed
+    misses = Int(0)
+
+    #: Number of topology files parsed, either by fragment lookups or
+    #: when prefetching
+    n_parsed = Int(0)
+
+    #: Cached fragments, ordered from least to most recently used
+    _fragments = Instance(OrderedDict, ())
+
+    #: Lock protecting the cache when shared between threads
+    _lock = Any()
+
+    def __lock_default(self):
+        return RLock()
+
+    def _cache_key(self, topology, symbol):
+        """Returns a key identifying the fragment with symbol in the
+        current version of topology"""
+        try:
+            mtime = os.stat(topology).st_mtime_ns
+        except OSError:
+            mtime = None
+        return os.path.abspath(topology), mtime, symbol
+
+    def get_fragment(self, topology, symbol):
+        """Returns a copy of the GromacsFragment with a matching symbol
+        from the topology file, parsing it if required
+
+        Parameters
+        ----------
+        topology: str
+            File path of Gromacs '.itp' file containing
+            fragment data
+        symbol: str
+            Symbol corresponging to target fragment in
+            topology file
+
+        Returns
+        -------
+        fragment: GromacsFragment
+            Copy of the cached fragment
+
+        Raises
+        ------
+        MissingFragmentException: if no GromacsFragment with
+        matching `symbol` atribute is loaded from topology
+        file
+        """
+
+        key = self._cache_key(topology, symbol)
+
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._fragments.move_to_end(key)
+                return deepcopy(fragment)
+
+        return deepcopy(self._parse_topology(topology, key))
+
+    def _read_topology(self, topology):
+        """Parses all fragments in a topology file. Called without
+        holding the cache lock, so a new reader is used for each file."""
+        fragments = list(GromacsMoleculeReader().read(topology))
+        with self._lock:
+            self.n_parsed += 1
+        return fragments
+
+    def _parse_topology(self, topology, key):
+        """Parses all fragments in topology into the cache, returning
+        that matching the symbol in key"""
+
+        path, mtime, symbol = key
+        fragments = self._store_fragments(
+            path, mtime, self._read_topology(topology))
+
+        if symbol not in fragments:
+            raise MissingFragmentException
+
+        return fragments[symbol]
+
+    def _store_fragments(self, path, mtime, fragments):
+        """Stores fragments parsed from the topology file at path in
+        the cache, evicting the least recently used entries. Returns
+        the stored fragments, indexed by symbol"""
+
+        stored = {}
+
+        with self._lock:
+            for fragment in fragments:
+                fragment_key = (path, mtime, fragment.symbol)
+                self._fragments[fragment_key] = fragment
+                self._fragments.move_to_end(fragment_key)
+                stored[fragment.symbol] = fragment
+
+            while len(self._fragments) > self.maxsize:
+                self._fragments.popitem(last=False)
+
+        return stored
+
+    def prefetch(self, requests, n_workers=None):
+        """Parses all topology files required by a set of fragment
+        requests that are not already cached. Each unique topology file
+        is parsed once, with files parsed concurrently in a pool of
+        threads.
+
+        Parameters
+        ----------
+        requests: iterable of tuple(str, str)
+            Topology file path and symbol of each required fragment
+        n_workers: int, optional
+            Maximum number of threads used to parse topology files.
+            Defaults to the ThreadPoolExecutor default
+
+        Returns
+        -------
+        n_parsed: int
+            Number of topology files that were parsed
+        """
+
+        missing = OrderedDict()
+        with self._lock:
+            for topology, symbol in requests:
+                key = self._cache_key(topology, symbol)
+                if key not in self._fragments:
+                    missing[topology] = key[:2]
+
+        if not missing:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            results = executor.map(self._read_topology, missing)
+
+            for (path, mtime), fragments in zip(
+                    missing.values(), results):
+                self._store_fragments(path, mtime, fragments)
+
+        return len(missing)
+
+    def cache_info(self):
+        """Returns a dictionary of cache statistics for profiling"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "parsed": self.n_parsed,
+                "size": len(self._fragments),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        """Removes all fragments from the cache and resets statistics"""
+        with self._lock:
+            self._fragments.clear()
+            self.hits = 0
+            self.misses = 0
+            self.n_parsed = 0
+
+
+#: Topology cache shared by all GromacsDatabase instances in a process
+TOPOLOGY_CACHE = TopologyCache()
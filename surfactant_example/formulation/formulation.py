@@ -1,6 +1,8 @@
 import numpy as np
 
-from traits.api import HasTraits, Property, List, Float, Unicode
+from traits.api import (
+    HasTraits, Array, Property, List, Float, Unicode, cached_property
+)
 
 from surfactant_example.ingredient.ingredient import Ingredient
 
@@ -13,40 +15,62 @@ class Formulation(HasTraits):
     # List of concentrations by mass % for each Ingredient
     concentrations = List(Float)
 
+    # Array of masses for each Ingredient
+    ingredient_masses = Property(Array, depends_on='ingredients.mass')
+
+    # Array of prices in $USD / kg for each Ingredient
+    ingredient_prices = Property(Array, depends_on='ingredients.price')
+
+    # Array of concentrations by mass % for each Ingredient
+    ingredient_concentrations = Property(
+        Array, depends_on='concentrations')
+
     # List of corresponding number fractions for each Ingredient
-    num_fractions = Property(List(Float),
-                             depends_on='ingredients.mass,concentrations')
+    num_fractions = Property(
+        List(Float),
+        depends_on='ingredient_masses,ingredient_concentrations')
 
     # Total price of formulation in $USD / kg
-    price = Property(Float, depends_on='ingredients.price,concentrations')
+    price = Property(
+        Float, depends_on='ingredient_prices,ingredient_concentrations')
 
     # Formulation reference key for each experiment
-    ref = Property(Unicode, depends_on='ingredients.fragments.symbol')
-
+    ref = Property(
+        Unicode,
+        depends_on='ingredients.role,ingredients.fragments.symbol,'
+                   'concentrations')
+
+    @cached_property
+    def _get_ingredient_masses(self):
+        return np.array(
+            [ingredient.mass for ingredient in self.ingredients],
+            dtype=float)
+
+    @cached_property
+    def _get_ingredient_prices(self):
+        return np.array(
+            [ingredient.price for ingredient in self.ingredients],
+            dtype=float)
+
+    @cached_property
+    def _get_ingredient_concentrations(self):
+        return np.array(self.concentrations, dtype=float)
+
+    @cached_property
     def _get_num_fractions(self):
-        masses = [
-            ingredient.mass for ingredient in self.ingredients
-        ]
-        return calculate_num_fractions(masses, self.concentrations)
+        return calculate_num_fractions(
+            self.ingredient_masses, self.ingredient_concentrations)
 
+    @cached_property
     def _get_price(self):
-        prices = [
-            ingredient.price for ingredient in self.ingredients
-        ]
-        return calculate_price(prices, self.concentrations)
+        return calculate_price(
+            self.ingredient_prices, self.ingredient_concentrations)
 
+    @cached_property
     def _get_ref(self):
         """Generate reference for formulation based on ingredient
         concentrations and fragment symbols"""
-        reference = []
-        for concentration, ingredient in zip(
-                self.concentrations, self.ingredients):
-            if ingredient.role != 'Solvent':
-                for fragment in ingredient.fragments:
-                    reference.append(fragment.symbol.lower())
-                reference.append(str(round(concentration, 2)))
-
-        return '-'.join(reference)
+        return calculate_ref(self.ingredients, self.concentrations)
 
     def fragment_search(self, symbols):
         """From a list of given symbols, return a list of
@@ -65,38 +89,57 @@ class Formulation(HasTraits):
 
         return list(fragments.values())
 
-    def ingredient_search(self, roles):
-        """From a list of given roles, return a list of all
-        Ingredient objects that have matching roles"""
+    def ingredient_indices(self, roles):
+        """From a list of given roles, return the indices of all
+        Ingredient objects that have matching roles. Only the first
+        index of an Ingredient that appears multiple times is
+        returned."""
 
+        indices = []
         ingredients = []
-        for ingredient in self.ingredients:
+        for index, ingredient in enumerate(self.ingredients):
             if (ingredient.role in roles
                     and ingredient not in ingredients):
+                indices.append(index)
                 ingredients.append(ingredient)
 
-        return ingredients
+        return indices
+
+    def ingredient_search(self, roles):
+        """From a list of given roles, return a list of all
+        Ingredient objects that have matching roles"""
+
+        return [
+            self.ingredients[index]
+            for index in self.ingredient_indices(roles)
+        ]
 
 
 def calculate_price(prices, concentrations):
     """
     From a list of prices in $USD / kg and concentrations in mass %,
-    calculate the price of the formulation in $USD / kg
+    calculate the price of the formulation in $USD / kg. If
+    concentrations is a 2D array, the price of each formulation
+    (row) is returned.
     """
 
     # Normalise ingredient concentrations
-    concentrations = np.asarray(concentrations) / np.sum(concentrations)
+    concentrations = np.asarray(concentrations)
+    concentrations = concentrations / np.sum(
+        concentrations, axis=-1, keepdims=True)
 
     # Calculate all ingredient price * conc weights
-    price_conc = prices * concentrations
+    price_conc = np.asarray(prices) * concentrations
 
-    return sum(price_conc)
+    return np.sum(price_conc, axis=-1)
 
 
 def calculate_num_fractions(masses, concentrations):
     """
     From a list of masses and concentrations, calculate the number
-    fractions of each element as a numpy array.
+    fractions of each element as a numpy array. If concentrations
+    is a 2D array, the number fractions of each formulation (row)
+    are returned.
 
     Notes
     -----
@@ -122,14 +165,43 @@ def calculate_num_fractions(masses, concentrations):
     """
 
     # Normalise ingredient concentrations
-    concentrations = np.asarray(concentrations) / np.sum(concentrations)
+    concentrations = np.asarray(concentrations)
+    concentrations = concentrations / np.sum(
+        concentrations, axis=-1, keepdims=True)
 
     # Calculate all ingredient conc / mass ratios
     mass_conc = concentrations / np.asarray(masses)
-    total_mass_conc = np.sum(mass_conc)
+    total_mass_conc = np.sum(mass_conc, axis=-1, keepdims=True)
 
     # Number fraction of each ingredient is represented as a fraction
     # out of sum of all conc / mass ratios
     num_fracs = mass_conc / total_mass_conc
 
     return num_fracs
+
+
+def calculate_ref(ingredients, concentrations):
+    """
+    From a list of Ingredients and their concentrations in mass %,
+    generate a reference key containing the fragment symbols and
+    concentration of each non-solvent Ingredient. If concentrations
+    is a 2D array, a list containing the reference of each formulation
+    (row) is returned.
+    """
+
+    concentrations = np.asarray(concentrations, dtype=float)
+    if concentrations.ndim > 1:
+        return [
+            calculate_ref(ingredients, row) for row in concentrations]
+
+    reference = []
+    for concentration, ingredient in zip(concentrations, ingredients):
+        if ingredient.role != 'Solvent':
+            for fragment in ingredient.fragments:
+                reference.append(fragment.symbol.lower())
+            # Round each concentration to 2 decimal places using
+            # Python floats, rather than numpy, so that ties are
+            # rounded consistently with earlier references
+            reference.append(str(round(float(concentration), 2)))
+
+    return '-'.join(reference)
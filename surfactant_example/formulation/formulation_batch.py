@@ -0,0 +1,87 @@
+import numpy as np
+
+from traits.api import (
+    HasTraits, Array, Property, List, Unicode, cached_property
+)
+
+from surfactant_example.ingredient.ingredient import Ingredient
+
+from .formulation import (
+    Formulation, calculate_num_fractions, calculate_price, calculate_ref
+)
+
+
+class FormulationBatch(HasTraits):
+    """Collection of formulations sharing the same Ingredients, that
+    differ only by concentration. Derived values are calculated for
+    all formulations in single vectorised operations."""
+
+    # List of constituent chemical Ingredient objects, shared by all
+    # formulations in the batch
+    ingredients = List(Ingredient)
+
+    # Concentrations by mass % for each Ingredient (columns) in each
+    # formulation (rows)
+    concentrations = Array(dtype=float, shape=(None, None))
+
+    # Array of masses for each Ingredient
+    ingredient_masses = Property(Array, depends_on='ingredients.mass')
+
+    # Array of prices in $USD / kg for each Ingredient
+    ingredient_prices = Property(Array, depends_on='ingredients.price')
+
+    # Number fractions for each Ingredient in each formulation
+    num_fractions = Property(
+        Array, depends_on='ingredient_masses,concentrations')
+
+    # Total price of each formulation in $USD / kg
+    price = Property(
+        Array, depends_on='ingredient_prices,concentrations')
+
+    # Reference key of each formulation
+    ref = Property(
+        List(Unicode),
+        depends_on='ingredients.role,ingredients.fragments.symbol,'
+                   'concentrations')
+
+    def __len__(self):
+        return self.concentrations.shape[0]
+
+    @cached_property
+    def _get_ingredient_masses(self):
+        return np.array(
+            [ingredient.mass for ingredient in self.ingredients],
+            dtype=float)
+
+    @cached_property
+    def _get_ingredient_prices(self):
+        return np.array(
+            [ingredient.price for ingredient in self.ingredients],
+            dtype=float)
+
+    @cached_property
+    def _get_num_fractions(self):
+        return calculate_num_fractions(
+            self.ingredient_masses, self.concentrations)
+
+    @cached_property
+    def _get_price(self):
+        return calculate_price(
+            self.ingredient_prices, self.concentrations)
+
+    @cached_property
+    def _get_ref(self):
+        return calculate_ref(self.ingredients, self.concentrations)
+
+    def formulation(self, index):
+        """Return a Formulation object for a single point in the
+        batch"""
+        return Formulation(
+            ingredients=self.ingredients,
+            concentrations=self.concentrations[index].tolist()
+        )
+
+    def formulations(self):
+        """Return a list of Formulation objects for each point in the
+        batch"""
+        return [self.formulation(index) for index in range(len(self))]
@@ -3,6 +3,7 @@ import numpy as np
 from force_bdss.api import BaseDataSource, DataValue, Slot
 
 from .formulation import Formulation
+from .formulation_batch import FormulationBatch
 
 
 class MissingIngredientException(Exception):
@@ -49,6 +50,25 @@ class FormulationDataSource(BaseDataSource):
         # Check formulation composition
         self._check_ingredient_roles(ingredients)
 
+        if model.batch_mode:
+            # Each concentration parameter contains values for every
+            # formulation in the batch
+            concentrations = np.column_stack(
+                [np.asarray(value, dtype=float)
+                 for value in concentrations])
+
+            # Calculate missing solvent concentrations (in excess)
+            solvent_conc = calculate_solvent_conc(concentrations)
+            batch = FormulationBatch(
+                ingredients=ingredients,
+                concentrations=np.column_stack(
+                    [concentrations, solvent_conc])
+            )
+
+            return [
+                DataValue(value=batch, type='FORMULATION_BATCH')
+            ]
+
         # Calculate missing solvent concentration (in excess)
         solvent_conc = calculate_solvent_conc(concentrations)
         concentrations.append(solvent_conc)
@@ -74,27 +94,33 @@ class FormulationDataSource(BaseDataSource):
                      type="CONCENTRATION"))
 
         input_slots += (
-            Slot(description=f"Salt data", type="INGREDIENT"),
-            Slot(description=f"Salt concentration", type="CONCENTRATION"),
-            Slot(description=f"Solvent data", type="INGREDIENT")
+            Slot(description="Salt data", type="INGREDIENT"),
+            Slot(description="Salt concentration", type="CONCENTRATION"),
+            Slot(description="Solvent data", type="INGREDIENT")
         )
 
-        return (
-            input_slots,
-            (
-                Slot(description=f"Chemical formulation",
+        if model.batch_mode:
+            output_slots = (
+                Slot(description="Batch of chemical formulations",
+                     type="FORMULATION_BATCH"),
+            )
+        else:
+            output_slots = (
+                Slot(description="Chemical formulation",
                      type="FORMULATION"),
             )
-        )
+
+        return input_slots, output_slots
 
 
 def calculate_solvent_conc(concentrations):
     """Calculate solvent concentration from concentrations of other
-    ingredients"""
+    ingredients. If concentrations is a 2D array, the solvent
+    concentration of each formulation (row) is returned."""
 
-    solvent_conc = 100 - np.sum(concentrations)
+    solvent_conc = 100 - np.sum(concentrations, axis=-1)
 
-    assert 0 < solvent_conc < 100, (
+    assert np.all((0 < solvent_conc) & (solvent_conc < 100)), (
         'Solvent concentration must be between '
         '0-100 % by weight: check input concentration'
         ' parameter values'
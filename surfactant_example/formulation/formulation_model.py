@@ -1,4 +1,4 @@
-from traits.api import Int
+from traits.api import Bool, Int
 
 from force_bdss.api import BaseDataSourceModel
 
@@ -10,3 +10,9 @@ class FormulationDataSourceModel(BaseDataSourceModel):
         1,
         desc="Number of surfactant chemical ingredients in formulation",
         changes_slots=True)
+
+    batch_mode = Bool(
+        False,
+        desc="Whether to emit a batch of formulations, using a "
+             "sequence of values for each concentration parameter",
+        changes_slots=True)
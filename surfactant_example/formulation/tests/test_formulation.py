@@ -31,6 +31,34 @@ class TestFormulation(TestCase):
         for expect, value in zip(expected, self.formulation.num_fractions):
             self.assertAlmostEqual(expect, value)
 
+    def test_ingredient_arrays(self):
+
+        self.assertListEqual(
+            [12, 4, 0.5, 83.5],
+            self.formulation.ingredient_concentrations.tolist())
+        self.assertListEqual(
+            [140, 120, 50, 18],
+            self.formulation.ingredient_masses.tolist())
+        self.assertListEqual(
+            [100, 200, 1, 0.5],
+            self.formulation.ingredient_prices.tolist())
+
+    def test_cached_properties(self):
+
+        num_fractions = self.formulation.num_fractions
+        masses = self.formulation.ingredient_masses
+        self.assertIs(num_fractions, self.formulation.num_fractions)
+        self.assertIs(masses, self.formulation.ingredient_masses)
+
+        # Updating concentrations only invalidates dependent values
+        self.formulation.concentrations[0] = 10
+        self.assertIsNot(num_fractions, self.formulation.num_fractions)
+        self.assertIs(masses, self.formulation.ingredient_masses)
+
+        price = self.formulation.price
+        self.formulation.ingredients[0].price = 1000
+        self.assertNotEqual(price, self.formulation.price)
+
     def test_calculate_num_fractions(self):
         masses = [100, 200]
         concentrations = [1, 1]
@@ -79,6 +107,19 @@ class TestFormulation(TestCase):
         self.assertIsInstance(fragments[0], GromacsFragment)
         self.assertIsInstance(fragments[1], GromacsFragment)
 
+    def test_ingredient_indices(self):
+
+        self.assertListEqual(
+            [0, 1], self.formulation.ingredient_indices(['Surfactant']))
+        self.assertListEqual(
+            [2, 3],
+            self.formulation.ingredient_indices(['Salt', 'Solvent']))
+
+        self.formulation.ingredients.append(
+            self.formulation.ingredients[0])
+        self.assertListEqual(
+            [0, 1], self.formulation.ingredient_indices(['Surfactant']))
+
     def test_ingredient_search(self):
 
         surfactants = self.formulation.ingredient_search(['Surfactant'])
@@ -0,0 +1,63 @@
+from unittest import TestCase
+
+import numpy as np
+
+from surfactant_example.formulation.formulation_batch import (
+    FormulationBatch)
+from surfactant_example.tests.probe_classes.probe_formulations import (
+    ProbeFormulation)
+
+
+class TestFormulationBatch(TestCase):
+
+    def setUp(self):
+        self.formulation = ProbeFormulation()
+        self.batch = FormulationBatch(
+            ingredients=self.formulation.ingredients,
+            concentrations=[[12, 4, 0.5, 83.5],
+                            [3.333, 12, 0.5, 84.167]]
+        )
+
+    def test_init_(self):
+        self.assertEqual(2, len(self.batch))
+        self.assertEqual((2, 4), self.batch.num_fractions.shape)
+        self.assertEqual((2,), self.batch.price.shape)
+        self.assertListEqual(
+            ['ps1-pi-12.0-ss-4.0-pi-ni-0.5',
+             'ps1-pi-3.33-ss-12.0-pi-ni-0.5'],
+            self.batch.ref)
+
+    def test_ref_rounding(self):
+        # Concentrations that lie on a rounding tie are rounded in
+        # the same way as Python floats
+        self.batch.concentrations = [[0.015, 2.675, 1.115, 96.195]]
+
+        self.assertListEqual(
+            ['ps1-pi-0.01-ss-2.67-pi-ni-1.11'], self.batch.ref)
+        self.assertEqual(
+            self.batch.ref[0], self.batch.formulations()[0].ref)
+
+    def test_formulations(self):
+
+        formulations = self.batch.formulations()
+        self.assertEqual(2, len(formulations))
+
+        # Batch values are consistent with individual formulations
+        self.assertEqual(self.formulation.ref, formulations[0].ref)
+        for index, formulation in enumerate(formulations):
+            self.assertEqual(self.batch.ref[index], formulation.ref)
+            self.assertAlmostEqual(
+                self.batch.price[index], formulation.price)
+            np.testing.assert_allclose(
+                self.batch.num_fractions[index],
+                formulation.num_fractions)
+
+    def test_cached_properties(self):
+
+        num_fractions = self.batch.num_fractions
+        self.assertIs(num_fractions, self.batch.num_fractions)
+
+        self.batch.concentrations = [[10, 4, 0.5, 85.5]]
+        self.assertIsNot(num_fractions, self.batch.num_fractions)
+        self.assertListEqual(
+            ['ps1-pi-10.0-ss-4.0-pi-ni-0.5'], self.batch.ref)
@@ -46,6 +46,36 @@ class TestFormulationDataSource(UnittestTools, TestCase):
         self.assertEqual(3, len(formulation.ingredients))
         self.assertListEqual([12, 1, 87], formulation.concentrations)
 
+    def test_batch_mode(self):
+
+        model = self.factory.create_model()
+        model.batch_mode = True
+        in_slots, out_slots = self.data_source.slots(model)
+
+        self.assertEqual('FORMULATION_BATCH', out_slots[0].type)
+
+        input_values = [
+            ProbePrimaryIngredient(), [12, 6],
+            ProbeSaltIngredient(), [1.0, 2.0],
+            ProbeSolventIngredient()
+        ]
+
+        data_values = [
+            DataValue(type=slot.type, value=value)
+            for slot, value in zip(in_slots, input_values)
+        ]
+
+        res = self.data_source.run(model, data_values)
+
+        self.assertEqual(1, len(res))
+        self.assertEqual('FORMULATION_BATCH', res[0].type)
+
+        batch = res[0].value
+        self.assertEqual(2, len(batch))
+        self.assertEqual(3, len(batch.ingredients))
+        self.assertListEqual(
+            [[12, 1, 87], [6, 2, 92]], batch.concentrations.tolist())
+
     def test__check_ingredient_roles(self):
         ingredients = [
             ProbePrimaryIngredient(),
@@ -77,6 +107,11 @@ class TestFormulationDataSource(UnittestTools, TestCase):
                 [-100, 3, 6]
             )
 
+        solvent_conc = calculate_solvent_conc(
+            [[10, 3, 6], [20, 5, 5]]
+        )
+        self.assertListEqual([81, 70], solvent_conc.tolist())
+
     def test_n_surfactants_slots(self):
 
         model = self.factory.create_model()
@@ -1 +1,2 @@
 from .ingredient import Ingredient # noqa
+from .ingredient_proxy import IngredientProxy # noqa
@@ -0,0 +1,92 @@
+from traits.api import (
+    HasStrictTraits, Bool, Callable, Enum, Float, Instance, Int, List,
+    Property, Unicode
+)
+from traitsui.api import View, Item, Readonly
+
+from .ingredient import Ingredient
+
+
+class IngredientProxy(HasStrictTraits):
+    """Lightweight stand-in for an Ingredient, that exposes its name,
+    role and price immediately, but only loads the full Ingredient (and
+    therefore its fragments and topology data) on first access to any
+    other attribute"""
+
+    #: Name of ingredient
+    name = Unicode()
+
+    #: Role of ingredient in simulation
+    role = Enum('Surfactant', 'Salt', 'Solvent')
+
+    #: Price of Ingredient in $USD / kg
+    price = Float()
+
+    #: Callable that returns the full Ingredient
+    loader = Callable()
+
+    #: Full Ingredient, once loaded
+    _ingredient = Instance(Ingredient)
+
+    # --------------------
+    #     Properties
+    # --------------------
+
+    #: Full Ingredient, loaded on first access
+    ingredient = Property(Instance(Ingredient))
+
+    #: Whether the full Ingredient has been loaded
+    is_loaded = Property(Bool)
+
+    #: Fragments of full Ingredient
+    fragments = Property(List)
+
+    #: Mass of full Ingredient
+    mass = Property(Float)
+
+    #: Total number of atoms in full Ingredient molecule
+    atom_count = Property(Int)
+
+    def default_traits_view(self):
+        """Returns a traits view with all visible UI objects. This is
+        mainly used by the SurfactantContributedUI class"""
+        return View(
+            Readonly("name"),
+            Readonly("mass"),
+            Item("price")
+        )
+
+    # --------------------
+    #     Listeners
+    # --------------------
+
+    def _get_ingredient(self):
+        if self._ingredient is None:
+            self._ingredient = self.loader()
+            self._ingredient.price = self.price
+        return self._ingredient
+
+    def _get_is_loaded(self):
+        return self._ingredient is not None
+
+    def _get_fragments(self):
+        return self.ingredient.fragments
+
+    def _get_mass(self):
+        return self.ingredient.mass
+
+    def _get_atom_count(self):
+        return self.ingredient.atom_count
+
+    def _price_changed(self, new):
+        if self.is_loaded:
+            self._ingredient.price = new
+
+    # --------------------
+    #   Public Methods
+    # --------------------
+
+    def get_data_values(self):
+        """Return a list containing all DataValues stored in the full
+        Ingredient"""
+        return self.ingredient.get_data_values()
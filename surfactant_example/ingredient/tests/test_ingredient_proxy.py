@@ -0,0 +1,47 @@
+from unittest import TestCase, mock
+
+from surfactant_example.ingredient import IngredientProxy
+from surfactant_example.tests.probe_classes.probe_ingredients import (
+    ProbePrimaryIngredient,
+)
+
+
+class TestIngredientProxy(TestCase):
+
+    def setUp(self):
+        self.ingredient = ProbePrimaryIngredient()
+        self.loader = mock.Mock(return_value=self.ingredient)
+        self.proxy = IngredientProxy(
+            name=self.ingredient.name,
+            role=self.ingredient.role,
+            price=5.0,
+            loader=self.loader
+        )
+
+    def test_lazy_loading(self):
+
+        self.assertEqual(self.ingredient.name, self.proxy.name)
+        self.assertEqual(self.ingredient.role, self.proxy.role)
+        self.assertEqual(5.0, self.proxy.price)
+        self.assertFalse(self.proxy.is_loaded)
+        self.loader.assert_not_called()
+
+        self.assertEqual(2, len(self.proxy.fragments))
+        self.assertTrue(self.proxy.is_loaded)
+        self.assertEqual(140, self.proxy.mass)
+        self.assertEqual(3, self.proxy.atom_count)
+        self.assertIs(self.ingredient, self.proxy.ingredient)
+        self.loader.assert_called_once_with()
+
+    def test_price(self):
+
+        self.assertEqual(5.0, self.proxy.ingredient.price)
+
+        self.proxy.price = 7.0
+        self.assertEqual(7.0, self.ingredient.price)
+
+    def test_get_data_values(self):
+
+        data_values = self.proxy.get_data_values()
+        self.assertEqual(self.ingredient.name, data_values[0].value)
+        self.assertEqual(5.0, data_values[1].value)
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import os
+import signal
+
+from traits.api import HasStrictTraits, Any, Dict, Int
+
+from force_bdss.api import DataValue, ExecutionLayer
+from force_gromacs.api import BaseGromacsCommand
+
+from surfactant_example.simulation.simulation_model import SimulationModel
+from surfactant_example.simulation.stage_cache import CachedStage
+
+from .scheduler import EventRecorder
+
+log = logging.getLogger(__name__)
+
+#: Seconds to wait for a terminated Gromacs process to exit before
+#: it is killed
+TERMINATE_TIMEOUT = 10
+
+
+async def run_command(command):
+    """Runs the bash script of a Gromacs command in its own process
+    group. If cancelled, the whole process group is terminated, so that
+    no Gromacs processes (including MPI ranks) are left running.
+
+    Raises
+    ------
+    RuntimeError
+        If the command exits with a non-zero return code
+    """
+
+    process = await asyncio.create_subprocess_shell(
+        command.bash_script(), start_new_session=True)
+
+    try:
+        return_code = await process.wait()
+    except asyncio.CancelledError:
+        await kill_process_group(process)
+        raise
+
+    if return_code != 0:
+        raise RuntimeError(
+            f"Gromacs command '{command.bash_script()}' "
+            f"exited with return code {return_code}")
+
+
+async def kill_process_group(process):
+    """Terminates the process group led by process, and kills it if it
+    does not exit within TERMINATE_TIMEOUT seconds"""
+
+    if process.returncode is not None:
+        return
+
+    log.info(f"Terminating Gromacs process group {process.pid}")
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        await asyncio.wait_for(process.wait(), TERMINATE_TIMEOUT)
+    except asyncio.TimeoutError:
+        os.killpg(process.pid, signal.SIGKILL)
+        await process.wait()
+    except ProcessLookupError:
+        pass
+
+
+async def run_pipeline(pipeline, loop=None):
+    """Runs each step of a Gromacs pipeline in turn. Gromacs commands
+    are run as child processes without blocking the event loop, while
+    all other steps (writing file trees and topologies, or restoring
+    cached outputs) are run in the default executor."""
+
+    if loop is None:
+        loop = asyncio.get_event_loop()
+
+    for name, step in pipeline.steps:
+        if isinstance(step, CachedStage):
+            entry = await loop.run_in_executor(
+                None, step.cache.restore, step.command)
+            if entry is not None:
+                await run_command(step.command)
+                await loop.run_in_executor(
+                    None, step.cache.store, step.command, entry)
+        elif isinstance(step, BaseGromacsCommand):
+            await run_command(step)
+        else:
+            await loop.run_in_executor(None, step.run)
+
+
+class AsyncWorkflowRunner(HasStrictTraits):
+    """Evaluates a workflow for many MCO points as asyncio coroutines.
+    Gromacs simulations are run as child processes, limited to
+    `n_simulations` at once, while all other data sources run in the
+    default executor. The analysis and reporting of one point can
+    therefore overlap with the simulation of the next."""
+
+    #: Workflow to evaluate
+    workflow = Any()
+
+    #: Maximum number of Gromacs simulations run at once
+    n_simulations = Int(1)
+
+    #: Maximum number of points evaluated at once
+    n_points = Int(2)
+
+    #: Limits the number of concurrent simulations
+    _simulation_slots = Any()
+
+    #: Locks held while simulating in each experiment folder, so that
+    #: points with the same formulation reference never share one
+    _folder_locks = Dict()
+
+    async def _run_simulation(self, model, data_values, loop):
+        """Builds and runs the Gromacs pipeline for a simulation data
+        source model, returning the results file as its output.
+        Simulations already stored in a KPI memo are not run again, and
+        those that share an experiment folder are run one at a time."""
+
+        data_source = model.factory.create_data_source()
+        values = {
+            data_value.name: data_value
+            for data_value in data_values
+        }
+        parameters = [values[info.name] for info in model.input_slot_info]
+
+        folder = data_source.experiment_folder(model, parameters[0].value)
+        async with self._folder_locks.setdefault(folder, asyncio.Lock()):
+            key, results_path = await loop.run_in_executor(
+                None, data_source.lookup_simulation, model, parameters)
+
+            if results_path is None:
+                builder = await loop.run_in_executor(
+                    None, data_source.create_simulation_builder, model,
+                    parameters)
+                pipeline = await loop.run_in_executor(
+                    None, builder.build_pipeline)
+
+                async with self._simulation_slots:
+                    log.info(f"Running simulation {builder.name}")
+                    await run_pipeline(pipeline, loop=loop)
+
+                results_path = builder.get_results_path()
+                await loop.run_in_executor(
+                    None, data_source.record_simulation, model, key,
+                    results_path)
+
+        outputs = data_source.results_data_values(model, results_path)
+        for data_value, info in zip(outputs, model.output_slot_info):
+            data_value.name = info.name
+
+        return outputs
+
+    async def evaluate(self, parameter_values):
+        """Evaluates the workflow for a single MCO point
+
+        Returns
+        -------
+        kpis: list
+            KPI values of point
+        events: list of tuple
+            Data source models and the events they emitted during
+            evaluation
+        """
+
+        loop = asyncio.get_event_loop()
+        mco_model = self.workflow.mco_model
+
+        # Run data sources on private copies of their models, holding
+        # back any events they emit
+        recorder = EventRecorder(self.workflow)
+
+        data_values = [
+            DataValue(value=value, name=parameter.name)
+            for parameter, value in zip(
+                mco_model.parameters, parameter_values)
+        ]
+
+        for layer in self.workflow.execution_layers:
+            outputs = []
+            for model in layer.data_sources:
+                if isinstance(model, SimulationModel) and not model.dry_run:
+                    outputs += await self._run_simulation(
+                        model, data_values, loop)
+                else:
+                    model_layer = ExecutionLayer(
+                        data_sources=recorder.copy_layer([model]))
+                    outputs += await loop.run_in_executor(
+                        None, model_layer.execute_layer, data_values)
+            data_values += outputs
+
+        values = {
+            data_value.name: data_value.value
+            for data_value in data_values
+        }
+        kpis = [values[kpi.name] for kpi in mco_model.kpis]
+
+        return kpis, recorder.pop_events()
+
+    async def evaluate_all(self, points, report):
+        """Evaluates every point, keeping at most `n_points` in flight,
+        and passes each point, its KPIs and the events held back during
+        its evaluation to report in completion order. If any evaluation
+        fails, or the run is cancelled, all remaining evaluations are
+        cancelled along with their Gromacs processes."""
+
+        self._simulation_slots = asyncio.Semaphore(self.n_simulations)
+        points = iter(points)
+        in_flight = {}
+
+        def submit_next():
+            try:
+                point = next(points)
+            except StopIteration:
+                return
+            in_flight[asyncio.ensure_future(self.evaluate(point))] = point
+
+        for _ in range(self.n_points):
+            submit_next()
+
+        try:
+            while in_flight:
+                done, _ = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    point = in_flight.pop(task)
+                    kpis, events = task.result()
+                    submit_next()
+                    report(point, kpis, events)
+        finally:
+            for task in in_flight:
+                task.cancel()
+            if in_flight:
+                await asyncio.wait(in_flight)
+
+    def run(self, points, report):
+        """Runs `evaluate_all` to completion in a new event loop. If
+        interrupted, all evaluations in flight are cancelled before
+        returning."""
+
+        loop = asyncio.new_event_loop()
+        # Attach the loop to the child process watcher
+        asyncio.set_event_loop(loop)
+        try:
+            main = loop.create_task(self.evaluate_all(points, report))
+            try:
+                loop.run_until_complete(main)
+            except BaseException:
+                main.cancel()
+                loop.run_until_complete(
+                    asyncio.wait([main]))
+                raise
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
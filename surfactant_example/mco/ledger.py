@@ -0,0 +1,111 @@
+import hashlib
+import json
+import logging
+import os
+
+from traits.api import HasStrictTraits, Bool, Dict, Int, Property, Unicode
+
+log = logging.getLogger(__name__)
+
+
+def _json_default(value):
+    """Converts numpy scalars into their equivalent Python types, so
+    that they can be serialised"""
+    try:
+        return value.item()
+    except AttributeError:
+        raise TypeError(
+            f"Object of type {type(value).__name__} "
+            "is not JSON serializable")
+
+
+def point_key(parameter_values):
+    """Returns a key identifying an MCO point, as the SHA1 digest of
+    its JSON serialised parameter values"""
+
+    serialised = json.dumps(
+        list(parameter_values), default=_json_default)
+
+    return hashlib.sha1(serialised.encode('utf-8')).hexdigest()
+
+
+class EvaluationLedger(HasStrictTraits):
+    """Append only record of the KPIs calculated for each MCO point,
+    stored as a JSON lines file. Each line is only written once an
+    evaluation has completed, so that an interrupted MCO run can be
+    resumed by skipping all points already in the ledger."""
+
+    #: File path of JSON lines ledger
+    file_path = Unicode()
+
+    #: Number of malformed lines skipped when loading the ledger,
+    #: for example if a previous run was killed during a write
+    n_corrupt = Int(0)
+
+    #: KPI values of each completed point, indexed by point key
+    _records = Dict()
+
+    #: Whether the last line of the ledger file is incomplete, and
+    #: so must be terminated before appending new records
+    _unterminated = Bool(False)
+
+    #: Number of completed points in the ledger
+    n_completed = Property(Int)
+
+    def _file_path_changed(self):
+        self.load()
+
+    def _get_n_completed(self):
+        return len(self._records)
+
+    def load(self):
+        """Reads all completed points from the ledger file, if it
+        exists"""
+
+        self._records = {}
+        self.n_corrupt = 0
+        self._unterminated = False
+
+        if not os.path.exists(self.file_path):
+            return
+
+        with open(self.file_path, 'r') as infile:
+            for line in infile:
+                try:
+                    record = json.loads(line)
+                    self._records[record['key']] = record['kpis']
+                except (ValueError, KeyError, TypeError):
+                    self.n_corrupt += 1
+                self._unterminated = not line.endswith('\n')
+
+        if self.n_corrupt:
+            log.warning(
+                f"Skipped {self.n_corrupt} malformed lines in "
+                f"evaluation ledger {self.file_path}")
+
+    def get(self, parameter_values):
+        """Returns the KPI values of a completed point, or None if the
+        point has not yet been evaluated"""
+        return self._records.get(point_key(parameter_values))
+
+    def record(self, parameter_values, kpis):
+        """Appends the KPI values of a completed point to the ledger,
+        flushing them to disk immediately"""
+
+        key = point_key(parameter_values)
+        line = json.dumps(
+            {'key': key,
+             'parameters': list(parameter_values),
+             'kpis': list(kpis)},
+            default=_json_default)
+
+        if self._unterminated:
+            line = '\n' + line
+            self._unterminated = False
+
+        with open(self.file_path, 'a') as outfile:
+            outfile.write(line + '\n')
+            outfile.flush()
+            os.fsync(outfile.fileno())
+
+        self._records[key] = list(kpis)
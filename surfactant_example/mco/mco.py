@@ -1,35 +1,249 @@
 import logging
+from functools import partial
 from itertools import product
 
+from traits.api import Instance
+
 from force_bdss.api import BaseMCO, DataValue
 
+from surfactant_example.data.database_model import DatabaseModel
+from surfactant_example.data.kpi_memo import get_kpi_memo
+
+from .async_evaluation import AsyncWorkflowRunner
+from .ledger import EvaluationLedger
+from .parameters.ingredient import IngredientMCOParameter
+from .prescreening import Prescreener
+from .scheduler import (
+    deliver_events, evaluate_concurrently, evaluate_workflow,
+    max_concurrent_evaluations
+)
+
 
 log = logging.getLogger(__name__)
 
 
 class MCO(BaseMCO):
+
+    #: Record of the KPIs calculated for each completed point
+    ledger = Instance(EvaluationLedger)
+
     def run(self, evaluator):
 
         parameters = evaluator.mco_model.parameters
 
         log.info("Doing MCO run")
 
-        for input_parameters in parameter_grid_generator(parameters):
+        prefetch_ingredients(evaluator)
+
+        points = parameter_grid_generator(parameters)
+
+        if evaluator.mco_model.ledger_file:
+            self.ledger = EvaluationLedger(
+                file_path=evaluator.mco_model.ledger_file)
+            points = self._skip_completed(evaluator, points)
+        else:
+            self.ledger = None
+
+        memos = workflow_kpi_memos(evaluator)
+        start_statistics = [memo.statistics() for memo in memos]
+
+        try:
+            if evaluator.mco_model.prescreen:
+                points = self._prescreen(evaluator, points)
+
+            if evaluator.mco_model.asynchronous:
+                self._run_async(evaluator, points)
+                return
+
+            for input_parameters, kpis in self._evaluate(
+                    evaluator, points):
+
+                self._notify_progress(evaluator, input_parameters, kpis)
+        finally:
+            for memo, statistics in zip(memos, start_statistics):
+                log_memo_statistics(memo, statistics)
+
+    def _skip_completed(self, evaluator, points):
+        """Report the stored KPIs of every point already in the
+        ledger, and yield only those that remain to be evaluated"""
+
+        log.info(
+            f"Resuming from {self.ledger.n_completed} points in "
+            f"evaluation ledger {self.ledger.file_path}")
+
+        for input_parameters in points:
+            kpis = self.ledger.get(input_parameters)
+            if kpis is None:
+                yield input_parameters
+            else:
+                self._notify_progress(
+                    evaluator, input_parameters, kpis, record=False)
+
+    def _prescreen(self, evaluator, points):
+        """Screen every grid point using inexpensive data sources
+        first, reporting those that fail with the KPIs calculated
+        during screening. Returns the points that passed, which
+        require a full evaluation."""
+
+        prescreener = Prescreener(workflow=evaluator)
+        results = prescreener.screen_all(points)
+
+        passed = [
+            result.parameter_values for result in results
+            if result.passed
+        ]
+        log.info(
+            f"{len(passed)} of {len(results)} points passed screening")
+
+        for result in results:
+            if not result.passed:
+                prescreener.replay_events(result)
+                self._notify_progress(
+                    evaluator, result.parameter_values, result.kpis)
+
+        return passed
+
+    def _evaluate(self, evaluator, points):
+        """Fully evaluate each point, yielding the point and its KPIs.
+        If the MCO model allows, several evaluations are kept in flight
+        at once, limited by the cores required by each simulation.
+        Results are then yielded in completion order."""
+
+        n_workers = max_concurrent_evaluations(
+            evaluator, evaluator.mco_model.n_concurrent)
+
+        if n_workers == 1:
+            for input_parameters in points:
+                yield input_parameters, evaluator.evaluate(input_parameters)
+            return
+
+        log.info(f"Running {n_workers} concurrent evaluations")
+
+        for input_parameters, kpis, events in evaluate_concurrently(
+                partial(evaluate_workflow, evaluator), points, n_workers):
+
+            # Deliver events held back during this evaluation, so
+            # that they are reported alongside its KPIs
+            deliver_events(events)
+
+            yield input_parameters, kpis
+
+    def _run_async(self, evaluator, points):
+        """Evaluate each point using asyncio coroutines, so that
+        the analysis and reporting of completed simulations overlaps
+        with the Gromacs simulations of the points that follow"""
+
+        n_simulations = max_concurrent_evaluations(
+            evaluator, evaluator.mco_model.n_concurrent)
+        runner = AsyncWorkflowRunner(
+            workflow=evaluator,
+            n_simulations=n_simulations,
+            n_points=2 * n_simulations
+        )
+
+        log.info(
+            f"Running asynchronous evaluations with up to "
+            f"{n_simulations} concurrent simulations")
+
+        def report(input_parameters, kpis, events):
+            deliver_events(events)
+            self._notify_progress(evaluator, input_parameters, kpis)
+
+        runner.run(points, report)
+
+    def _notify_progress(self, evaluator, input_parameters, kpis,
+                         record=True):
+        """Report the KPIs of a completed point, and record them in
+        the ledger if required"""
+
+        optimal_kpis = [DataValue(value=v) for v in kpis]
+        # NOTE: This is a workaround for displaying data from different
+        # ingredients in WfManager. Ultimately we should include
+        # a DataView object that can handle unicode variables
+        optimal_points = [
+            DataValue(value=v)
+            for v in input_parameters
+        ]
+
+        evaluator.mco_model.notify_progress_event(
+            optimal_points, optimal_kpis
+        )
+
+        if record and self.ledger is not None:
+            self.ledger.record(input_parameters, kpis)
+
+
+def prefetch_ingredients(workflow):
+    """Warm start the database data sources in the workflow by loading
+    every Ingredient named by an IngredientMCOParameter or database
+    model before the first evaluation
+
+    Returns
+    -------
+    ingredients: dict of str: Ingredient
+        Ingredients loaded, indexed by name
+    """
+
+    database_models = [
+        model
+        for layer in workflow.execution_layers
+        for model in layer.data_sources
+        if isinstance(model, DatabaseModel)
+    ]
+
+    names = [
+        category
+        for parameter in workflow.mco_model.parameters
+        if isinstance(parameter, IngredientMCOParameter)
+        for category in parameter.categories
+    ]
+    names += [
+        model.name for model in database_models
+        if model.input_mode == 'Model'
+    ]
+
+    if not database_models or not names:
+        return {}
+
+    # All database data sources share the same GromacsDatabase
+    data_source = database_models[0].factory.create_data_source()
+    ingredients = data_source.prefetch_ingredients(names)
+
+    log.info(f"Loaded {len(ingredients)} ingredients before evaluation")
+
+    return ingredients
+
+
+def workflow_kpi_memos(workflow):
+    """Returns all KPI memos used by data sources in the workflow"""
+
+    file_paths = {
+        model.kpi_memo_file
+        for layer in workflow.execution_layers
+        for model in layer.data_sources
+        if getattr(model, 'kpi_memo_file', '')
+    }
+
+    return [get_kpi_memo(file_path) for file_path in sorted(file_paths)]
+
 
-            kpis = evaluator.evaluate(input_parameters)
+def log_memo_statistics(memo, start_statistics):
+    """Logs the hit rates of a KPI memo since start_statistics were
+    recorded"""
 
-            optimal_kpis = [DataValue(value=v) for v in kpis]
-            # NOTE: This is a workaround for displaying data from different
-            # ingredients in WfManager. Ultimately we should include
-            # a DataView object that can handle unicode variables
-            optimal_points = [
-                DataValue(value=v)
-                for v in input_parameters
-            ]
+    statistics = memo.statistics()
+    summary = []
+    for name, label in [('simulation', 'simulations'),
+                        ('aggregation', 'aggregation numbers')]:
+        hits = (statistics[f'{name}_hits']
+                - start_statistics[f'{name}_hits'])
+        misses = (statistics[f'{name}_misses']
+                  - start_statistics[f'{name}_misses'])
+        lookups = hits + misses
+        rate = 100 * hits / lookups if lookups else 0
+        summary.append(f"{hits} / {lookups} {label} ({rate:.1f}%)")
 
-            evaluator.mco_model.notify_progress_event(
-                optimal_points, optimal_kpis
-            )
+    log.info(f"KPI memo {memo.file_path} hits: {', '.join(summary)}")
 
 
 def parameter_grid_generator(parameters):
@@ -1,4 +1,4 @@
-from traits.api import Enum
+from traits.api import Bool, Enum, Unicode
 from traitsui.api import View, Item
 
 from force_bdss.api import BaseMCOModel, PositiveInt
@@ -10,5 +10,34 @@ class MCOModel(BaseMCOModel):
 
     evaluation_mode = Enum("Internal", "Subprocess")
 
+    prescreen = Bool(
+        False,
+        desc="Screen all points using inexpensive data sources, and "
+             "only run simulations for those that pass")
+
+    n_concurrent = PositiveInt(
+        1,
+        desc="Maximum number of points evaluated concurrently. Limited "
+             "so that the cores used by all simulations do not exceed "
+             "those available")
+
+    asynchronous = Bool(
+        False,
+        desc="Evaluate points as asyncio coroutines, overlapping the "
+             "analysis of each point with the simulation of the next. "
+             "Up to n_concurrent simulations are run at once")
+
+    ledger_file = Unicode(
+        desc="JSON lines file recording the KPIs of every evaluated "
+             "point. Points already in the file are skipped, so that an "
+             "interrupted run can be resumed. Disabled if left empty")
+
     def default_traits_view(self):
-        return View(Item("num_points"), Item("evaluation_mode"))
+        return View(
+            Item("num_points"),
+            Item("evaluation_mode"),
+            Item("prescreen"),
+            Item("n_concurrent"),
+            Item("asynchronous"),
+            Item("ledger_file")
+        )
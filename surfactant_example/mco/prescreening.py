@@ -0,0 +1,362 @@
+import logging
+import numbers
+from collections import defaultdict
+
+import numpy as np
+from traits.api import (
+    HasStrictTraits, Any, Bool, List, Property, Tuple, Type, Unicode,
+    cached_property
+)
+
+from force_bdss.api import DataValue, ExecutionLayer
+from force_gromacs.data_sources.simulation.simulation_model import (
+    SimulationDataSourceModel)
+
+from surfactant_example.cost.cost_model import CostDataSourceModel
+from surfactant_example.formulation.formulation import Formulation
+from surfactant_example.formulation.formulation_data_source import (
+    MissingIngredientException
+)
+from surfactant_example.simulation.simulation_utilities import (
+    calculate_n_mols
+)
+
+from .driver_events import KPIProgressEvent
+from .scheduler import EventRecorder, deliver_events
+
+log = logging.getLogger(__name__)
+
+#: Errors raised for MCO points that describe an invalid formulation,
+#: such as concentrations that cannot be simulated or a missing
+#: ingredient role. Any other error is re-raised during screening.
+SCREENING_ERRORS = (AssertionError, MissingIngredientException)
+
+
+class ScreeningResult(HasStrictTraits):
+    """Outcome of evaluating the cheap data sources in a workflow
+    for a single MCO point"""
+
+    #: Values of each MCO parameter
+    parameter_values = Tuple()
+
+    #: Whether the point should proceed to a full evaluation
+    passed = Bool(True)
+
+    #: KPI values calculated during screening, in the same order as
+    #: the MCO model KPIs. KPIs that require a full evaluation are None
+    kpis = List()
+
+    #: Data source models and the events they emitted during
+    #: screening
+    events = List(Tuple(Any, Any))
+
+    #: Reason for failing screening
+    reason = Unicode()
+
+    #: Whether the point failed using a cost surface, without
+    #: evaluating any data sources
+    pruned = Bool(False)
+
+
+class Prescreener(HasStrictTraits):
+    """Evaluates only the inexpensive data sources in a workflow, so
+    that MCO points that would fail a KPI pass mark, or could not be
+    simulated, are identified before any Gromacs simulations are run.
+
+    Simulation data sources, and any data sources that depend on
+    their outputs, are excluded from screening. Instead the formulation
+    provided to each simulation is checked for a valid number of
+    molecules.
+
+    If the workflow contains cost data sources, the cost of every
+    point sharing the same ingredients is calculated analytically over
+    the grid of concentration parameters, once a formulation of those
+    ingredients has been screened. Points that fail a cost threshold
+    are then pruned without evaluating any data sources."""
+
+    #: Workflow to be screened
+    workflow = Any()
+
+    #: Data source model types that are too expensive to screen
+    expensive_models = Tuple((SimulationDataSourceModel,))
+
+    #: Data source model types whose KPIs can be calculated over a
+    #: whole grid of concentrations by their cost surface
+    cost_models = List(Type(), value=[CostDataSourceModel])
+
+    #: Data source models evaluated during screening, grouped by
+    #: execution layer
+    screening_layers = Property(List(List), depends_on='workflow')
+
+    #: Expensive data source models that are skipped during screening
+    skipped_models = Property(List, depends_on='workflow')
+
+    #: Cost data source models evaluated during screening
+    screening_cost_models = Property(List, depends_on='workflow')
+
+    #: Screening and skipped data source models
+    _partition = Property(Tuple, depends_on='workflow')
+
+    @cached_property
+    def _get__partition(self):
+        """Split the data sources in each execution layer into those
+        that can be screened and those that must be skipped"""
+
+        expensive_names = set()
+        screening_layers = []
+        skipped_models = []
+
+        for layer in self.workflow.execution_layers:
+            screening_models = []
+            for model in layer.data_sources:
+                input_names = {
+                    info.name for info in model.input_slot_info}
+
+                if (isinstance(model, self.expensive_models)
+                        or input_names & expensive_names):
+                    expensive_names.update(
+                        info.name for info in model.output_slot_info)
+                    skipped_models.append(model)
+                else:
+                    screening_models.append(model)
+
+            screening_layers.append(screening_models)
+
+        return screening_layers, skipped_models
+
+    def _get_screening_layers(self):
+        return self._partition[0]
+
+    def _get_skipped_models(self):
+        return self._partition[1]
+
+    def _get_screening_cost_models(self):
+        return [
+            model for layer in self.screening_layers for model in layer
+            if isinstance(model, tuple(self.cost_models))
+        ]
+
+    def _check_simulations(self, data_values):
+        """Ensure that formulations passed into each skipped simulation
+        contain a non-zero number of each molecule"""
+
+        values = {
+            data_value.name: data_value.value
+            for data_value in data_values
+        }
+
+        for model in self.skipped_models:
+            if not isinstance(model, SimulationDataSourceModel):
+                continue
+            for info in model.input_slot_info:
+                if info.name in values:
+                    calculate_n_mols(
+                        model.size, values[info.name].num_fractions)
+
+    def screen(self, parameter_values):
+        """Evaluate all screening data sources for a single point
+
+        Parameters
+        ----------
+        parameter_values: tuple
+            Values of each MCO parameter
+
+        Returns
+        -------
+        result: ScreeningResult
+            Whether the point passed screening, with any KPIs that
+            were calculated
+        """
+        return self._screen(parameter_values)[0]
+
+    def _screen(self, parameter_values):
+        """Evaluate all screening data sources for a single point,
+        returning the ScreeningResult along with the values of all
+        data values calculated, indexed by name"""
+
+        mco_model = self.workflow.mco_model
+        result = ScreeningResult(parameter_values=tuple(parameter_values))
+
+        data_values = [
+            DataValue(value=value, name=parameter.name)
+            for parameter, value in zip(
+                mco_model.parameters, parameter_values)
+        ]
+
+        # Hold back all events until they are replayed for failing
+        # points, so that listeners receive them only once
+        recorder = EventRecorder(self.workflow)
+        try:
+            for layer in self.screening_layers:
+                data_values += ExecutionLayer(
+                    data_sources=recorder.copy_layer(layer)
+                ).execute_layer(data_values)
+            self._check_simulations(data_values)
+        except SCREENING_ERRORS as error:
+            log.info(
+                f"Point {parameter_values} failed screening: {error}")
+            result.passed = False
+            result.reason = str(error) or type(error).__name__
+        result.events = recorder.pop_events()
+
+        for _, event in result.events:
+            if isinstance(event, KPIProgressEvent) and event.value == 'FAIL':
+                result.passed = False
+                result.reason = result.reason or f"{event.name} FAIL"
+
+        values = {
+            data_value.name: data_value.value
+            for data_value in data_values
+        }
+        result.kpis = [values.get(kpi.name) for kpi in mco_model.kpis]
+
+        return result, values
+
+    def screen_all(self, points):
+        """Evaluate all screening data sources for every point in a
+        candidate set, before any are fully evaluated. Points are
+        screened in groups that share the same categorical parameter
+        values, so that they can be pruned by a common cost surface."""
+
+        points = [tuple(parameter_values) for parameter_values in points]
+
+        if not self.screening_cost_models:
+            return [self.screen(parameter_values)
+                    for parameter_values in points]
+
+        groups = defaultdict(list)
+        for index, parameter_values in enumerate(points):
+            categories = tuple(
+                value for value in parameter_values
+                if not isinstance(value, numbers.Real))
+            groups[categories].append(index)
+
+        results = [None] * len(points)
+        for indices in groups.values():
+            self._screen_group(points, indices, results)
+
+        n_pruned = sum(result.pruned for result in results)
+        if n_pruned:
+            log.info(f"{n_pruned} points pruned using cost surfaces")
+
+        return results
+
+    def _screen_group(self, points, indices, results):
+        """Screen points that share the same categorical parameter
+        values, storing each ScreeningResult in results. Once one point
+        has produced a formulation, all remaining points that fail a
+        cost threshold are pruned using its cost surface."""
+
+        indices = list(indices)
+        surfaces = None
+        while indices and surfaces is None:
+            index = indices.pop(0)
+            results[index], values = self._screen(points[index])
+            surfaces = self._cost_surfaces(points[index], values)
+
+        for index in indices:
+            result = None
+            if surfaces is not None:
+                result = self._prune(points[index], *surfaces)
+            if result is None:
+                result = self.screen(points[index])
+            results[index] = result
+
+    def _cost_surfaces(self, parameter_values, values):
+        """Calculate the cost surface of each cost data source over
+        the grid of numerical MCO parameters, using the ingredients of
+        the formulation screened for parameter_values
+
+        Returns
+        -------
+        columns: list of int
+            Indices of numerical MCO parameters
+        surfaces: list of tuple
+            Each cost data source model, along with the cost of each
+            point in the grid and whether it passes the model
+            threshold, indexed by the numerical parameter values.
+            None is returned instead if the MCO parameters do not map
+            directly onto the concentrations of the formulation.
+        """
+
+        mco_model = self.workflow.mco_model
+        columns = [
+            index for index, value in enumerate(parameter_values)
+            if isinstance(value, numbers.Real)
+        ]
+        concentrations = [parameter_values[index] for index in columns]
+
+        surfaces = []
+        for model in self.screening_cost_models:
+            formulation = values.get(model.input_slot_info[0].name)
+            if not isinstance(formulation, Formulation):
+                return None
+
+            # Concentration parameters must be those of each
+            # non-solvent ingredient, in the same order
+            formulation_concentrations = (
+                formulation.ingredient_concentrations[:-1])
+            if (len(formulation_concentrations) != len(concentrations)
+                    or not np.allclose(
+                        formulation_concentrations, concentrations)):
+                return None
+
+            data_source = model.factory.create_data_source()
+            grid, costs, _, passing = data_source.cost_surface(
+                model, formulation.ingredients,
+                [mco_model.parameters[index].sample_values
+                 for index in columns])
+
+            surfaces.append((model, {
+                tuple(point): (cost, passed)
+                for point, cost, passed in zip(
+                    grid.tolist(), costs.tolist(), passing.tolist())
+            }))
+
+        return columns, surfaces
+
+    def _prune(self, parameter_values, columns, surfaces):
+        """Returns a failing ScreeningResult if parameter_values lie
+        on the cost surfaces and fail any cost threshold, or None if the
+        point must be screened"""
+
+        key = tuple(float(parameter_values[index]) for index in columns)
+        entries = [surface.get(key) for _, surface in surfaces]
+        if None in entries or all(passed for _, passed in entries):
+            return None
+
+        result = ScreeningResult(
+            parameter_values=parameter_values, passed=False, pruned=True)
+        mco_model = self.workflow.mco_model
+
+        solvent_conc = 100 - sum(key)
+        if not 0 < solvent_conc < 100:
+            # Formulations without a valid solvent concentration fail
+            # before their cost is calculated
+            result.reason = (
+                'Solvent concentration must be between 0-100 % by weight')
+            result.kpis = [None] * len(mco_model.kpis)
+            return result
+
+        recorder = EventRecorder(self.workflow)
+        for (model, _), (_, passed) in zip(surfaces, entries):
+            recorder.copies[model].notify_pass_mark(passed)
+        result.events = recorder.pop_events()
+
+        values = {
+            model.output_slot_info[0].name: cost
+            for (model, _), (cost, _) in zip(surfaces, entries)
+        }
+        result.kpis = [values.get(kpi.name) for kpi in mco_model.kpis]
+        result.reason = next(
+            (f"{event.name} FAIL" for _, event in result.events
+             if isinstance(event, KPIProgressEvent)
+             and event.value == 'FAIL'),
+            'Cost threshold exceeded')
+
+        return result
+
+    def replay_events(self, result):
+        """Deliver all events held back during screening of a point,
+        so that they are reported alongside its partial KPIs"""
+        deliver_events(result.events)
@@ -0,0 +1,203 @@
+import logging
+import os
+import threading
+from concurrent.futures import (
+    ThreadPoolExecutor, wait, FIRST_COMPLETED
+)
+
+from force_bdss.api import DataValue, ExecutionLayer
+from force_gromacs.data_sources.simulation.simulation_model import (
+    SimulationDataSourceModel)
+
+log = logging.getLogger(__name__)
+
+
+def simulation_cores(workflow):
+    """Returns the number of processor cores required by a single
+    evaluation of the workflow, which is the largest `n_proc` of any
+    Gromacs simulation data source it contains"""
+
+    n_procs = [
+        model.n_proc
+        for layer in workflow.execution_layers
+        for model in layer.data_sources
+        if isinstance(model, SimulationDataSourceModel)
+    ]
+
+    return max(n_procs, default=1)
+
+
+def max_concurrent_evaluations(workflow, n_requested, n_cores=None):
+    """Returns the number of workflow evaluations that can be run
+    concurrently, so that the total number of cores allocated to
+    simulations does not exceed those available
+
+    Parameters
+    ----------
+    workflow: Workflow
+        Workflow to evaluate
+    n_requested: int
+        Maximum number of concurrent evaluations requested
+    n_cores: int, optional
+        Number of processor cores available. Defaults to all cores
+        on the current machine
+
+    Returns
+    -------
+    n_workers: int
+        Number of concurrent evaluations, K, such that
+        K * n_proc <= n_cores
+    """
+
+    if n_requested <= 1:
+        return 1
+
+    if n_cores is None:
+        n_cores = os.cpu_count() or 1
+
+    n_available = max(1, n_cores // simulation_cores(workflow))
+
+    return max(1, min(n_requested, n_available))
+
+
+class EventRecorder:
+    """Holds back the events emitted by the data source models of a
+    workflow during a single evaluation. Data sources are run on
+    private copies of the workflow models, whose events are recorded
+    by a listener instead of reaching any listeners of the workflow.
+    Shared models are therefore never modified by worker threads, and
+    the recorded events can be delivered exactly once, on the main
+    thread, alongside the point that generated them."""
+
+    def __init__(self, workflow):
+        self._events = []
+        self._lock = threading.Lock()
+        #: Private copy of each workflow data source model
+        self.copies = {
+            model: self._copy_model(model)
+            for layer in workflow.execution_layers
+            for model in layer.data_sources
+        }
+
+    def _copy_model(self, model):
+        """Returns a copy of a data source model that shares all of its
+        trait values, but records its events"""
+
+        copy = model.clone_traits(traits='all')
+
+        def record_event(event):
+            with self._lock:
+                self._events.append((model, event))
+
+        copy.on_trait_change(record_event, 'event')
+        return copy
+
+    def copy_layer(self, models):
+        """Returns the private copies of a list of data source models"""
+        return [self.copies[model] for model in models]
+
+    def pop_events(self):
+        """Remove and return all recorded events, along with the
+        original data source models that emitted them"""
+        with self._lock:
+            events, self._events = self._events, []
+        return events
+
+
+def deliver_events(events):
+    """Notify each recorded event on the data source model that emitted
+    it. Must be called on the main thread, so that listeners never
+    receive events concurrently."""
+    for model, event in events:
+        model.notify(event)
+
+
+def evaluate_workflow(workflow, parameter_values):
+    """Evaluates a workflow for a single MCO point on private copies of
+    its data source models, so that several points can be evaluated
+    concurrently
+
+    Returns
+    -------
+    kpis: list
+        KPI values of point
+    events: list of tuple
+        Data source models and the events they emitted during
+        evaluation
+    """
+
+    recorder = EventRecorder(workflow)
+    mco_model = workflow.mco_model
+
+    data_values = [
+        DataValue(value=value, name=parameter.name)
+        for parameter, value in zip(
+            mco_model.parameters, parameter_values)
+    ]
+
+    for layer in workflow.execution_layers:
+        data_values += ExecutionLayer(
+            data_sources=recorder.copy_layer(layer.data_sources)
+        ).execute_layer(data_values)
+
+    values = {
+        data_value.name: data_value.value
+        for data_value in data_values
+    }
+    kpis = [values[kpi.name] for kpi in mco_model.kpis]
+
+    return kpis, recorder.pop_events()
+
+
+def evaluate_concurrently(evaluate, points, n_workers):
+    """Evaluates a sequence of points using a pool of threads, keeping
+    at most n_workers evaluations in flight. Each evaluation is expected
+    to spend most of its time waiting on external Gromacs processes.
+    Data source models are shared between threads, so each evaluation
+    should run on its own copies, for example using
+    `evaluate_workflow`.
+
+    Parameters
+    ----------
+    evaluate: callable
+        Returns KPI values for a single point, along with the events
+        held back during its evaluation
+    points: iterable
+        Points to evaluate
+    n_workers: int
+        Maximum number of concurrent evaluations
+
+    Yields
+    ------
+    point: tuple
+        Original point that was evaluated
+    kpis: list
+        KPI values of point
+    events: list of tuple
+        Data source models and the events they emitted while
+        evaluating point
+    """
+
+    points = iter(points)
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        in_flight = {}
+
+        def submit_next():
+            try:
+                point = next(points)
+            except StopIteration:
+                return
+            in_flight[executor.submit(evaluate, point)] = point
+
+        for _ in range(n_workers):
+            submit_next()
+
+        # Report results in completion order, topping up the pool
+        # as each evaluation finishes
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                point = in_flight.pop(future)
+                kpis, events = future.result()
+                submit_next()
+                yield point, kpis, events
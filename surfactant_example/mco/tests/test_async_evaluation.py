@@ -0,0 +1,235 @@
+import asyncio
+import os
+import tempfile
+import time
+from unittest import TestCase, mock
+
+from force_bdss.api import DataValue
+from force_gromacs.api import BaseGromacsCommand
+
+from surfactant_example.mco.async_evaluation import (
+    AsyncWorkflowRunner, run_command, run_pipeline
+)
+from surfactant_example.simulation.simulation_model import SimulationModel
+
+
+class ProbeCommand:
+    """Mimics a Gromacs command with a bash script"""
+
+    def __init__(self, script):
+        self.script = script
+
+    def bash_script(self):
+        return self.script
+
+
+class ProbeGromacsCommand(BaseGromacsCommand):
+    """Mimics a Gromacs command that cannot be cached"""
+
+    def bash_script(self):
+        return 'exit 0'
+
+
+class ProbeStep:
+    """Mimics a pipeline step that is run in Python"""
+
+    def run(self):
+        pass
+
+
+class ProbePipeline:
+
+    def __init__(self, steps):
+        self.steps = steps
+
+
+class TestAsyncEvaluation(TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def test_run_command(self):
+        self.loop.run_until_complete(run_command(ProbeCommand('exit 0')))
+
+        with self.assertRaisesRegex(RuntimeError, 'return code 3'):
+            self.loop.run_until_complete(
+                run_command(ProbeCommand('exit 3')))
+
+    def test_cancel_command(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            started = os.path.join(directory, 'started')
+            finished = os.path.join(directory, 'finished')
+            command = ProbeCommand(
+                f'(touch {started}; sleep 0.5; touch {finished}) & wait')
+
+            task = self.loop.create_task(run_command(command))
+            while not os.path.exists(started):
+                self.loop.run_until_complete(asyncio.sleep(0.01))
+
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                self.loop.run_until_complete(task)
+
+            # Child processes of the Gromacs command are also
+            # terminated before they finish
+            time.sleep(1)
+            self.assertFalse(os.path.exists(finished))
+
+    def test_run_pipeline(self):
+        step = ProbeStep()
+        with mock.patch.object(ProbeStep, 'run') as mock_run:
+            self.loop.run_until_complete(
+                run_pipeline(ProbePipeline([('dummy', step)])))
+        mock_run.assert_called_once_with()
+
+    def test_run_pipeline_gromacs_command(self):
+        command = ProbeGromacsCommand()
+        commands = []
+
+        async def run_command(command):
+            commands.append(command)
+
+        with mock.patch(
+                'surfactant_example.mco.async_evaluation.run_command',
+                side_effect=run_command):
+            self.loop.run_until_complete(
+                run_pipeline(ProbePipeline([('dummy', command)])))
+
+        # Every Gromacs command is run as a child process
+        self.assertEqual([command], commands)
+
+    def create_workflow(self):
+        formulation = mock.Mock()
+        formulation.name = 'formulation'
+        results = mock.Mock()
+        results.name = 'results'
+
+        model = mock.Mock(
+            spec=SimulationModel, dry_run=False,
+            input_slot_info=[formulation], output_slot_info=[results])
+        model.factory = mock.Mock()
+        data_source = model.factory.create_data_source.return_value
+        data_source.lookup_simulation.return_value = ('key', None)
+        data_source.results_data_values.side_effect = (
+            lambda model, results_path: [DataValue(value=results_path)])
+
+        workflow = mock.Mock()
+        workflow.execution_layers = [mock.Mock(data_sources=[model])]
+        workflow.mco_model.parameters = [formulation]
+        workflow.mco_model.kpis = [results]
+
+        return workflow, data_source
+
+    def test_evaluate_simulation(self):
+        workflow, data_source = self.create_workflow()
+        builder = data_source.create_simulation_builder.return_value
+        builder.build_pipeline.return_value = ProbePipeline(
+            [('dummy', ProbeStep())])
+        builder.get_results_path.return_value = 'results.gro'
+
+        runner = AsyncWorkflowRunner(workflow=workflow)
+        runner._simulation_slots = asyncio.Semaphore(1)
+        kpis, events = self.loop.run_until_complete(
+            runner.evaluate(('formulation value',)))
+
+        self.assertEqual(['results.gro'], kpis)
+        self.assertEqual([], events)
+        data_values = (
+            data_source.create_simulation_builder.call_args[0][1])
+        self.assertEqual('formulation value', data_values[0].value)
+        data_source.record_simulation.assert_called_once_with(
+            mock.ANY, 'key', 'results.gro')
+
+    def test_evaluate_memoised_simulation(self):
+        workflow, data_source = self.create_workflow()
+        data_source.lookup_simulation.return_value = ('key', 'memo.gro')
+
+        runner = AsyncWorkflowRunner(workflow=workflow)
+        runner._simulation_slots = asyncio.Semaphore(1)
+        kpis, _ = self.loop.run_until_complete(
+            runner.evaluate(('formulation value',)))
+
+        # Memoised simulations are not run again
+        self.assertEqual(['memo.gro'], kpis)
+        data_source.create_simulation_builder.assert_not_called()
+        data_source.record_simulation.assert_not_called()
+
+    def test_evaluate_same_folder(self):
+        workflow, data_source = self.create_workflow()
+        data_source.experiment_folder.return_value = 'folder'
+        builder = data_source.create_simulation_builder.return_value
+        builder.build_pipeline.return_value = ProbePipeline([])
+        builder.get_results_path.return_value = 'results.gro'
+
+        counts = {'active': 0, 'max': 0}
+
+        async def run_pipeline(pipeline, loop=None):
+            counts['active'] += 1
+            counts['max'] = max(counts['max'], counts['active'])
+            await asyncio.sleep(0.05)
+            counts['active'] -= 1
+
+        runner = AsyncWorkflowRunner(workflow=workflow)
+        runner._simulation_slots = asyncio.Semaphore(2)
+        with mock.patch(
+                'surfactant_example.mco.async_evaluation.run_pipeline',
+                side_effect=run_pipeline):
+            self.loop.run_until_complete(asyncio.gather(
+                runner.evaluate(('formulation value',)),
+                runner.evaluate(('formulation value',))))
+
+        # Simulations in the same experiment folder are never run
+        # at the same time
+        self.assertEqual(2, data_source.create_simulation_builder.call_count)
+        self.assertEqual(1, counts['max'])
+
+    def test_evaluate_all(self):
+
+        async def evaluate(point):
+            await asyncio.sleep(point[0])
+            return [point[0] * 2], []
+
+        runner = AsyncWorkflowRunner(n_points=2)
+        results = []
+        with mock.patch.object(
+                AsyncWorkflowRunner, 'evaluate', side_effect=evaluate):
+            self.loop.run_until_complete(runner.evaluate_all(
+                [(0.2,), (0.05,), (0.1,), (0.0,)],
+                lambda *args: results.append(args)))
+
+        # Results are reported in completion order
+        self.assertEqual(
+            [((0.05,), [0.1], []),
+             ((0.1,), [0.2], []),
+             ((0.0,), [0.0], []),
+             ((0.2,), [0.4], [])],
+            results)
+
+    def test_evaluate_all_failure(self):
+        cancelled = []
+
+        async def evaluate(point):
+            try:
+                await asyncio.sleep(point[0])
+            except asyncio.CancelledError:
+                cancelled.append(point)
+                raise
+            if point[0] == 0.0:
+                raise RuntimeError('Simulation failed')
+            return [point[0]], []
+
+        runner = AsyncWorkflowRunner(n_points=2)
+        with mock.patch.object(
+                AsyncWorkflowRunner, 'evaluate', side_effect=evaluate):
+            with self.assertRaisesRegex(RuntimeError, 'Simulation failed'):
+                self.loop.run_until_complete(runner.evaluate_all(
+                    [(10.0,), (0.0,), (10.0,)], lambda *args: None))
+
+        # The remaining evaluation in flight is cancelled
+        self.assertEqual([(10.0,)], cancelled)
@@ -0,0 +1,62 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from surfactant_example.mco.ledger import EvaluationLedger, point_key
+
+
+class TestEvaluationLedger(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, 'ledger.jsonl')
+        self.ledger = EvaluationLedger(file_path=self.file_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_point_key(self):
+        key = point_key(('Sodium Chloride', 12.0, 0.5))
+
+        self.assertEqual(40, len(key))
+        self.assertEqual(
+            key, point_key(['Sodium Chloride', np.float64(12), 0.5]))
+        self.assertNotEqual(
+            key, point_key(('Sodium Chloride', 12.0, 0.6)))
+        self.assertEqual(
+            point_key((1, 2)), point_key((np.int64(1), np.int64(2))))
+
+    def test_record(self):
+        self.assertEqual(0, self.ledger.n_completed)
+        self.assertIsNone(self.ledger.get(('A', 0.1)))
+
+        self.ledger.record(('A', 0.1), [2.5, np.float64(1.0)])
+        self.ledger.record(('B', 0.1), [None, 3])
+
+        self.assertEqual(2, self.ledger.n_completed)
+        self.assertEqual([2.5, 1.0], self.ledger.get(('A', 0.1)))
+
+        # Records persist between ledgers
+        ledger = EvaluationLedger(file_path=self.file_path)
+        self.assertEqual(2, ledger.n_completed)
+        self.assertEqual([2.5, 1.0], ledger.get(('A', 0.1)))
+        self.assertEqual([None, 3], ledger.get(('B', 0.1)))
+        self.assertIsNone(ledger.get(('C', 0.1)))
+
+    def test_truncated_ledger(self):
+        self.ledger.record(('A', 0.1), [2.5])
+        with open(self.file_path, 'a') as outfile:
+            outfile.write('{"key": "abc", "kpis"')
+
+        ledger = EvaluationLedger(file_path=self.file_path)
+        self.assertEqual(1, ledger.n_completed)
+        self.assertEqual(1, ledger.n_corrupt)
+
+        # New records are not appended to the incomplete line
+        ledger.record(('B', 0.1), [3.0])
+        ledger = EvaluationLedger(file_path=self.file_path)
+        self.assertEqual(2, ledger.n_completed)
+        self.assertEqual(1, ledger.n_corrupt)
+        self.assertEqual([3.0], ledger.get(('B', 0.1)))
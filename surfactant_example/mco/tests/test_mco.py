@@ -1,18 +1,28 @@
+import os
+import tempfile
+import threading
 from unittest import TestCase, mock
 
 from traits.testing.unittest_tools import UnittestTools
 
 from force_bdss.api import (
+    DataValue,
     FixedMCOParameterFactory,
     ListedMCOParameterFactory,
     RangedMCOParameterFactory,
     FixedMCOParameter,
+    KPISpecification,
     ListedMCOParameter,
     RangedMCOParameter,
 )
 
+from surfactant_example.data.database_model import DatabaseModel
 from surfactant_example.surfactant_plugin import SurfactantPlugin
-from surfactant_example.mco.mco import parameter_grid_generator, get_labels
+from surfactant_example.mco.ledger import EvaluationLedger
+from surfactant_example.mco.mco import (
+    parameter_grid_generator, get_labels, log_memo_statistics,
+    prefetch_ingredients, workflow_kpi_memos
+)
 from surfactant_example.mco.parameters.ingredient import (
     IngredientMCOParameter,
     IngredientMCOParameterFactory,
@@ -67,6 +77,202 @@ class TestMCO(TestCase, UnittestTools):
             self.assertEqual(expected[index][:-1], parameter[:-1])
             self.assertAlmostEqual(expected[index][-1], parameter[-1])
 
+    def test_prescreen_run(self):
+
+        self.model.parameters = self.parameters[1:]
+        self.model.prescreen = True
+
+        evaluator = mock.Mock()
+        evaluator.mco_model = self.model
+        evaluator.execution_layers = []
+        evaluator.evaluate.return_value = [1.0]
+
+        results = [
+            mock.Mock(passed=index % 2 == 0, kpis=[None], events=[],
+                      parameter_values=values)
+            for index, values in enumerate(
+                parameter_grid_generator(self.model.parameters))
+        ]
+
+        with mock.patch(
+                'surfactant_example.mco.mco.Prescreener'
+                '.screen_all', return_value=results):
+            with self.assertTraitChanges(self.model, "event", count=6):
+                self.mco.run(evaluator)
+
+        # Only passing points are fully evaluated
+        self.assertEqual(3, evaluator.evaluate.call_count)
+
+    def test_concurrent_run(self):
+
+        self.model.parameters = self.parameters[1:]
+        self.model.kpis = [
+            KPISpecification(name='viscosity_0'),
+            KPISpecification(name='viscosity_1')
+        ]
+        self.model.n_concurrent = 2
+
+        factory = self.plugin.data_source_factories[2]
+        data_source = factory.create_data_source()
+        models = [factory.create_model(), factory.create_model()]
+
+        evaluator = mock.Mock()
+        evaluator.mco_model = self.model
+        evaluator.execution_layers = [mock.Mock(data_sources=models)]
+
+        class ViscosityLayer:
+            """Runs each viscosity model on the last MCO parameter"""
+
+            def __init__(self, data_sources):
+                self.data_sources = data_sources
+
+            def execute_layer(self, data_values):
+                return [
+                    DataValue(
+                        name=f'viscosity_{index}',
+                        value=data_source.run(
+                            model, [data_values[-1]])[0].value)
+                    for index, model in enumerate(self.data_sources)
+                ]
+
+        received = []
+        for model in models:
+            model.on_trait_change(
+                lambda event: received.append(
+                    (threading.current_thread(), event.name)), 'event')
+        self.model.on_trait_change(
+            lambda event: received.append(
+                (threading.current_thread(), 'progress')), 'event')
+
+        with mock.patch(
+                'surfactant_example.mco.mco.max_concurrent_evaluations',
+                return_value=2), mock.patch(
+                'surfactant_example.mco.scheduler.ExecutionLayer',
+                ViscosityLayer):
+            self.mco.run(evaluator)
+
+        # Data sources are run on copies of the shared models
+        evaluator.evaluate.assert_not_called()
+
+        # Events emitted by each evaluation are delivered once, on the
+        # main thread, directly before the KPIs of their point
+        self.assertEqual(
+            [(threading.main_thread(), name)
+             for _ in range(6)
+             for name in ['viscosity_pass', 'viscosity_pass', 'progress']],
+            received)
+
+        # Models notify events directly once the run has finished
+        models[0].notify_pass_mark(True)
+        self.assertEqual(
+            (threading.main_thread(), 'viscosity_pass'), received[-1])
+
+    def test_async_run(self):
+
+        self.model.parameters = self.parameters[1:]
+        self.model.asynchronous = True
+
+        evaluator = mock.Mock()
+        evaluator.mco_model = self.model
+        evaluator.execution_layers = []
+
+        def run(points, report):
+            for point in points:
+                report(point, [point[-1]], [])
+
+        with mock.patch(
+                'surfactant_example.mco.mco.AsyncWorkflowRunner.run',
+                side_effect=run):
+            with self.assertTraitChanges(self.model, "event", count=6):
+                self.mco.run(evaluator)
+
+        # Points are not evaluated synchronously
+        evaluator.evaluate.assert_not_called()
+
+    def test_resume_run(self):
+
+        self.model.parameters = self.parameters[1:]
+
+        evaluator = mock.Mock()
+        evaluator.mco_model = self.model
+        evaluator.execution_layers = []
+        evaluator.evaluate.side_effect = lambda point: [point[-1]]
+
+        points = list(parameter_grid_generator(self.model.parameters))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.model.ledger_file = os.path.join(tmp_dir, 'ledger.jsonl')
+            ledger = EvaluationLedger(file_path=self.model.ledger_file)
+            for point in points[:4]:
+                ledger.record(point, [0.0])
+
+            with self.assertTraitChanges(self.model, "event", count=6):
+                self.mco.run(evaluator)
+
+            # Only points missing from the ledger are evaluated
+            self.assertEqual(2, evaluator.evaluate.call_count)
+            ledger.load()
+            self.assertEqual(6, ledger.n_completed)
+            self.assertEqual([0.0], ledger.get(points[0]))
+            self.assertEqual([points[-1][-1]], ledger.get(points[-1]))
+
+    def test_memo_statistics(self):
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, 'memo.db')
+            workflow = mock.Mock()
+            workflow.execution_layers = [
+                mock.Mock(data_sources=[
+                    mock.Mock(kpi_memo_file=file_path),
+                    mock.Mock(kpi_memo_file=file_path),
+                    mock.Mock(kpi_memo_file='')
+                ])
+            ]
+
+            memos = workflow_kpi_memos(workflow)
+            self.assertEqual(1, len(memos))
+
+            memo = memos[0]
+            memo.get_simulation('unknown')
+            start_statistics = memo.statistics()
+            memo.add_aggregation('known', 10)
+            memo.get_aggregation('known')
+            memo.get_aggregation('unknown')
+
+            with self.assertLogs('surfactant_example.mco.mco') as logs:
+                log_memo_statistics(memo, start_statistics)
+
+        self.assertIn(
+            "0 / 0 simulations (0.0%), "
+            "1 / 2 aggregation numbers (50.0%)",
+            logs.output[0])
+
+    def test_prefetch_ingredients(self):
+
+        self.model.parameters = self.parameters
+        database_model = mock.Mock(
+            spec=DatabaseModel, input_mode='Model')
+        database_model.name = 'Water'
+        database_model.factory = mock.Mock()
+        data_source = database_model.factory.create_data_source()
+        data_source.prefetch_ingredients.return_value = {}
+
+        evaluator = mock.Mock()
+        evaluator.mco_model = self.model
+        evaluator.execution_layers = [
+            mock.Mock(data_sources=[database_model])]
+        evaluator.evaluate.return_value = [1.0]
+
+        self.mco.run(evaluator)
+
+        # All ingredients are loaded once, before the first evaluation
+        data_source.prefetch_ingredients.assert_called_once_with(
+            ['A', 'B', 'Water'])
+
+        # Workflows without database data sources are not prefetched
+        evaluator.execution_layers = []
+        self.assertEqual({}, prefetch_ingredients(evaluator))
+
     def test_get_labels(self):
 
         label_dict = get_labels(self.parameters)
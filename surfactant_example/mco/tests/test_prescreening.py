@@ -0,0 +1,270 @@
+from unittest import TestCase, mock
+
+from traits.api import Any, Float, HasStrictTraits, List
+
+from force_bdss.api import DataValue
+from force_gromacs.data_sources.simulation.simulation_model import (
+    SimulationDataSourceModel)
+
+from surfactant_example.cost.cost_data_source import CostDataSource
+from surfactant_example.formulation.formulation import Formulation
+from surfactant_example.formulation.formulation_data_source import (
+    MissingIngredientException
+)
+from surfactant_example.mco.driver_events import KPIProgressEvent
+from surfactant_example.mco.prescreening import Prescreener
+
+
+class ProbeSlotInfo:
+    def __init__(self, name):
+        self.name = name
+
+
+class ProbeModel(HasStrictTraits):
+    """Mimics a data source model with named input and output
+    slots, that can emit events"""
+
+    input_slot_info = List()
+
+    output_slot_info = List()
+
+    event = Any()
+
+    run_function = Any()
+
+    def notify(self, event):
+        self.event = event
+
+
+class ProbeExecutionLayer:
+    """Mimics an ExecutionLayer by passing named data values into
+    each ProbeModel run function"""
+
+    def __init__(self, data_sources):
+        self.data_sources = data_sources
+
+    def execute_layer(self, data_values):
+        values = {
+            data_value.name: data_value.value
+            for data_value in data_values
+        }
+        results = []
+        for model in self.data_sources:
+            outputs = model.run_function(
+                model, *[values[info.name]
+                         for info in model.input_slot_info])
+            results += [
+                DataValue(name=info.name, value=output)
+                for info, output in zip(model.output_slot_info, outputs)
+            ]
+        return results
+
+
+class ProbeCostDataSource:
+    """Mimics a CostDataSource that calculates cost surfaces"""
+
+    cost_surface = CostDataSource.cost_surface
+
+
+class ProbeCostModel(ProbeModel):
+    """Mimics a CostDataSourceModel"""
+
+    threshold = Float(50)
+
+    factory = Any()
+
+    def _factory_default(self):
+        return mock.Mock(
+            **{'create_data_source.return_value': ProbeCostDataSource()})
+
+    def notify_pass_mark(self, pass_mark):
+        self.notify(KPIProgressEvent(
+            name='cost_pass', value='PASS' if pass_mark else 'FAIL'))
+
+
+def cost_function(model, concentration):
+    cost = 10 * concentration
+    model.notify(KPIProgressEvent(
+        name='cost_pass', value='PASS' if cost < 50 else 'FAIL'))
+    return [cost, mock.Mock(
+        num_fractions=[concentration / 10, 1 - concentration / 10])]
+
+
+class TestPrescreener(TestCase):
+
+    def setUp(self):
+        self.cost_model = ProbeModel(
+            input_slot_info=[ProbeSlotInfo('conc')],
+            output_slot_info=[ProbeSlotInfo('cost'),
+                              ProbeSlotInfo('formulation')],
+            run_function=cost_function
+        )
+        self.simulation_model = mock.Mock(
+            spec=SimulationDataSourceModel,
+            input_slot_info=[ProbeSlotInfo('formulation')],
+            output_slot_info=[ProbeSlotInfo('results')],
+            size=100
+        )
+        self.micelle_model = ProbeModel(
+            input_slot_info=[ProbeSlotInfo('results')],
+            output_slot_info=[ProbeSlotInfo('micelle')]
+        )
+
+        self.workflow = mock.Mock()
+        self.workflow.execution_layers = [
+            mock.Mock(data_sources=[self.cost_model]),
+            mock.Mock(data_sources=[self.simulation_model]),
+            mock.Mock(data_sources=[self.micelle_model]),
+        ]
+        self.workflow.mco_model.parameters = [mock.Mock()]
+        self.workflow.mco_model.parameters[0].name = 'conc'
+        self.workflow.mco_model.kpis = [mock.Mock(), mock.Mock()]
+        self.workflow.mco_model.kpis[0].name = 'cost'
+        self.workflow.mco_model.kpis[1].name = 'micelle'
+
+        self.prescreener = Prescreener(workflow=self.workflow)
+
+        patcher = mock.patch(
+            'surfactant_example.mco.prescreening.ExecutionLayer',
+            ProbeExecutionLayer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_partition(self):
+
+        self.assertListEqual(
+            [[self.cost_model], [], []],
+            self.prescreener.screening_layers)
+        self.assertListEqual(
+            [self.simulation_model, self.micelle_model],
+            self.prescreener.skipped_models)
+
+    def test_screen(self):
+
+        result = self.prescreener.screen((1.0,))
+
+        self.assertTrue(result.passed)
+        self.assertListEqual([10.0, None], result.kpis)
+        self.assertEqual(1, len(result.events))
+
+        # Failing a KPI pass mark
+        result = self.prescreener.screen((6.0,))
+
+        self.assertFalse(result.passed)
+        self.assertListEqual([60.0, None], result.kpis)
+        self.assertEqual('cost_pass FAIL', result.reason)
+
+        # Simulation is too small to contain every molecule
+        result = self.prescreener.screen((0.001,))
+
+        self.assertFalse(result.passed)
+        self.assertIn('increase simulation size', result.reason)
+
+    def test_screen_all(self):
+
+        results = self.prescreener.screen_all([(1.0,), (6.0,)])
+
+        self.assertListEqual(
+            [True, False], [result.passed for result in results])
+        self.assertEqual((6.0,), results[1].parameter_values)
+
+    def test_replay_events(self):
+        received = []
+        self.cost_model.on_trait_change(
+            lambda event: received.append(event), 'event')
+
+        results = self.prescreener.screen_all([(1.0,), (6.0,)])
+
+        # Events are held back from listeners during screening
+        self.assertEqual([], received)
+
+        # Events are not recorded once screening is complete
+        self.cost_model.notify('after')
+        self.assertEqual(1, len(results[1].events))
+        self.assertEqual(['after'], received)
+
+        self.prescreener.replay_events(results[1])
+        self.assertEqual(['after', results[1].events[0][1]], received)
+
+    def test_screen_error(self):
+
+        # Invalid formulations fail screening
+        def missing_ingredient(model, concentration):
+            raise MissingIngredientException('No Salt')
+
+        self.cost_model.run_function = missing_ingredient
+        result = self.prescreener.screen((1.0,))
+        self.assertFalse(result.passed)
+        self.assertEqual('No Salt', result.reason)
+
+        # Any other error is raised
+        def programming_error(model, concentration):
+            raise TypeError('Unexpected error')
+
+        self.cost_model.run_function = programming_error
+        with self.assertRaisesRegex(TypeError, 'Unexpected error'):
+            self.prescreener.screen((1.0,))
+
+    def test_screen_all_cost_surface(self):
+        formulations = []
+
+        def formulation_function(model, concentration):
+            formulation = mock.Mock(
+                spec=Formulation,
+                ingredients=[mock.Mock(price=1000), mock.Mock(price=0)],
+                ingredient_concentrations=[concentration,
+                                           100 - concentration],
+                num_fractions=[concentration / 10, 1 - concentration / 10])
+            formulations.append(formulation)
+            return [formulation]
+
+        def cost_function(model, formulation):
+            cost = 10 * formulation.ingredient_concentrations[0]
+            model.notify_pass_mark(cost < model.threshold)
+            return [cost]
+
+        formulation_model = ProbeModel(
+            input_slot_info=[ProbeSlotInfo('conc')],
+            output_slot_info=[ProbeSlotInfo('formulation')],
+            run_function=formulation_function
+        )
+        cost_model = ProbeCostModel(
+            input_slot_info=[ProbeSlotInfo('formulation')],
+            output_slot_info=[ProbeSlotInfo('cost')],
+            run_function=cost_function
+        )
+        self.workflow.execution_layers = [
+            mock.Mock(data_sources=[formulation_model]),
+            mock.Mock(data_sources=[cost_model]),
+            mock.Mock(data_sources=[self.simulation_model]),
+        ]
+        self.workflow.mco_model.parameters[0].sample_values = [
+            1.0, 6.0, 3.0, 120.0]
+
+        prescreener = Prescreener(
+            workflow=self.workflow, cost_models=[ProbeCostModel])
+        self.assertListEqual(
+            [cost_model], prescreener.screening_cost_models)
+
+        results = prescreener.screen_all(
+            [(1.0,), (6.0,), (3.0,), (120.0,)])
+
+        # Points failing the cost threshold are pruned without
+        # evaluating any data sources
+        self.assertEqual(2, len(formulations))
+        self.assertListEqual(
+            [True, False, True, False],
+            [result.passed for result in results])
+        self.assertListEqual(
+            [False, True, False, True],
+            [result.pruned for result in results])
+
+        self.assertListEqual([60.0, None], results[1].kpis)
+        self.assertEqual('cost_pass FAIL', results[1].reason)
+        self.assertEqual(
+            [(cost_model, mock.ANY)], results[1].events)
+        self.assertEqual('FAIL', results[1].events[0][1].value)
+
+        # Points without a valid solvent concentration
+        self.assertListEqual([None, None], results[3].kpis)
+        self.assertIn('Solvent concentration', results[3].reason)
@@ -0,0 +1,172 @@
+import threading
+from functools import partial
+from unittest import TestCase, mock
+
+from traits.api import Any, HasStrictTraits
+
+from force_bdss.api import DataValue
+from force_gromacs.data_sources.simulation.simulation_model import (
+    SimulationDataSourceModel)
+
+from surfactant_example.mco.scheduler import (
+    EventRecorder, deliver_events, evaluate_concurrently,
+    evaluate_workflow, max_concurrent_evaluations, simulation_cores
+)
+
+
+class ProbeModel(HasStrictTraits):
+    """Mimics a data source model that can emit events"""
+
+    event = Any()
+
+    def notify(self, event):
+        self.event = event
+
+
+class ProbeExecutionLayer:
+    """Mimics an ExecutionLayer whose data sources emit an event and
+    double the first data value"""
+
+    def __init__(self, data_sources):
+        self.data_sources = data_sources
+
+    def execute_layer(self, data_values):
+        results = []
+        for model in self.data_sources:
+            model.notify(data_values[0].value)
+            results.append(
+                DataValue(name='kpi', value=data_values[0].value * 2))
+        return results
+
+
+class TestScheduler(TestCase):
+
+    def setUp(self):
+        self.simulation = mock.Mock(spec=SimulationDataSourceModel)
+        self.simulation.n_proc = 4
+        self.model = ProbeModel()
+
+        self.workflow = mock.Mock()
+        self.workflow.execution_layers = [
+            mock.Mock(data_sources=[self.model]),
+            mock.Mock(data_sources=[self.simulation]),
+        ]
+
+    def test_simulation_cores(self):
+        self.assertEqual(4, simulation_cores(self.workflow))
+
+        self.workflow.execution_layers = [
+            mock.Mock(data_sources=[self.model])]
+        self.assertEqual(1, simulation_cores(self.workflow))
+
+    def test_max_concurrent_evaluations(self):
+        self.assertEqual(
+            2, max_concurrent_evaluations(self.workflow, 3, n_cores=8))
+        self.assertEqual(
+            3, max_concurrent_evaluations(self.workflow, 3, n_cores=16))
+        self.assertEqual(
+            1, max_concurrent_evaluations(self.workflow, 3, n_cores=2))
+        self.assertEqual(
+            1, max_concurrent_evaluations(self.workflow, 1, n_cores=16))
+
+    def test_evaluate_concurrently(self):
+        # Each evaluation blocks until released, so that points are
+        # completed in a known order
+        order = [(1,), (2,), (3,), (0,)]
+        released = {point: threading.Event() for point in order}
+
+        def evaluate(point):
+            self.assertTrue(released[point].wait(5))
+            return [point[0] * 2], []
+
+        points = [(0,), (1,), (2,), (3,)]
+        released[order[0]].set()
+        results = []
+        for point, kpis, events in evaluate_concurrently(
+                evaluate, points, 2):
+            results.append(point)
+            if len(results) < len(order):
+                released[order[len(results)]].set()
+            self.assertEqual([point[0] * 2], kpis)
+            self.assertEqual([], events)
+
+        # Results are returned in completion order, with their
+        # original points, while the first point remains in flight
+        self.assertEqual(order, results)
+
+    def test_evaluate_concurrently_in_flight(self):
+
+        lock = threading.Lock()
+        counts = {'active': 0, 'max': 0}
+        # Every batch of evaluations must be in flight at once
+        barrier = threading.Barrier(3, timeout=5)
+
+        def evaluate(point):
+            with lock:
+                counts['active'] += 1
+                counts['max'] = max(counts['max'], counts['active'])
+            barrier.wait()
+            with lock:
+                counts['active'] -= 1
+            return [point], []
+
+        results = list(evaluate_concurrently(evaluate, range(9), 3))
+
+        self.assertEqual(9, len(results))
+        self.assertEqual(3, counts['max'])
+
+    def test_event_recorder(self):
+        received = []
+        self.model.on_trait_change(
+            lambda event: received.append(event), 'event')
+
+        recorder = EventRecorder(self.workflow)
+        copy = recorder.copies[self.model]
+        self.assertIsNot(self.model, copy)
+        self.assertEqual([copy], recorder.copy_layer([self.model]))
+
+        # Events emitted by the copy are held back from listeners of
+        # the shared model, which is left unmodified
+        copy.notify('event')
+        self.assertEqual([], received)
+        self.assertIsNone(self.model.event)
+
+        events = recorder.pop_events()
+        self.assertEqual([(self.model, 'event')], events)
+        self.assertEqual([], recorder.pop_events())
+
+        deliver_events(events)
+        self.assertEqual(['event'], received)
+
+    def test_evaluate_workflow(self):
+        received = []
+        self.model.on_trait_change(
+            lambda event: received.append(
+                (threading.current_thread(), event)), 'event')
+
+        self.workflow.execution_layers = [
+            mock.Mock(data_sources=[self.model])]
+        self.workflow.mco_model.parameters = [mock.Mock()]
+        self.workflow.mco_model.parameters[0].name = 'point'
+        self.workflow.mco_model.kpis = [mock.Mock()]
+        self.workflow.mco_model.kpis[0].name = 'kpi'
+
+        points = []
+        with mock.patch(
+                'surfactant_example.mco.scheduler.ExecutionLayer',
+                ProbeExecutionLayer):
+            for point, kpis, events in evaluate_concurrently(
+                    partial(evaluate_workflow, self.workflow),
+                    [(index,) for index in range(4)], 2):
+                # Each point is returned with only its own events,
+                # which are held back from listeners
+                self.assertEqual([point[0] * 2], kpis)
+                self.assertEqual([(self.model, point[0])], events)
+                self.assertEqual(len(points), len(received))
+                deliver_events(events)
+                points.append(point[0])
+
+        # Each event is delivered exactly once, on the main thread
+        self.assertEqual(
+            [(threading.main_thread(), point) for point in points],
+            received)
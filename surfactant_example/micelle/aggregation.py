@@ -0,0 +1,514 @@
+import mmap
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from force_gromacs.api import molecular_positions
+
+from .cluster import cluster, label_set
+from .tracking import MicelleTracker
+from .utilities import numpy_count
+
+#: Methods available to average cluster sizes over trajectory frames
+AVERAGING_MODES = ['cumulative', 'windowed', 'ewma']
+
+
+def frame_cluster_sizes(coordinates, dimensions, fragment_data,
+                        method="molecular", **kwargs):
+    """Clusters the molecules in a single frame of a Gromacs trajectory
+    and returns the size of each cluster found
+
+    Parameters
+    ----------
+    coordinates: array_like of float
+        Coordinates of all atoms in a single trajectory frame
+    dimensions: array_like of float
+        Simulation cell dimensions of the trajectory frame
+    fragment_data: list of tuple
+        Contains the atom indices, number of sites and site masses of
+        each Fragment to be included in clusters
+    method: str, optional
+        Clustering method, either 'molecular' or 'atomic'
+    kwargs:
+        Additional keyword arguments passed to `cluster`
+
+    Returns
+    -------
+    cluster_sizes: array_like of int
+        Number of molecules in each cluster of the frame
+    """
+
+    molecules = fragment_coordinates(coordinates, fragment_data, method)
+
+    # Assign labels to each molecule based on clustering analysis
+    cluster_labels = cluster(
+        molecules,
+        dimensions,
+        method=method,
+        **kwargs
+    )
+
+    return label_sizes(cluster_labels)
+
+
+def fragment_coordinates(coordinates, fragment_data, method="molecular"):
+    """Returns the coordinates of each element to be clustered: a
+    single position for each molecule if method is 'molecular', or
+    every atom in each molecule if method is 'atomic'"""
+
+    if method == "molecular":
+        # Return a single set of molecular coordinates for each fragment
+        return np.concatenate([
+            molecular_positions(
+                coordinates[indices],
+                n_site,
+                masses,
+                mode="sites",
+                com_sites=[0],
+            )
+            for indices, n_site, masses in fragment_data
+        ])
+
+    return coordinates[
+        np.concatenate([indices for indices, _, _ in fragment_data])
+    ]
+
+
+def label_sizes(cluster_labels):
+    """Returns the number of elements assigned to each non-zero label
+    in cluster_labels"""
+
+    return np.array([
+        numpy_count(cluster_labels, label)
+        for label in label_set(cluster_labels)
+    ], dtype=int)
+
+
+def tracked_cluster_sizes(frames, fragment_data, method="molecular",
+                          skin=0.3, tracker=None, **kwargs):
+    """Generator that calculates the cluster sizes of each frame from an
+    iterable of consecutive trajectory frames, using a `MicelleTracker`
+    to cluster each frame incrementally from the last.
+
+    Parameters
+    ----------
+    frames: iterable of tuple
+        Coordinates and simulation cell dimensions of each frame
+    fragment_data: list of tuple
+        Contains the atom indices, number of sites and site masses of
+        each Fragment to be included in clusters
+    method: str, optional
+        Clustering method, either 'molecular' or 'atomic'
+    skin: float, optional
+        Skin distance of the Verlet neighbour list
+    tracker: MicelleTracker, optional
+        Tracker used to cluster each frame, which also records micelle
+        lifetimes. By default, a new tracker is created
+    kwargs:
+        Additional keyword arguments passed to `MicelleTracker`
+
+    Yields
+    ------
+    cluster_sizes: array_like of int
+        Number of molecules in each cluster of each frame
+    """
+
+    if tracker is None:
+        tracker = MicelleTracker(method=method, skin=skin, **kwargs)
+
+    for coordinates, dimensions in frames:
+        molecules = fragment_coordinates(
+            coordinates, fragment_data, tracker.method)
+        yield label_sizes(tracker.update(molecules, dimensions))
+
+
+def memmap_layout(array):
+    """Returns the location of an array within the file it is memory
+    mapped from, including any view of a numpy memmap, so that it can
+    be opened in another process without copying
+
+    Returns
+    -------
+    layout: tuple or None
+        File path, dtype, shape, byte offset and strides of array, or
+        None if array is not backed by a file
+    """
+
+    filename = getattr(array, 'filename', None)
+    if filename is None or any(stride < 0 for stride in array.strides):
+        return None
+
+    # Find the memory mapped region of the file that contains array
+    base = array
+    while base is not None and not isinstance(base, mmap.mmap):
+        base = getattr(base, 'base', None)
+    if base is None:
+        return None
+
+    region = np.frombuffer(base, dtype=np.uint8)
+    region_offset = array.offset - array.offset % mmap.ALLOCATIONGRANULARITY
+    offset = region_offset + array.ctypes.data - region.ctypes.data
+
+    return filename, array.dtype.str, array.shape, offset, array.strides
+
+
+def open_memmap_layout(layout):
+    """Opens a read only view of an array from its memory mapped file,
+    as located by `memmap_layout`"""
+
+    file_path, dtype, shape, offset, strides = layout
+    buffer = np.memmap(file_path, dtype=np.uint8, mode='r')
+
+    return np.ndarray(
+        shape, dtype=dtype, buffer=buffer, offset=offset, strides=strides)
+
+
+def cluster_frame_batch(layout, frames, dimensions, fragment_data, kwargs):
+    """Calculates the cluster sizes for a batch of trajectory frames,
+    reading coordinates from a memory mapped file shared between all
+    worker processes
+
+    Parameters
+    ----------
+    layout: tuple
+        Location of trajectory coordinates in a memory mapped file,
+        as returned by `memmap_layout`
+    frames: list of int
+        Indices of each frame in batch
+    dimensions: array_like of float
+        Simulation cell dimensions of each frame in batch
+    fragment_data: list of tuple
+        Contains the atom indices, number of sites and site masses of
+        each Fragment to be included in clusters
+    kwargs: dict
+        Additional keyword arguments passed to `frame_cluster_sizes`
+
+    Returns
+    -------
+    cluster_sizes: list of array_like of int
+        Number of molecules in each cluster of each frame
+    """
+
+    trajectory = open_memmap_layout(layout)
+
+    return [
+        frame_cluster_sizes(
+            trajectory[frame], dimension, fragment_data, **kwargs)
+        for frame, dimension in zip(frames, dimensions)
+    ]
+
+
+def parallel_cluster_sizes(coordinates, dimensions, fragment_data,
+                           n_workers=2, chunk_size=None, **kwargs):
+    """Calculates the cluster sizes of each trajectory frame across a
+    pool of worker processes. Trajectory coordinates are shared with
+    each worker via a memory mapped file, so that they do not need to
+    be serialised for each task. Coordinates that are already memory
+    mapped, such as a trajectory cache, are read by each worker from
+    their existing file; otherwise they are first written to a
+    temporary file in their original dtype. Frames are distributed in
+    chunked batches and results are returned in frame order.
+
+    Parameters
+    ----------
+    coordinates: array_like of float
+        Coordinates of all atoms in each trajectory frame
+    dimensions: array_like of float
+        Simulation cell dimensions of each trajectory frame
+    fragment_data: list of tuple
+        Contains the atom indices, number of sites and site masses of
+        each Fragment to be included in clusters
+    n_workers: int, optional
+        Number of worker processes
+    chunk_size: int, optional
+        Number of frames in each batch. By default, frames are split
+        into 4 batches per worker
+    kwargs:
+        Additional keyword arguments passed to `frame_cluster_sizes`
+
+    Returns
+    -------
+    cluster_sizes: list of array_like of int
+        Number of molecules in each cluster of each frame
+    """
+
+    coordinates = np.asanyarray(coordinates)
+    n_frames = coordinates.shape[0]
+    dimensions = np.asarray(dimensions)
+
+    if n_frames == 0:
+        return []
+
+    if chunk_size is None:
+        chunk_size = max(1, int(np.ceil(n_frames / (4 * n_workers))))
+    batches = [
+        list(range(start, min(start + chunk_size, n_frames)))
+        for start in range(0, n_frames, chunk_size)
+    ]
+
+    with TemporaryDirectory() as directory:
+
+        layout = memmap_layout(coordinates)
+        if layout is None:
+            # Write trajectory coordinates to a memory mapped file that
+            # can be opened by each worker without copying
+            file_path = os.path.join(directory, 'coordinates.dat')
+            trajectory = np.memmap(
+                file_path, dtype=coordinates.dtype, mode='w+',
+                shape=coordinates.shape)
+            trajectory[:] = coordinates
+            trajectory.flush()
+            layout = memmap_layout(trajectory)
+            del trajectory
+
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [
+                executor.submit(
+                    cluster_frame_batch, layout, frames,
+                    dimensions[frames], fragment_data, kwargs
+                )
+                for frames in batches
+            ]
+
+            # Merge results from each batch in frame order
+            cluster_sizes = []
+            for future in futures:
+                cluster_sizes += future.result()
+
+    return cluster_sizes
+
+
+def cluster_frame_window(window, fragment_data, kwargs):
+    """Calculates the cluster sizes for a small window of trajectory
+    frames, each provided as a tuple of coordinates and simulation cell
+    dimensions
+
+    Parameters
+    ----------
+    window: list of tuple
+        Coordinates and simulation cell dimensions of each frame
+    fragment_data: list of tuple
+        Contains the atom indices, number of sites and site masses of
+        each Fragment to be included in clusters
+    kwargs: dict
+        Additional keyword arguments passed to `frame_cluster_sizes`
+
+    Returns
+    -------
+    cluster_sizes: list of array_like of int
+        Number of molecules in each cluster of each frame
+    """
+
+    return [
+        frame_cluster_sizes(coordinates, dimensions, fragment_data, **kwargs)
+        for coordinates, dimensions in window
+    ]
+
+
+def frame_windows(frames, window=1):
+    """Generator that collates an iterable of frames into lists
+    containing up to window frames"""
+
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) == window:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def stream_cluster_sizes(frames, fragment_data, n_workers=1, window=1,
+                         **kwargs):
+    """Generator that calculates the cluster sizes of each frame from an
+    iterable of trajectory frames, yielding results in frame order.
+    Frames are consumed in windows, so that only a bounded number are
+    held in memory at any time, regardless of the trajectory length.
+
+    Parameters
+    ----------
+    frames: iterable of tuple
+        Coordinates and simulation cell dimensions of each frame
+    fragment_data: list of tuple
+        Contains the atom indices, number of sites and site masses of
+        each Fragment to be included in clusters
+    n_workers: int, optional
+        Number of worker processes. Frames are analysed in serial
+        by default
+    window: int, optional
+        Number of frames sent to each worker process in a single task
+    kwargs:
+        Additional keyword arguments passed to `frame_cluster_sizes`
+
+    Yields
+    ------
+    cluster_sizes: array_like of int
+        Number of molecules in each cluster of each frame
+    """
+
+    if n_workers <= 1:
+        for coordinates, dimensions in frames:
+            yield frame_cluster_sizes(
+                coordinates, dimensions, fragment_data, **kwargs)
+        return
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        pending = deque()
+        for batch in frame_windows(frames, window=window):
+            pending.append(
+                executor.submit(
+                    cluster_frame_window, batch, fragment_data, kwargs)
+            )
+
+            # Limit the number of windows in flight to keep memory
+            # usage bounded
+            if len(pending) >= 2 * n_workers:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+
+def aggregation_statistics(frame_sizes, mode='cumulative', window=10,
+                           alpha=0.1):
+    """Calculates a running average of cluster sizes at each trajectory
+    frame, alongside a histogram of cluster sizes in each frame. Only
+    running sums and counts are stored, so that each frame is processed
+    in constant time and frame_sizes may be a single pass iterable.
+
+    Parameters
+    ----------
+    frame_sizes: iterable of array_like of int
+        Number of molecules in each cluster of each frame
+    mode: str, optional
+        Averaging method, either 'cumulative' (all clusters up to and
+        including each frame), 'windowed' (clusters in the last window
+        frames) or 'ewma' (exponentially weighted by frame age)
+    window: int, optional
+        Number of frames included in the 'windowed' average
+    alpha: float, optional
+        Smoothing factor between 0 and 1 for the 'ewma' average. Larger
+        values weight recent frames more heavily
+
+    Returns
+    -------
+    aggregation_numbers: array_like of float
+        Average cluster size at each frame
+    histogram: array_like of int
+        Number of clusters of each size (columns) in each frame (rows)
+    """
+
+    assert mode in AVERAGING_MODES, (
+        f"Argument mode must be one of {AVERAGING_MODES}")
+    assert window > 0, "Argument window must be a positive integer"
+    assert 0 < alpha <= 1, "Argument alpha must be in the range (0, 1]"
+
+    total = 0.0
+    count = 0.0
+    history = deque()
+
+    aggregation_numbers = []
+    frame_histograms = []
+
+    for sizes in frame_sizes:
+        sizes = np.asarray(sizes, dtype=int)
+        frame_total = sizes.sum()
+        frame_count = sizes.size
+
+        if mode == 'ewma':
+            total = (1 - alpha) * total + frame_total
+            count = (1 - alpha) * count + frame_count
+        else:
+            total += frame_total
+            count += frame_count
+
+        if mode == 'windowed':
+            history.append((frame_total, frame_count))
+            if len(history) > window:
+                old_total, old_count = history.popleft()
+                total -= old_total
+                count -= old_count
+
+        aggregation_numbers.append(total / count if count > 0 else 0)
+        frame_histograms.append(np.bincount(sizes))
+
+    n_bins = max([len(counts) for counts in frame_histograms], default=0)
+    histogram = np.zeros((len(frame_histograms), n_bins), dtype=int)
+    for frame, counts in enumerate(frame_histograms):
+        histogram[frame, :len(counts)] = counts
+
+    return np.array(aggregation_numbers, dtype=float), histogram
+
+
+def frame_selection(start_frame=0, stride=1, max_frames=None):
+    """Returns a slice object that selects trajectory frames beginning
+    at start_frame, at intervals of stride, up to a maximum of
+    max_frames frames"""
+
+    assert start_frame >= 0, "Argument start_frame must not be negative"
+    assert stride > 0, "Argument stride must be a positive integer"
+
+    stop = None
+    if max_frames is not None:
+        stop = start_frame + stride * max_frames
+
+    return slice(start_frame, stop, stride)
+
+
+def histogram_sizes(counts):
+    """Returns the size of each cluster described by a single row of
+    a cluster size histogram"""
+
+    return np.repeat(np.arange(len(counts)), counts)
+
+
+def equilibration_frame(histogram, window=10, tolerance=0.1):
+    """Estimates the first trajectory frame at which the mean cluster
+    size has equilibrated. The mean cluster size is averaged over
+    blocks of window consecutive frames, and equilibration is assumed
+    to begin at the first block whose average lies within a relative
+    tolerance of the final block.
+
+    Parameters
+    ----------
+    histogram: array_like of int
+        Number of clusters of each size (columns) in each frame (rows),
+        as returned by `aggregation_statistics`
+    window: int, optional
+        Number of frames in each block average
+    tolerance: float, optional
+        Relative tolerance on the block average of the mean cluster size
+
+    Returns
+    -------
+    frame: int
+        Index of the first equilibrated frame. Returns 0 if there are
+        fewer than 2 * window frames, since no trend can be identified
+    """
+
+    histogram = np.asarray(histogram)
+    n_frames = histogram.shape[0]
+
+    if n_frames < 2 * window:
+        return 0
+
+    # Mean cluster size in each frame
+    totals = histogram.dot(np.arange(histogram.shape[1]))
+    counts = histogram.sum(axis=1)
+    frame_means = np.divide(
+        totals, counts, out=np.zeros(n_frames), where=counts > 0)
+
+    # Average over each block of consecutive frames
+    cumulative = np.concatenate([[0], np.cumsum(frame_means)])
+    block_means = (cumulative[window:] - cumulative[:-window]) / window
+
+    reference = block_means[-1]
+    converged = (
+        np.abs(block_means - reference) <= tolerance * abs(reference))
+
+    return int(np.argmax(converged))
@@ -1,15 +1,11 @@
-import networkx as nx
 import numpy as np
-from scipy.sparse import spmatrix
+from scipy.sparse import coo_matrix, csr_matrix, spmatrix
+from scipy.sparse.csgraph import connected_components
 
-from force_gromacs.api import batch_distance_matrix
-
-from surfactant_example.micelle.utilities import (
-    sum_filter, matrix_threshold, remove_digits
+from surfactant_example.micelle.neighbours import (
+    NEIGHBOUR_BACKENDS, neighbour_adjacency
 )
 
-np_remove_digits = np.vectorize(remove_digits)
-
 
 def label_set(array, background=0):
     """Returns a set of label values in array. Able to
@@ -28,11 +24,12 @@ def label_set(array, background=0):
 
 def label_elements(matrix, noise_thresh=1, cluster_thresh=1):
     """Applies cluster labels to each non-zero entry in
-    matrix via conversion into a networkx Graph object
+    matrix by identifying the connected components of the graph
+    that it represents
 
     Parameters
     ----------
-    matrix: array_like of float
+    matrix: array_like or scipy.sparse.spmatrix of float
         Matrix to label, consisting of zero and non-zero
         entries
     noise_thresh: int, optional, default: 1
@@ -44,135 +41,158 @@ def label_elements(matrix, noise_thresh=1, cluster_thresh=1):
     Returns
     -------
     cluster_labels: array_like of int
-        Labels assigned to each row in matrix
+        Labels assigned to each row in matrix. Clusters are labelled
+        in order of the lowest index element that they contain
     """
 
+    # Type checking of matrix for transformation into a sparse graph
+    if not isinstance(matrix, (np.ndarray, spmatrix)):
+        raise TypeError(
+            "Input adjacency matrix must be either a numpy array"
+            "or scipy sparse matrix"
+        )
+
     # Create zeroed labels for each element in original matrix
-    cluster_labels = np.zeros(matrix.shape[0])
+    n_elements = matrix.shape[0]
+    cluster_labels = np.zeros(n_elements)
 
-    # Remove any entries from rows or columns corresponding to elements
-    # considered as noise by noise_thresh
-    indices = np.argwhere(matrix.sum(axis=-1) < noise_thresh).flatten()
-    matrix = np.delete(matrix, indices, axis=0)
-    matrix = np.delete(matrix, indices, axis=1)
+    # Mask any elements considered as noise by noise_thresh
+    n_neighbours = np.asarray(matrix.sum(axis=-1)).flatten()
+    retained = n_neighbours >= noise_thresh
 
-    if matrix.size == 0:
+    if not retained.any():
         return cluster_labels
 
-    # Type checking of matrix for transformation into networkx Graph
-    if isinstance(matrix, np.ndarray):
-        network = nx.from_numpy_array(matrix)
+    # Remove any edges connected to noise elements, so that they
+    # each form an isolated component of the graph
+    matrix = coo_matrix(matrix)
+    edges = (matrix.data != 0) * retained[matrix.row] * retained[matrix.col]
+    network = csr_matrix(
+        (np.ones(np.count_nonzero(edges), dtype=int),
+         (matrix.row[edges], matrix.col[edges])),
+        shape=matrix.shape
+    )
 
-    elif isinstance(matrix, spmatrix):
-        network = nx.from_scipy_sparse_matrix(matrix)
+    # Extract clusters as connected components of graph
+    n_components, components = connected_components(
+        network, directed=False)
 
-    else:
-        raise TypeError(
-            "Input adjacency matrix must be either a numpy array"
-            "or scipy sparse matrix"
-        )
+    # Refine cluster labels to only report back those with greater than
+    # cluster_thresh particles
+    indices = np.flatnonzero(retained)
+    sizes = np.bincount(components[indices], minlength=n_components)
+    valid = np.flatnonzero((sizes >= cluster_thresh) * (sizes > 0))
+
+    # Order each cluster by its lowest index element
+    first_index = np.full(n_components, n_elements)
+    np.minimum.at(first_index, components[indices], indices)
+    valid = valid[np.argsort(first_index[valid])]
 
-    if indices.size > 0:
-        # Ensure nodes correspond to the order of elements in original matrix
-        old_indices = np.arange(matrix.shape[0])
-        new_indices = np.delete(np.arange(cluster_labels.size), indices)
-        mapping = {
-            old_index: new_index
-            for old_index, new_index in zip(old_indices, new_indices)
-        }
-        network = nx.relabel_nodes(network, mapping)
-
-    # Extract clusters as connected graphs
-    components = nx.connected_components(network)
-
-    # Assign non-zero labels to each element in each graph
-    label = 1
-    for component in components:
-        # Refine cluster labels to only report back those with greater than
-        # cluster_thresh particles
-        if len(component) >= cluster_thresh:
-            cluster_labels[list(component)] = label
-            label += 1
+    # Assign non-zero labels to each element in each cluster
+    component_labels = np.zeros(n_components)
+    component_labels[valid] = np.arange(1, valid.size + 1)
+    cluster_labels[indices] = component_labels[components[indices]]
 
     return cluster_labels
 
 
-def molecular_criteria(adjacency_matrix, mol_ref, atom_thresh=1):
+def molecular_incidence(mol_ref):
+    """Builds a sparse incidence matrix that maps each atom onto the
+    molecule that it belongs to. This only needs to be calculated once
+    for each trajectory, since mol_ref is identical for every frame.
+
+    Parameters
+    ----------
+    mol_ref: list of str
+        Reference symbols for each molecular species in a single
+        frame
+
+    Returns
+    -------
+    incidence_matrix: scipy.sparse.csr_matrix of int
+        An n x m binary matrix (where n = number of atoms and
+        m = number of molecules) containing a non-zero entry at (i, j)
+        if atom i belongs to molecule j. Molecules are ordered by their
+        first appearance in mol_ref
+    """
+
+    mol_ref = np.asarray(mol_ref)
+    n_atoms = mol_ref.size
+
+    # Isolate unique values in mol_ref relating to different molecules
+    _, first_index, atom_mol = np.unique(
+        mol_ref, return_index=True, return_inverse=True)
+
+    # Rank each molecule by the order in which it first appears
+    order = np.argsort(first_index)
+    rank = np.empty(order.size, dtype=int)
+    rank[order] = np.arange(order.size)
+
+    return csr_matrix(
+        (np.ones(n_atoms, dtype=int),
+         (np.arange(n_atoms), rank[atom_mol.flatten()])),
+        shape=(n_atoms, order.size)
+    )
+
+
+def molecular_criteria(adjacency_matrix, mol_ref=None, atom_thresh=1,
+                       incidence_matrix=None):
     """Determines whether two molecules are considered to be connected
     by counting the number of pairwise adjacency_matrix between all of thier
     constituent atoms and checking that this value is > atom_thresh
 
     Parameters
     ----------
-    adjacency_matrix: array_like of int
+    adjacency_matrix: array_like or scipy.sparse.spmatrix of int
         An n x n binary matrix containing non-zero entries corresponding
         to a connenection between atom i and j
-    mol_ref: list of str
+    mol_ref: list of str, optional
         Reference symbols for each molecular species in a single
-        frame
+        frame. Only required if incidence_matrix is not provided
     atom_thresh: int, optional, default: 1
         Lower threshold on the number of atomic connections required for
         two molecule to be considered connected
+    incidence_matrix: scipy.sparse.spmatrix of int, optional
+        Precalculated n x m atom to molecule incidence matrix, as
+        returned by `molecular_incidence`
 
     Returns
     -------
-    adjacency_matrix: array_like of int
+    adjacency_matrix: array_like or scipy.sparse.csr_matrix of int
         An m x m binary matrix (where m = number of molecules) containing
         non-zero entries corresponding to a connection between molecule
-        i and j
+        i and j. A sparse matrix is returned for a sparse input
     """
 
-    # Isolate unique values in mol_ref relating to different molecules
-    mol_ref = np.asarray(mol_ref)
-    unique_mol = []
-    for ref in mol_ref:
-        if ref not in unique_mol:
-            unique_mol.append(ref)
-    unique_mol = np.asarray(unique_mol)
-
-    # Obtain set of symbols relating to different molecular species
-    cleaned_ref = np_remove_digits(mol_ref)
-    mol_set = np.unique(cleaned_ref)
-
-    # Find indices in adjacency matrix that relate to each molecule
-    mol_indices = [
-        np.argwhere(np.char.find(unique_mol, ref) != -1) for ref in mol_set
-    ]
-    atom_indices = [np.argwhere(cleaned_ref == ref) for ref in mol_set]
-
-    # Obtain the number and atom count of each molecular species
-    n_mols = [indices.size for indices in mol_indices]
-    n_sites = [indices.size // n_mol
-               for indices, n_mol in zip(atom_indices, n_mols)]
-
-    # Build an empty adjacency matrix to hold molecular neighbours
-    mol_adjacency_matrix = np.zeros((np.sum(n_mols), np.sum(n_mols)))
+    if incidence_matrix is None:
+        incidence_matrix = molecular_incidence(mol_ref)
 
     # Reduce adjacency_matrix matrix to n_molcules x n_molecules, with each
     # element containing the sum of all particle adjacency_matrix
-    for n, atom_i, mol_i in zip(n_sites, atom_indices, mol_indices):
-        for m, atom_j, mol_j in zip(n_sites, atom_indices, mol_indices):
-            mol_adjacency_matrix[mol_i.flatten(), mol_j] = sum_filter(
-                adjacency_matrix[atom_i.flatten(), atom_j],
-                block_shape=(m, n)
-            )
+    mol_adjacency_matrix = (
+        incidence_matrix.T
+        @ csr_matrix(adjacency_matrix)
+        @ incidence_matrix
+    ).tocsr()
 
     # Zero elements that correspond to the molecule interacting with
     # itself
-    np.fill_diagonal(mol_adjacency_matrix, 0)
+    mol_adjacency_matrix.setdiag(0)
+    mol_adjacency_matrix.eliminate_zeros()
 
     # Return a binary mask for each pairwise molecule interaction that meets
     # the threshold criteria
-    mol_adjacency_matrix = np.where(
-        mol_adjacency_matrix >= atom_thresh, 1, 0
-    )
+    mol_adjacency_matrix = (
+        mol_adjacency_matrix >= atom_thresh).astype(int)
 
-    return mol_adjacency_matrix
+    if isinstance(adjacency_matrix, spmatrix):
+        return mol_adjacency_matrix
+    return mol_adjacency_matrix.toarray()
 
 
 def cluster(coord, cell_dim, r_thresh=1.5, noise_thresh=1, cluster_thresh=2,
             background=0, method='molecular', atom_thresh=1, mol_ref=None,
-            batch_size=50):
+            batch_size=50, neighbour_backend='dense', incidence_matrix=None):
     """Assigns each particle in coord to a cluster based on input parameters.
     Returns a set of labels that reference which cluster each particle belongs
     to.
@@ -210,6 +230,21 @@ def cluster(coord, cell_dim, r_thresh=1.5, noise_thresh=1, cluster_thresh=2,
         frame
     batch_size : int, optional, default: 50
         Sample size parameter of each batch.
+    neighbour_backend: str, optional, default: 'dense'
+        Selects the method used to identify neighbouring particles,
+        either 'dense', 'cell_list' or 'kdtree'.
+        'dense': Calculates the full N x N distance matrix between
+        particles in batches. Memory and time both scale as O(N^2).
+        'cell_list': Uses a periodic linked cell list to only evaluate
+        distances between particles in neighbouring cells, returning a
+        sparse adjacency matrix. Memory and time both scale as O(N).
+        'kdtree': Uses a periodic scipy cKDTree to query all pairs of
+        neighbouring particles, returning a sparse adjacency matrix.
+        Memory and time both scale as O(N log N).
+    incidence_matrix: scipy.sparse.spmatrix of int, optional
+        Precalculated atom to molecule incidence matrix used by the
+        'atomic' method, as returned by `molecular_incidence`. If not
+        provided, this will be built from mol_ref
 
     Returns
     -------
@@ -218,27 +253,24 @@ def cluster(coord, cell_dim, r_thresh=1.5, noise_thresh=1, cluster_thresh=2,
     """
 
     assert method in ['molecular', 'atomic']
+    assert neighbour_backend in NEIGHBOUR_BACKENDS
 
     if method == 'atomic':
         assert isinstance(atom_thresh, int)
-        assert isinstance(mol_ref, list)
-
-    # Calculate cartesian and radial distances between particles
-    # Perform this as a batch process to save memory
-    r2_coord = batch_distance_matrix(coord, cell_dim,
-                                     metric='sqeuclidean',
-                                     batch_size=batch_size)
+        assert isinstance(mol_ref, list) or incidence_matrix is not None
 
     # Identify particles lying within r_thresh radial distance
-    adjacency_matrix = matrix_threshold(r2_coord,
-                                        upper_thresh=r_thresh**2)
+    adjacency_matrix = neighbour_adjacency(coord, cell_dim, r_thresh,
+                                           backend=neighbour_backend,
+                                           batch_size=batch_size)
 
     if method == 'atomic':
         # Assign pairwise neighbours to atoms, and filter out
         # those pairwise molecule interactions that contain less than
         # atom_thresh particle neighbours
         adjacency_matrix = molecular_criteria(
-            adjacency_matrix, mol_ref, atom_thresh=atom_thresh)
+            adjacency_matrix, mol_ref, atom_thresh=atom_thresh,
+            incidence_matrix=incidence_matrix)
 
     # Assign cluster labels to any particles by generating a network
     cluster_labels = label_elements(adjacency_matrix,
@@ -0,0 +1,132 @@
+import numpy as np
+
+
+def read_gro_frame(infile, symbols=None):
+    """Parses a single frame from an open Gromacs .gro coordinate file.
+    Only the current frame is held in memory, so that trajectories can
+    be read incrementally.
+
+    Parameters
+    ----------
+    infile: file object
+        Open Gromacs .gro file, positioned at the start of a frame
+    symbols: list of str, optional
+        Residue names of molecules to include. All atoms are included
+        by default
+
+    Returns
+    -------
+    frame: dict or None
+        Contains the molecular reference ('mol_ref') and residue name
+        ('resname') of each atom, alongside their coordinates ('coord')
+        and the simulation cell dimensions ('dim'). Returns None if the
+        end of the file has been reached
+    """
+
+    title = infile.readline()
+    if not title.strip():
+        return None
+
+    n_atoms = int(infile.readline())
+
+    mol_ref = []
+    resnames = []
+    coord = []
+
+    for _ in range(n_atoms):
+        line = infile.readline()
+
+        # Gromacs .gro files use fixed width columns for residue
+        # number (0-5) and residue name (5-10), followed by atom
+        # name and number, and then positions from column 20
+        resname = line[5:10].strip()
+        if symbols is not None and resname not in symbols:
+            continue
+
+        mol_ref.append(line[0:5].strip() + resname)
+        resnames.append(resname)
+        coord.append(line[20:].split()[:3])
+
+    # Box vectors are stored on the final line of each frame
+    dim = np.array(infile.readline().split()[:3], dtype=float)
+
+    return {
+        "mol_ref": mol_ref,
+        "resname": np.asarray(resnames),
+        "coord": np.array(coord, dtype=float).reshape(-1, 3),
+        "dim": dim
+    }
+
+
+def skip_gro_frame(infile):
+    """Advances an open Gromacs .gro coordinate file past a single
+    frame without parsing any atomic data
+
+    Parameters
+    ----------
+    infile: file object
+        Open Gromacs .gro file, positioned at the start of a frame
+
+    Returns
+    -------
+    skipped: bool
+        Whether a frame was skipped, or the end of the file has been
+        reached
+    """
+
+    title = infile.readline()
+    if not title.strip():
+        return False
+
+    # Skip atom lines and final box vector line
+    n_atoms = int(infile.readline())
+    for _ in range(n_atoms + 1):
+        infile.readline()
+
+    return True
+
+
+def iter_gro_frames(file_path, symbols=None, start_frame=0, stride=1,
+                    max_frames=None):
+    """Generator that yields each frame of a Gromacs .gro trajectory
+    file in turn, without loading the whole trajectory into memory.
+    Frames that are not selected are skipped without being parsed.
+
+    Parameters
+    ----------
+    file_path: str
+        File path of Gromacs .gro trajectory file
+    symbols: list of str, optional
+        Residue names of molecules to include. All atoms are included
+        by default
+    start_frame: int, optional
+        Index of first frame to yield
+    stride: int, optional
+        Interval between yielded frames
+    max_frames: int, optional
+        Maximum number of frames to yield. All remaining frames are
+        yielded by default
+
+    Yields
+    ------
+    frame: dict
+        Data for each frame, as returned by `read_gro_frame`
+    """
+
+    n_yielded = 0
+
+    with open(file_path, 'r') as infile:
+        for _ in range(start_frame):
+            if not skip_gro_frame(infile):
+                return
+
+        while max_frames is None or n_yielded < max_frames:
+            frame = read_gro_frame(infile, symbols=symbols)
+            if frame is None:
+                return
+            yield frame
+            n_yielded += 1
+
+            for _ in range(stride - 1):
+                if not skip_gro_frame(infile):
+                    return
@@ -1,10 +1,20 @@
+from itertools import chain
+
 import numpy as np
 
 from force_bdss.api import BaseDataSource, DataValue, Slot
-from force_gromacs.api import GromacsCoordinateReader, molecular_positions
+from force_gromacs.api import GromacsCoordinateReader
+
+from surfactant_example.data.kpi_memo import get_kpi_memo
 
-from .cluster import cluster, label_set
-from .utilities import numpy_count
+from .aggregation import (
+    frame_cluster_sizes, parallel_cluster_sizes, stream_cluster_sizes,
+    aggregation_statistics, equilibration_frame, frame_selection,
+    histogram_sizes, tracked_cluster_sizes
+)
+from .cluster import molecular_incidence
+from .gro_stream import iter_gro_frames
+from .trajectory_cache import load_trajectory_cache
 
 
 class MicelleDataSource(BaseDataSource):
@@ -23,6 +33,20 @@ class MicelleDataSource(BaseDataSource):
         cluster_thresh=20,
         method="molecular",
         atom_thresh=5,
+        neighbour_backend="dense",
+        n_workers=1,
+        averaging="cumulative",
+        averaging_window=10,
+        ewma_alpha=0.1,
+        return_histogram=False,
+        start_frame=0,
+        stride=1,
+        max_frames=None,
+        equilibrate=False,
+        equilibration_window=10,
+        equilibration_tolerance=0.1,
+        incremental=False,
+        verlet_skin=0.3,
     ):
         """Takes in a Gromacs trajectory containing information on a set
         of Fragment objects that can form micelles. Clusters the molecular
@@ -46,101 +70,399 @@ class MicelleDataSource(BaseDataSource):
             considered part of a cluster
         cluster_thresh: int, optional
             Lower threshold on cluster size
+        neighbour_backend: str, optional
+            Neighbour search method used to build the adjacency matrix
+            for clustering, either 'dense', 'cell_list' or 'kdtree'
+        n_workers: int, optional
+            Number of worker processes used to analyse trajectory frames
+            in parallel. Frames are analysed in serial by default
+        averaging: str, optional
+            Method used to average cluster sizes over frames, either
+            'cumulative', 'windowed' or 'ewma'
+        averaging_window: int, optional
+            Number of frames included in a 'windowed' average
+        ewma_alpha: float, optional
+            Smoothing factor for an 'ewma' average
+        return_histogram: bool, optional
+            Whether to also return the number of clusters of each size
+            in each frame
+        start_frame: int, optional
+            Index of first trajectory frame to analyse
+        stride: int, optional
+            Interval between analysed trajectory frames
+        max_frames: int, optional
+            Maximum number of trajectory frames to analyse. All
+            remaining frames are analysed by default
+        equilibrate: bool, optional
+            Whether to detect the first equilibrated frame from the
+            mean cluster size, and exclude all earlier frames from
+            the average
+        equilibration_window: int, optional
+            Number of analysed frames in each block average used to
+            detect equilibration
+        equilibration_tolerance: float, optional
+            Relative tolerance on block averages used to detect
+            equilibration
+        incremental: bool, optional
+            Whether to cluster each frame incrementally from the last,
+            using a Verlet neighbour list. Frames are then analysed in
+            serial, regardless of n_workers
+        verlet_skin: float, optional
+            Skin distance in nanometers of the Verlet neighbour list
+            used for incremental clustering
+
+        Returns
+        -------
+        aggregation_numbers: array_like of float
+            Average cluster size at each analysed frame, beginning
+            from the first equilibrated frame if equilibrate is True
+        histogram: array_like of int, optional
+            Number of clusters of each size (columns) in each analysed
+            frame (rows). Only returned if return_histogram is True
         """
 
-        # Obtain key trajectory information
-        n_frames = trajectory["coord"].shape[0]
-        dimensions = trajectory["dim"]
+        # Obtain key trajectory information for selected frames
+        selection = frame_selection(start_frame, stride, max_frames)
+        coord = trajectory["coord"][selection]
+        dimensions = trajectory["dim"][selection]
         fragment_indices = [
             self._reader.extract_molecules(trajectory, fragment.symbol)
             for fragment in fragments
         ]
-        mol_ref = np.asarray(trajectory["mol_ref"])
+
+        fragment_data, cluster_kwargs = self._prepare_clustering(
+            trajectory["mol_ref"],
+            fragment_indices,
+            fragments,
+            r_thresh=r_thresh,
+            noise_thresh=noise_thresh,
+            cluster_thresh=cluster_thresh,
+            method=method,
+            atom_thresh=atom_thresh,
+            neighbour_backend=neighbour_backend,
+        )
+
+        # Assign labels to each molecule in each frame based on
+        # clustering analysis, and return the sizes of each cluster
+        if incremental:
+            frame_sizes = tracked_cluster_sizes(
+                zip(coord, dimensions),
+                fragment_data,
+                skin=verlet_skin,
+                **cluster_kwargs
+            )
+        elif n_workers > 1:
+            frame_sizes = parallel_cluster_sizes(
+                coord,
+                dimensions,
+                fragment_data,
+                n_workers=n_workers,
+                **cluster_kwargs
+            )
+        else:
+            frame_sizes = [
+                frame_cluster_sizes(
+                    coordinates,
+                    frame_dimensions,
+                    fragment_data,
+                    **cluster_kwargs
+                )
+                for coordinates, frame_dimensions in zip(
+                    coord, dimensions)
+            ]
+
+        return self._average_cluster_sizes(
+            frame_sizes,
+            averaging=averaging,
+            averaging_window=averaging_window,
+            ewma_alpha=ewma_alpha,
+            return_histogram=return_histogram,
+            equilibrate=equilibrate,
+            equilibration_window=equilibration_window,
+            equilibration_tolerance=equilibration_tolerance,
+        )
+
+    def stream_aggregation_numbers(
+        self,
+        trajectory_file,
+        fragments,
+        symbols=None,
+        r_thresh=1.25,
+        noise_thresh=5,
+        cluster_thresh=20,
+        method="molecular",
+        atom_thresh=5,
+        neighbour_backend="dense",
+        n_workers=1,
+        window=1,
+        averaging="cumulative",
+        averaging_window=10,
+        ewma_alpha=0.1,
+        return_histogram=False,
+        start_frame=0,
+        stride=1,
+        max_frames=None,
+        equilibrate=False,
+        equilibration_window=10,
+        equilibration_tolerance=0.1,
+        incremental=False,
+        verlet_skin=0.3,
+    ):
+        """Equivalent to `calculate_aggregation_numbers`, but parses a
+        Gromacs .gro trajectory file incrementally, so that only a
+        small window of frames is held in memory at any time,
+        regardless of the trajectory length
+
+        Parameters
+        ----------
+        trajectory_file: str
+            File path of Gromacs .gro trajectory file
+        fragments: list of Fragment
+            List of Fragment objects representing surfactants expected to have
+            formed micelles during the simulation
+        symbols: list of str, optional
+            Symbols of fragments to read from trajectory file. All
+            fragments are read by default
+        window: int, optional
+            Number of frames sent to each worker process in a single
+            task, if n_workers > 1
+
+        Notes
+        -----
+        See `calculate_aggregation_numbers` for a description of the
+        remaining parameters
+        """
+
+        frames = iter_gro_frames(
+            trajectory_file,
+            symbols=symbols,
+            start_frame=start_frame,
+            stride=stride,
+            max_frames=max_frames,
+        )
+
+        try:
+            first_frame = next(frames)
+        except StopIteration:
+            return self._average_cluster_sizes(
+                [],
+                averaging=averaging,
+                averaging_window=averaging_window,
+                ewma_alpha=ewma_alpha,
+                return_histogram=return_histogram,
+                equilibrate=equilibrate,
+                equilibration_window=equilibration_window,
+                equilibration_tolerance=equilibration_tolerance,
+            )
+
+        # Residue names are identical in every frame, so only need to
+        # be inspected in the first
+        fragment_indices = [
+            np.flatnonzero(first_frame["resname"] == fragment.symbol)
+            for fragment in fragments
+        ]
+
+        fragment_data, cluster_kwargs = self._prepare_clustering(
+            first_frame["mol_ref"],
+            fragment_indices,
+            fragments,
+            r_thresh=r_thresh,
+            noise_thresh=noise_thresh,
+            cluster_thresh=cluster_thresh,
+            method=method,
+            atom_thresh=atom_thresh,
+            neighbour_backend=neighbour_backend,
+        )
+
+        frame_data = (
+            (frame["coord"], frame["dim"])
+            for frame in chain([first_frame], frames)
+        )
+
+        if incremental:
+            frame_sizes = tracked_cluster_sizes(
+                frame_data,
+                fragment_data,
+                skin=verlet_skin,
+                **cluster_kwargs
+            )
+        else:
+            frame_sizes = stream_cluster_sizes(
+                frame_data,
+                fragment_data,
+                n_workers=n_workers,
+                window=window,
+                **cluster_kwargs
+            )
+
+        return self._average_cluster_sizes(
+            frame_sizes,
+            averaging=averaging,
+            averaging_window=averaging_window,
+            ewma_alpha=ewma_alpha,
+            return_histogram=return_histogram,
+            equilibrate=equilibrate,
+            equilibration_window=equilibration_window,
+            equilibration_tolerance=equilibration_tolerance,
+        )
+
+    def _prepare_clustering(self, mol_ref, fragment_indices, fragments,
+                            method="molecular", **kwargs):
+        """Collates the atom indices, number of sites and site masses
+        of all molecular fragments to be included in clusters, as well
+        as the keyword arguments passed to `cluster` for each frame"""
+
+        mol_ref = np.asarray(mol_ref)
         mol_ref = mol_ref[np.concatenate(fragment_indices)]
 
-        # Initialise micelle aggregation numbers
-        cluster_sizes = []
-        mean_aggregation_numbers = np.zeros(n_frames)
-
-        # Cycle through each frame in the trajectory
-        for frame in range(n_frames):
-
-            # Collate all molecular fragments to be included in clusters
-            # for this frame
-            molecules = np.empty((0, 3), dtype=float)
-
-            if method == "molecular":
-                # Cycle through each fragment
-                for indices, fragment in zip(fragment_indices, fragments):
-
-                    # Find coordinates in trajectory relating to fragment
-                    coordinates = trajectory["coord"][frame, indices]
-                    n_site = len(fragment.atoms)
-                    masses = fragment.get_masses()
-
-                    # Return a single set of molecular coordinates for fragment
-                    fragment_mol = molecular_positions(
-                        coordinates,
-                        n_site,
-                        masses,
-                        mode="sites",
-                        com_sites=[0],
-                    )
-
-                    # Append to clustering array
-                    molecules = np.concatenate((molecules, fragment_mol))
-            else:
-                molecules = trajectory["coord"][
-                    frame, np.concatenate(fragment_indices)
-                ]
+        # Build the atom to molecule mapping once for all frames
+        incidence_matrix = None
+        if method == "atomic":
+            incidence_matrix = molecular_incidence(mol_ref)
+
+        fragment_data = [
+            (indices, len(fragment.atoms), fragment.get_masses())
+            for indices, fragment in zip(fragment_indices, fragments)
+        ]
+        cluster_kwargs = dict(
+            method=method,
+            mol_ref=mol_ref,
+            incidence_matrix=incidence_matrix,
+            **kwargs
+        )
+
+        return fragment_data, cluster_kwargs
+
+    def _average_cluster_sizes(self, frame_sizes, averaging="cumulative",
+                               averaging_window=10, ewma_alpha=0.1,
+                               return_histogram=False, equilibrate=False,
+                               equilibration_window=10,
+                               equilibration_tolerance=0.1):
+        """Calculates the running average of cluster sizes at each
+        frame, from an iterable of cluster sizes for each frame, and
+        optionally returns the histogram of cluster sizes"""
+
+        averaging_kwargs = dict(
+            mode=averaging,
+            window=averaging_window,
+            alpha=ewma_alpha,
+        )
+        aggregation_numbers, histogram = aggregation_statistics(
+            frame_sizes, **averaging_kwargs)
 
-            # Assign labels to each molecule based on clustering analysis
-            cluster_labels = cluster(
-                molecules,
-                dimensions[frame],
-                r_thresh=r_thresh,
-                noise_thresh=noise_thresh,
-                cluster_thresh=cluster_thresh,
-                method=method,
-                mol_ref=mol_ref,
-                atom_thresh=atom_thresh,
+        if equilibrate:
+            # Recalculate averages from the first equilibrated frame,
+            # using cluster sizes recovered from the histogram
+            first_frame = equilibration_frame(
+                histogram,
+                window=equilibration_window,
+                tolerance=equilibration_tolerance,
+            )
+            histogram = histogram[first_frame:]
+            aggregation_numbers, _ = aggregation_statistics(
+                [histogram_sizes(counts) for counts in histogram],
+                **averaging_kwargs
             )
 
-            # Append cluster sizes to list
-            cluster_sizes += [
-                numpy_count(cluster_labels, label)
-                for label in label_set(cluster_labels)
-            ]
+        if return_histogram:
+            return aggregation_numbers, histogram
+        return aggregation_numbers
+
+    def get_kpi_memo(self, model):
+        """Returns the KPIMemo specified on the model, or None if
+        memoisation is disabled"""
 
-            # Calculate the moving average for each frame
-            if len(cluster_sizes) > 0:
-                mean_aggregation_numbers[frame] = np.mean(cluster_sizes)
+        if not model.kpi_memo_file:
+            return None
 
-        return mean_aggregation_numbers
+        return get_kpi_memo(model.kpi_memo_file)
 
     def run(self, model, parameters):
 
         formulation = parameters[0].value
         trajectory_file = parameters[1].value
 
-        # Read trajectory file to return simulation data of fragments
-        trajectory_data = self._reader.read(
-            trajectory_file, symbols=model.fragment_symbols
-        )
-
         # Obtain Fragment objects that correspond to the required symbols
         fragments = formulation.fragment_search(model.fragment_symbols)
 
-        # Calculate moving average of micelle aggregation numbers for each
-        # frame of trajectory
-        aggregation_numbers = self.calculate_aggregation_numbers(
-            trajectory_data,
-            fragments,
+        analysis_kwargs = dict(
             r_thresh=model.r_thresh,
             noise_thresh=model.noise_thresh,
             cluster_thresh=model.cluster_thresh,
+            neighbour_backend=model.neighbour_backend,
+            n_workers=model.n_workers,
+            averaging=model.averaging,
+            averaging_window=model.averaging_window,
+            ewma_alpha=model.ewma_alpha,
+            start_frame=model.start_frame,
+            stride=model.stride,
+            max_frames=model.max_frames or None,
+            equilibrate=model.equilibrate,
+            equilibration_window=model.equilibration_window,
+            equilibration_tolerance=model.equilibration_tolerance,
+            incremental=model.incremental,
+            verlet_skin=model.verlet_skin,
         )
 
+        # Return the aggregation number previously calculated from
+        # an identical simulation, if memoised
+        memo = self.get_kpi_memo(model)
+        key = None
+        if memo is not None:
+            key = memo.aggregation_key(
+                trajectory_file,
+                dict(analysis_kwargs,
+                     fragment_symbols=list(model.fragment_symbols),
+                     method=model.method,
+                     atom_thresh=model.atom_thresh,
+                     n_workers=None))
+        if key is not None:
+            aggregation_number = memo.get_aggregation(key)
+            if aggregation_number is not None:
+                model.notify_pass_mark(aggregation_number > model.threshold)
+                return [
+                    DataValue(type="AGGREGATION", value=aggregation_number)
+                ]
+
+        # Calculate moving average of micelle aggregation numbers for each
+        # frame of trajectory
+        if model.stream_trajectory:
+            aggregation_numbers = self.stream_aggregation_numbers(
+                trajectory_file,
+                fragments,
+                symbols=model.fragment_symbols,
+                window=model.stream_window,
+                **analysis_kwargs
+            )
+        else:
+            if model.cache_trajectory:
+                # Open memory mapped binary copy of trajectory file,
+                # converting it on first use
+                trajectory_data = load_trajectory_cache(
+                    trajectory_file, symbols=model.fragment_symbols
+                )
+            else:
+                # Read trajectory file to return simulation data of
+                # fragments
+                trajectory_data = self._reader.read(
+                    trajectory_file, symbols=model.fragment_symbols
+                )
+            aggregation_numbers = self.calculate_aggregation_numbers(
+                trajectory_data,
+                fragments,
+                **analysis_kwargs
+            )
+
+        if len(aggregation_numbers) == 0:
+            raise ValueError(
+                f"No frames of trajectory {trajectory_file} were "
+                f"selected for analysis (start_frame={model.start_frame}, "
+                f"stride={model.stride}, max_frames={model.max_frames})"
+            )
+
+        if key is not None:
+            memo.add_aggregation(key, aggregation_numbers[-1])
+
         pass_mark = aggregation_numbers[-1] > model.threshold
 
         model.notify_pass_mark(pass_mark)
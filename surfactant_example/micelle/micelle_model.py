@@ -1,7 +1,7 @@
-from traits.api import Float, Int, Enum, List, Unicode
+from traits.api import Bool, Float, Int, Enum, List, Range, Unicode
 from traitsui.api import View, Item
 
-from force_bdss.api import BaseDataSourceModel
+from force_bdss.api import BaseDataSourceModel, PositiveInt
 
 from surfactant_example.mco.driver_events import KPIProgressEvent
 
@@ -32,23 +32,149 @@ class MicelleDataSourceModel(BaseDataSourceModel):
     # Clustering method
     method = Enum('molecular', 'atomic', desc='Clustering method')
 
+    # Neighbour search method used to build the clustering
+    # adjacency matrix
+    neighbour_backend = Enum(
+        'dense', 'cell_list', 'kdtree',
+        desc='Neighbour search method used for clustering'
+    )
+
     # Threshold number of atomic neighbours for a molecular neighbour
     atom_thresh = Int(
         5, desc='Lower threshold number of atomic neighbours for '
                 'a molecular neighbour'
     )
 
+    # Whether to cluster each frame incrementally from the last
+    incremental = Bool(
+        False, desc='Cluster each trajectory frame incrementally from '
+                    'the last, using a Verlet neighbour list'
+    )
+
+    # Skin distance of the Verlet neighbour list used for incremental
+    # clustering
+    verlet_skin = Float(
+        0.3, desc='Skin distance of the Verlet neighbour list used for '
+                  'incremental clustering'
+    )
+
+    # Number of worker processes used to analyse trajectory frames
+    n_workers = PositiveInt(
+        1, desc='Number of worker processes used to analyse '
+                'trajectory frames in parallel'
+    )
+
+    # Whether to parse the trajectory file frame by frame, rather
+    # than loading it into memory before analysis
+    stream_trajectory = Bool(
+        False, desc='Parse the trajectory file frame by frame to '
+                    'bound memory usage'
+    )
+
+    # Number of trajectory frames sent to each worker process when
+    # streaming
+    stream_window = PositiveInt(
+        1, desc='Number of trajectory frames sent to each worker '
+                'process when streaming'
+    )
+
+    # Whether to convert the trajectory file into a memory mapped
+    # binary cache, that is reused by subsequent analyses
+    cache_trajectory = Bool(
+        False, desc='Cache the trajectory file in a memory mapped binary '
+                    'format for repeated analysis'
+    )
+
+    # Index of first trajectory frame to analyse
+    start_frame = Range(
+        low=0, value=0, desc='Index of first trajectory frame to analyse'
+    )
+
+    # Interval between analysed trajectory frames
+    stride = PositiveInt(
+        1, desc='Interval between analysed trajectory frames'
+    )
+
+    # Maximum number of trajectory frames to analyse
+    max_frames = Range(
+        low=0, value=0,
+        desc='Maximum number of trajectory frames to analyse '
+             '(0 analyses all remaining frames)'
+    )
+
+    # Whether to exclude frames before the mean cluster size has
+    # equilibrated from the average
+    equilibrate = Bool(
+        False, desc='Exclude frames before the mean cluster size has '
+                    'equilibrated'
+    )
+
+    # Number of analysed frames in each block average used to detect
+    # equilibration
+    equilibration_window = PositiveInt(
+        10, desc='Number of analysed frames in each block average used '
+                 'to detect equilibration'
+    )
+
+    # Relative tolerance on block averages used to detect equilibration
+    equilibration_tolerance = Float(
+        0.1, desc='Relative tolerance on block averages used to detect '
+                  'equilibration'
+    )
+
+    # Method used to average cluster sizes over trajectory frames
+    averaging = Enum(
+        'cumulative', 'windowed', 'ewma',
+        desc='Method used to average cluster sizes over trajectory frames'
+    )
+
+    # Number of frames included in a windowed average
+    averaging_window = PositiveInt(
+        10, desc='Number of trajectory frames included in a windowed '
+                 'average'
+    )
+
+    # Smoothing factor for an exponentially weighted average
+    ewma_alpha = Range(
+        0.0, 1.0, 0.1, exclude_low=True,
+        desc='Smoothing factor for an exponentially weighted average'
+    )
+
     # Lower threshold on accepted aggregation number
     threshold = Float(0.0)
 
+    # File path of a KPI memo, used to return aggregation numbers
+    # previously calculated from identical simulations
+    kpi_memo_file = Unicode(
+        desc='SQLite file that memoises simulation results and KPIs. '
+             'Memoisation is disabled if left empty'
+    )
+
     traits_view = View(
         Item('fragment_symbols'),
         Item('method'),
+        Item('neighbour_backend'),
         Item('r_thresh'),
         Item('noise_thresh'),
         Item('cluster_thresh'),
         Item('atom_thresh', visible_when="method=='atomic'"),
+        Item('incremental'),
+        Item('verlet_skin', visible_when="incremental"),
+        Item('n_workers', visible_when="not incremental"),
+        Item('cache_trajectory', visible_when="not stream_trajectory"),
+        Item('stream_trajectory'),
+        Item('stream_window', visible_when="stream_trajectory"),
+        Item('start_frame'),
+        Item('stride'),
+        Item('max_frames'),
+        Item('equilibrate'),
+        Item('equilibration_window', visible_when="equilibrate"),
+        Item('equilibration_tolerance', visible_when="equilibrate"),
+        Item('averaging'),
+        Item('averaging_window', visible_when="averaging=='windowed'"),
+        Item('ewma_alpha', visible_when="averaging=='ewma'"),
         Item('threshold'),
+        Item('kpi_memo_file'),
     )
 
     def notify_pass_mark(self, pass_mark):
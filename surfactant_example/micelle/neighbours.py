@@ -0,0 +1,260 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.spatial import cKDTree
+
+from force_gromacs.api import batch_distance_matrix
+
+from surfactant_example.micelle.utilities import matrix_threshold
+
+#: Available methods to identify neighbouring particles
+NEIGHBOUR_BACKENDS = ['dense', 'cell_list', 'kdtree']
+
+
+def minimum_image(vectors, cell_dim):
+    """Applies the minimum image convention to a set of displacement
+    vectors in a periodic rectangular simulation cell"""
+
+    cell_dim = np.asarray(cell_dim, dtype=float)
+
+    return vectors - cell_dim * np.round(vectors / cell_dim)
+
+
+def wrap_coordinates(coord, cell_dim):
+    """Wraps coordinates back into a periodic rectangular simulation
+    cell, so that all values lie in the half-open interval
+    [0, cell_dim)"""
+
+    cell_dim = np.asarray(cell_dim, dtype=float)
+    coord = np.asarray(coord, dtype=float) % cell_dim
+
+    # Floating point rounding can return cell_dim for very small
+    # negative values
+    return np.where(coord >= cell_dim, 0, coord)
+
+
+def sparse_adjacency(indices_i, indices_j, n_elements):
+    """Returns a binary scipy sparse CSR matrix of shape
+    (n_elements, n_elements) with non-zero entries at each
+    (indices_i, indices_j) pair"""
+
+    data = np.ones(len(indices_i), dtype=int)
+
+    matrix = coo_matrix(
+        (data, (indices_i, indices_j)),
+        shape=(n_elements, n_elements)
+    )
+
+    return matrix.tocsr()
+
+
+def cell_neighbour_offsets(n_cells):
+    """Returns the unique set of periodic offsets that cover each
+    neighbouring cell along each dimension of a cell list grid. For
+    grids with fewer than 3 cells along a dimension, any repeated
+    offsets are removed so that no cell is visited twice"""
+
+    return [
+        np.unique(np.array([-1, 0, 1]) % n_cell)
+        for n_cell in n_cells
+    ]
+
+
+def cell_list_adjacency(coord, cell_dim, r_thresh):
+    """Identifies all pairs of particles in coord lying within r_thresh
+    radial distance of each other using a periodic linked cell list.
+    Only candidate pairs in neighbouring cells are evaluated, so both
+    time and memory scale as O(N) for a fixed particle density.
+
+    Parameters
+    ----------
+    coord:  array_like of floats
+        Positions of particles in 3 dimensions
+    cell_dim:  array_like of floats
+        Simulation cell dimensions in 3 dimensions
+    r_thresh: float
+        Upper threshold on radial distance to consider whether two
+        particles are neighbours
+
+    Returns
+    -------
+    adjacency_matrix: scipy.sparse.csr_matrix of int
+        An n x n binary matrix containing non-zero entries corresponding
+        to particles i and j lying within r_thresh of each other
+    """
+
+    coord = np.asarray(coord, dtype=float)
+    cell_dim = np.asarray(cell_dim, dtype=float)
+    n_particles = coord.shape[0]
+    r2_thresh = r_thresh ** 2
+
+    # Wrap all particles back into the simulation cell
+    coord = wrap_coordinates(coord, cell_dim)
+
+    # Divide the simulation cell into a grid of cells that are each
+    # at least r_thresh in length along every dimension
+    n_cells = np.maximum(
+        np.floor(cell_dim / r_thresh).astype(int), 1)
+    cell_index = np.floor(coord / cell_dim * n_cells).astype(int)
+    cell_index = np.minimum(cell_index, n_cells - 1)
+
+    # Sort particles by their flattened cell index, so that each
+    # cell references a contiguous block of particles
+    cell_id = np.ravel_multi_index(cell_index.T, n_cells)
+    order = np.argsort(cell_id, kind='mergesort')
+    cell_count = np.bincount(cell_id, minlength=np.prod(n_cells))
+    cell_start = np.concatenate(([0], np.cumsum(cell_count)[:-1]))
+
+    indices_i = []
+    indices_j = []
+
+    offsets = cell_neighbour_offsets(n_cells)
+    for offset in np.stack(np.meshgrid(*offsets), -1).reshape(-1, 3):
+
+        # Identify the neighbouring cell of each particle for
+        # this offset
+        neighbour_index = (cell_index + offset) % n_cells
+        neighbour_id = np.ravel_multi_index(neighbour_index.T, n_cells)
+        counts = cell_count[neighbour_id]
+
+        # Generate all candidate pairs between each particle and the
+        # particles stored in its neighbouring cell
+        candidate_i = np.repeat(np.arange(n_particles), counts)
+        group_start = np.repeat(np.cumsum(counts) - counts, counts)
+        position = np.arange(candidate_i.size) - group_start
+        candidate_j = order[
+            np.repeat(cell_start[neighbour_id], counts) + position
+        ]
+
+        # Only keep those pairs that lie within r_thresh
+        vectors = minimum_image(
+            coord[candidate_i] - coord[candidate_j], cell_dim)
+        r2_coord = np.sum(vectors ** 2, axis=-1)
+        mask = (r2_coord < r2_thresh) * (r2_coord > 0)
+
+        indices_i.append(candidate_i[mask])
+        indices_j.append(candidate_j[mask])
+
+    return sparse_adjacency(
+        np.concatenate(indices_i), np.concatenate(indices_j), n_particles
+    )
+
+
+def kdtree_adjacency(coord, cell_dim, r_thresh):
+    """Identifies all pairs of particles in coord lying within r_thresh
+    radial distance of each other using a periodic KD-tree. Both time
+    and memory scale as O(N log N).
+
+    Parameters
+    ----------
+    coord:  array_like of floats
+        Positions of particles in 3 dimensions
+    cell_dim:  array_like of floats
+        Simulation cell dimensions in 3 dimensions
+    r_thresh: float
+        Upper threshold on radial distance to consider whether two
+        particles are neighbours
+
+    Returns
+    -------
+    adjacency_matrix: scipy.sparse.csr_matrix of int
+        An n x n binary matrix containing non-zero entries corresponding
+        to particles i and j lying within r_thresh of each other
+    """
+
+    cell_dim = np.asarray(cell_dim, dtype=float)
+    coord = wrap_coordinates(coord, cell_dim)
+    n_particles = coord.shape[0]
+
+    # Build a KD-tree with periodic boundaries along each dimension
+    # and return all unique pairs i < j lying within r_thresh. Pairs
+    # are returned as a set, since ndarray output requires SciPy 1.6
+    tree = cKDTree(coord, boxsize=cell_dim)
+    pairs = np.array(
+        sorted(tree.query_pairs(r_thresh)), dtype=int).reshape(-1, 2)
+
+    # KD-tree queries include pairs at exactly r_thresh, so refine to
+    # only keep those that lie strictly within r_thresh
+    vectors = minimum_image(
+        coord[pairs[:, 0]] - coord[pairs[:, 1]], cell_dim)
+    r2_coord = np.sum(vectors ** 2, axis=-1)
+    pairs = pairs[(r2_coord < r_thresh ** 2) * (r2_coord > 0)]
+
+    return sparse_adjacency(
+        np.concatenate((pairs[:, 0], pairs[:, 1])),
+        np.concatenate((pairs[:, 1], pairs[:, 0])),
+        n_particles
+    )
+
+
+def dense_adjacency(coord, cell_dim, r_thresh, batch_size=50):
+    """Identifies all pairs of particles in coord lying within r_thresh
+    radial distance of each other from the full N x N distance matrix.
+    Both time and memory scale as O(N^2).
+
+    Parameters
+    ----------
+    coord:  array_like of floats
+        Positions of particles in 3 dimensions
+    cell_dim:  array_like of floats
+        Simulation cell dimensions in 3 dimensions
+    r_thresh: float
+        Upper threshold on radial distance to consider whether two
+        particles are neighbours
+    batch_size : int, optional, default: 50
+        Sample size parameter of each batch.
+
+    Returns
+    -------
+    adjacency_matrix: array_like of int
+        An n x n binary matrix containing non-zero entries corresponding
+        to particles i and j lying within r_thresh of each other
+    """
+
+    # Calculate cartesian and radial distances between particles
+    # Perform this as a batch process to save memory
+    r2_coord = batch_distance_matrix(coord, cell_dim,
+                                     metric='sqeuclidean',
+                                     batch_size=batch_size)
+
+    # Identify particles lying within r_thresh radial distance
+    return matrix_threshold(r2_coord, upper_thresh=r_thresh**2)
+
+
+def neighbour_adjacency(coord, cell_dim, r_thresh, backend='dense',
+                        batch_size=50):
+    """Returns a binary adjacency matrix identifying all pairs of
+    particles in coord lying within r_thresh radial distance of each
+    other, using the neighbour search method selected by backend.
+
+    Parameters
+    ----------
+    coord:  array_like of floats
+        Positions of particles in 3 dimensions
+    cell_dim:  array_like of floats
+        Simulation cell dimensions in 3 dimensions
+    r_thresh: float
+        Upper threshold on radial distance to consider whether two
+        particles are neighbours
+    backend: str, optional, default: 'dense'
+        Neighbour search method, either 'dense', 'cell_list' or 'kdtree'
+    batch_size : int, optional, default: 50
+        Sample size parameter of each batch, used by the 'dense'
+        backend only.
+
+    Returns
+    -------
+    adjacency_matrix: array_like or scipy.sparse.csr_matrix of int
+        An n x n binary matrix containing non-zero entries corresponding
+        to particles i and j lying within r_thresh of each other. A
+        sparse matrix is returned by all backends apart from 'dense'
+    """
+
+    assert backend in NEIGHBOUR_BACKENDS
+
+    if backend == 'cell_list':
+        return cell_list_adjacency(coord, cell_dim, r_thresh)
+    elif backend == 'kdtree':
+        return kdtree_adjacency(coord, cell_dim, r_thresh)
+
+    return dense_adjacency(coord, cell_dim, r_thresh,
+                           batch_size=batch_size)
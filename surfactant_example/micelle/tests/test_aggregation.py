@@ -0,0 +1,255 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+
+import numpy as np
+
+from surfactant_example.micelle.aggregation import (
+    frame_cluster_sizes, parallel_cluster_sizes, frame_windows,
+    stream_cluster_sizes, aggregation_statistics, frame_selection,
+    histogram_sizes, equilibration_frame, tracked_cluster_sizes,
+    memmap_layout, open_memmap_layout
+)
+
+
+class AggregationTestCase(TestCase):
+
+    def setUp(self):
+
+        # Trajectory contains 2 surfactant fragments: the first with
+        # 2 sites per molecule and the second with 1 site per molecule
+        random = np.random.RandomState(0)
+        self.n_frames = 7
+        self.coordinates = random.uniform(0, 4, size=(self.n_frames, 60, 3))
+        self.dimensions = np.full((self.n_frames, 3), 4.0)
+        self.fragment_data = [
+            (np.arange(40), 2, np.array([40, 20])),
+            (np.arange(40, 60), 1, np.array([30]))
+        ]
+
+    def test_frame_cluster_sizes(self):
+
+        coordinates = np.array([[0, 0, 0],
+                                [0.2, 0, 0],
+                                [1, 1, 1],
+                                [1.2, 1, 1],
+                                [2.5, 2.5, 2.5]])
+        fragment_data = [(np.arange(4), 2, np.array([1, 1])),
+                         (np.array([4]), 1, np.array([1]))]
+        dimensions = np.array([4, 4, 4])
+
+        sizes = frame_cluster_sizes(
+            coordinates, dimensions, fragment_data,
+            r_thresh=1.8, cluster_thresh=2)
+        self.assertListEqual([2], sizes.tolist())
+
+        sizes = frame_cluster_sizes(
+            coordinates, dimensions, fragment_data,
+            r_thresh=1.0, cluster_thresh=2)
+        self.assertListEqual([], sizes.tolist())
+
+        sizes = frame_cluster_sizes(
+            coordinates, dimensions, fragment_data, method='atomic',
+            mol_ref=['1A', '1A', '2A', '2A', '1B'],
+            r_thresh=1.8, cluster_thresh=2)
+        self.assertListEqual([2], sizes.tolist())
+
+    def test_parallel_cluster_sizes(self):
+
+        kwargs = dict(r_thresh=0.8, noise_thresh=1, cluster_thresh=2)
+
+        serial = [
+            frame_cluster_sizes(
+                self.coordinates[frame], self.dimensions[frame],
+                self.fragment_data, **kwargs)
+            for frame in range(self.n_frames)
+        ]
+
+        for chunk_size in [None, 1, 3]:
+            parallel = parallel_cluster_sizes(
+                self.coordinates, self.dimensions, self.fragment_data,
+                n_workers=2, chunk_size=chunk_size, **kwargs)
+
+            self.assertEqual(self.n_frames, len(parallel))
+            for expected, sizes in zip(serial, parallel):
+                self.assertListEqual(expected.tolist(), sizes.tolist())
+
+    def test_memmap_layout(self):
+
+        self.assertIsNone(memmap_layout(self.coordinates))
+
+        with TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'coord.npy')
+            np.save(file_path, self.coordinates.astype(np.float32))
+            coordinates = np.load(file_path, mmap_mode='r')
+
+            # Views of memory mapped arrays are located in their file
+            for view in [coordinates, coordinates[1::2], coordinates[3:]]:
+                layout = memmap_layout(view)
+                self.assertEqual(file_path, layout[0])
+                array = open_memmap_layout(layout)
+                self.assertEqual(np.float32, array.dtype)
+                np.testing.assert_array_equal(view, array)
+            del view, array, coordinates
+
+    def test_parallel_cluster_sizes_empty(self):
+
+        self.assertListEqual([], parallel_cluster_sizes(
+            self.coordinates[:0], self.dimensions[:0], self.fragment_data,
+            r_thresh=0.8))
+
+    def test_parallel_cluster_sizes_memmap(self):
+
+        kwargs = dict(r_thresh=0.8, noise_thresh=1, cluster_thresh=2)
+
+        with TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'coord.npy')
+            np.save(file_path, self.coordinates.astype(np.float32))
+            coordinates = np.load(file_path, mmap_mode='r')[1::2]
+
+            serial = [
+                frame_cluster_sizes(
+                    frame, dimensions, self.fragment_data, **kwargs)
+                for frame, dimensions in zip(
+                    coordinates, self.dimensions[1::2])
+            ]
+
+            # Existing memory mapped files are not copied
+            with mock.patch('numpy.memmap', wraps=np.memmap) as mock_memmap:
+                parallel = parallel_cluster_sizes(
+                    coordinates, self.dimensions[1::2],
+                    self.fragment_data, n_workers=2, **kwargs)
+            mock_memmap.assert_not_called()
+            del coordinates
+
+        self.assertEqual(len(serial), len(parallel))
+        for expected, sizes in zip(serial, parallel):
+            self.assertListEqual(expected.tolist(), sizes.tolist())
+
+    def test_frame_windows(self):
+
+        windows = list(frame_windows(range(5), window=2))
+        self.assertListEqual([[0, 1], [2, 3], [4]], windows)
+
+        windows = list(frame_windows(range(2), window=3))
+        self.assertListEqual([[0, 1]], windows)
+
+    def test_stream_cluster_sizes(self):
+
+        kwargs = dict(r_thresh=0.8, noise_thresh=1, cluster_thresh=2)
+
+        serial = [
+            frame_cluster_sizes(
+                self.coordinates[frame], self.dimensions[frame],
+                self.fragment_data, **kwargs)
+            for frame in range(self.n_frames)
+        ]
+
+        for n_workers, window in [(1, 1), (2, 1), (2, 3)]:
+            frames = zip(self.coordinates, self.dimensions)
+            streamed = list(stream_cluster_sizes(
+                frames, self.fragment_data, n_workers=n_workers,
+                window=window, **kwargs))
+
+            self.assertEqual(self.n_frames, len(streamed))
+            for expected, sizes in zip(serial, streamed):
+                self.assertListEqual(expected.tolist(), sizes.tolist())
+
+    def test_aggregation_statistics(self):
+
+        frame_sizes = [
+            np.array([], dtype=int),
+            np.array([2, 4]),
+            np.array([3]),
+            np.array([5, 5, 2])
+        ]
+
+        aggregation_numbers, histogram = aggregation_statistics(frame_sizes)
+        self.assertTrue(
+            np.allclose([0, 3, 3, 21 / 6], aggregation_numbers))
+        self.assertEqual((4, 6), histogram.shape)
+        self.assertListEqual([0, 0, 0, 0, 0, 0], histogram[0].tolist())
+        self.assertListEqual([0, 0, 1, 0, 1, 0], histogram[1].tolist())
+        self.assertListEqual([0, 0, 1, 0, 0, 2], histogram[3].tolist())
+
+        aggregation_numbers, _ = aggregation_statistics(
+            frame_sizes, mode='windowed', window=2)
+        self.assertTrue(
+            np.allclose([0, 3, 3, 15 / 4], aggregation_numbers))
+
+        aggregation_numbers, _ = aggregation_statistics(
+            frame_sizes, mode='ewma', alpha=0.5)
+        self.assertTrue(
+            np.allclose([0, 3, 3, 15 / 4], aggregation_numbers))
+
+        # An ewma with alpha = 1 only includes the latest frame
+        aggregation_numbers, _ = aggregation_statistics(
+            frame_sizes, mode='ewma', alpha=1)
+        self.assertTrue(np.allclose([0, 3, 3, 4], aggregation_numbers))
+
+        aggregation_numbers, histogram = aggregation_statistics(iter([]))
+        self.assertEqual((0,), aggregation_numbers.shape)
+        self.assertEqual((0, 0), histogram.shape)
+
+        with self.assertRaises(AssertionError):
+            aggregation_statistics(frame_sizes, mode='not_a_mode')
+
+    def test_frame_selection(self):
+
+        frames = np.arange(10)
+
+        self.assertListEqual(
+            list(range(10)), frames[frame_selection()].tolist())
+        self.assertListEqual(
+            [2, 5, 8], frames[frame_selection(2, 3)].tolist())
+        self.assertListEqual(
+            [1, 3], frames[frame_selection(1, 2, 2)].tolist())
+
+        with self.assertRaises(AssertionError):
+            frame_selection(stride=0)
+
+    def test_histogram_sizes(self):
+
+        self.assertListEqual(
+            [2, 5, 5], histogram_sizes([0, 0, 1, 0, 0, 2]).tolist())
+        self.assertListEqual([], histogram_sizes([]).tolist())
+
+    def test_equilibration_frame(self):
+
+        # Mean cluster size grows from 2 to 10 over the first 20
+        # frames and is then constant
+        sizes = np.concatenate([np.linspace(2, 10, 20), np.full(40, 10)])
+        histogram = np.zeros((60, 11), dtype=int)
+        histogram[np.arange(60), np.round(sizes).astype(int)] = 1
+
+        first_frame = equilibration_frame(
+            histogram, window=5, tolerance=0.05)
+        self.assertTrue(13 < first_frame <= 20)
+
+        # Frames are only discarded once equilibrium can be identified
+        self.assertEqual(0, equilibration_frame(histogram[:9], window=5))
+        self.assertEqual(
+            0, equilibration_frame(np.zeros((20, 1), dtype=int), window=5))
+
+    def test_tracked_cluster_sizes(self):
+
+        kwargs = dict(r_thresh=0.8, noise_thresh=1, cluster_thresh=2)
+
+        for method in ['molecular', 'atomic']:
+            mol_ref = [f"{index // 2}A" for index in range(60)]
+            serial = [
+                frame_cluster_sizes(
+                    self.coordinates[frame], self.dimensions[frame],
+                    self.fragment_data, method=method, mol_ref=mol_ref,
+                    **kwargs)
+                for frame in range(self.n_frames)
+            ]
+            tracked = list(tracked_cluster_sizes(
+                zip(self.coordinates, self.dimensions),
+                self.fragment_data, method=method, mol_ref=mol_ref,
+                **kwargs))
+
+            self.assertEqual(self.n_frames, len(tracked))
+            for expected, sizes in zip(serial, tracked):
+                self.assertListEqual(
+                    sorted(expected.tolist()), sorted(sizes.tolist()))
@@ -1,9 +1,10 @@
 from unittest import TestCase
 
 import numpy as np
+from scipy.sparse import csr_matrix
 
 from surfactant_example.micelle.cluster import (
-    molecular_criteria, cluster, label_elements,
+    molecular_criteria, molecular_incidence, cluster, label_elements,
     label_set)
 
 
@@ -121,6 +122,29 @@ class LabelTestCase(TestCase):
                                 cluster_thresh=2)
         self.assertTrue(np.allclose(np.zeros(12), labels))
 
+    def test_label_elements_sparse(self):
+
+        for matrix in [self.matrix, self.large_matrix, self.single_cluster]:
+            for noise_thresh in [1, 2, 3]:
+                for cluster_thresh in [1, 2, 4]:
+                    self.assertTrue(np.array_equal(
+                        label_elements(matrix, noise_thresh=noise_thresh,
+                                       cluster_thresh=cluster_thresh),
+                        label_elements(csr_matrix(matrix),
+                                       noise_thresh=noise_thresh,
+                                       cluster_thresh=cluster_thresh)
+                    ))
+
+        labels = label_elements(csr_matrix((4, 4)), cluster_thresh=1)
+        self.assertTrue(np.allclose(np.zeros(4), labels))
+
+        labels = label_elements(csr_matrix((4, 4)), noise_thresh=0,
+                                cluster_thresh=1)
+        self.assertTrue(np.allclose(np.array([1, 2, 3, 4]), labels))
+
+        with self.assertRaises(TypeError):
+            label_elements(self.matrix.tolist())
+
 
 class ClusterTestCase(TestCase):
 
@@ -186,6 +210,30 @@ class ClusterTestCase(TestCase):
             np.array([1, 1, 1, 1, 1]), labels)
         )
 
+    def test_cluster_sparse_backends(self):
+
+        for backend in ['cell_list', 'kdtree']:
+            labels = cluster(self.coord, self.cell_dim, 1.0,
+                             neighbour_backend=backend)
+            self.assertEqual(0, len(label_set(labels)))
+
+            labels = cluster(self.coord, self.cell_dim, 1.74,
+                             neighbour_backend=backend)
+            self.assertTrue(np.allclose(
+                np.array([1, 1, 1, 1, 1]), labels)
+            )
+
+            labels = cluster(self.coord, self.cell_dim, 1.74,
+                             method='atomic', mol_ref=self.mol_ref,
+                             neighbour_backend=backend)
+            self.assertTrue(np.allclose(
+                np.array([1, 1, 1]), labels)
+            )
+
+        with self.assertRaises(AssertionError):
+            cluster(self.coord, self.cell_dim, 1.74,
+                    neighbour_backend='not_a_backend')
+
     def test_cluster_atomic(self):
 
         labels = cluster(self.coord[:-1], self.cell_dim, 1.74,
@@ -200,6 +248,50 @@ class ClusterTestCase(TestCase):
             np.array([1, 1, 1]), labels)
         )
 
+    def test_molecular_incidence(self):
+
+        incidence_matrix = molecular_incidence(
+            ['2PS', '2PS', '1PS', '1PS', '1NA'])
+
+        self.assertEqual((5, 3), incidence_matrix.shape)
+        self.assertTrue(
+            np.allclose(
+                np.array([[1, 0, 0],
+                          [1, 0, 0],
+                          [0, 1, 0],
+                          [0, 1, 0],
+                          [0, 0, 1]]),
+                incidence_matrix.toarray()
+            )
+        )
+
+    def test_molecular_criteria_sparse(self):
+        mol_ref = ['1PS', '1PS', '1PS', '2PS', '2PS', '2PS']
+        matrix = np.array([[0, 1, 1, 0, 0, 0],
+                           [1, 0, 1, 0, 0, 0],
+                           [1, 1, 0, 0, 1, 1],
+                           [0, 0, 0, 0, 1, 1],
+                           [0, 0, 1, 1, 0, 1],
+                           [0, 0, 1, 1, 1, 0]])
+        incidence_matrix = molecular_incidence(mol_ref)
+
+        mol_matrix = molecular_criteria(
+            csr_matrix(matrix), incidence_matrix=incidence_matrix,
+            atom_thresh=2)
+        self.assertIsInstance(mol_matrix, csr_matrix)
+        self.assertTrue(
+            np.allclose(
+                np.array([[0, 1],
+                          [1, 0]]),
+                mol_matrix.toarray()
+            )
+        )
+
+        mol_matrix = molecular_criteria(
+            csr_matrix(matrix), incidence_matrix=incidence_matrix,
+            atom_thresh=3)
+        self.assertEqual(0, mol_matrix.nnz)
+
     def test_molecular_criteria(self):
         mol_ref = ['1PS', '1PS', '1PS', '2PS', '2PS', '2PS']
         matrix = np.array([[0, 1, 1, 0, 0, 0],
@@ -0,0 +1,78 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import numpy as np
+
+from surfactant_example.micelle.gro_stream import (
+    read_gro_frame, skip_gro_frame, iter_gro_frames
+)
+
+GRO_FRAME = (
+    "Test frame t= {}\n"
+    "    4\n"
+    "    1PS1     C1    1   0.546   0.326   0.070\n"
+    "    1PS1     C2    2   0.285   0.135   0.310\n"
+    "    2SS      S1    3   0.212   0.178   0.770\n"
+    "    3SOL     OW    4   0.166   0.422   1.173\n"
+    "   4.36258   4.36258   4.36258\n"
+)
+
+
+class GroStreamTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.file_path = os.path.join(self.directory.name, 'test.gro')
+        with open(self.file_path, 'w') as outfile:
+            for time in range(5):
+                outfile.write(GRO_FRAME.format(time))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_read_gro_frame(self):
+
+        with open(self.file_path, 'r') as infile:
+            frame = read_gro_frame(infile)
+
+            self.assertListEqual(
+                ["1PS1", "1PS1", "2SS", "3SOL"], frame["mol_ref"])
+            self.assertListEqual(
+                ["PS1", "PS1", "SS", "SOL"], frame["resname"].tolist())
+            self.assertEqual((4, 3), frame["coord"].shape)
+            self.assertTrue(
+                np.allclose([0.285, 0.135, 0.310], frame["coord"][1]))
+            self.assertTrue(np.allclose(np.full(3, 4.36258), frame["dim"]))
+
+            frame = read_gro_frame(infile, symbols=["PS1", "SS"])
+            self.assertListEqual(["1PS1", "1PS1", "2SS"], frame["mol_ref"])
+            self.assertEqual((3, 3), frame["coord"].shape)
+
+            for _ in range(3):
+                self.assertTrue(skip_gro_frame(infile))
+            self.assertFalse(skip_gro_frame(infile))
+            self.assertIsNone(read_gro_frame(infile))
+
+    def test_iter_gro_frames(self):
+
+        frames = list(iter_gro_frames(self.file_path, symbols=["SS"]))
+
+        self.assertEqual(5, len(frames))
+        for frame in frames:
+            self.assertListEqual(["2SS"], frame["mol_ref"])
+            self.assertTrue(
+                np.allclose([[0.212, 0.178, 0.770]], frame["coord"]))
+
+    def test_iter_gro_frames_selection(self):
+
+        def frame_count(**kwargs):
+            return len(list(iter_gro_frames(self.file_path, **kwargs)))
+
+        self.assertEqual(3, frame_count(start_frame=2))
+        self.assertEqual(3, frame_count(stride=2))
+        self.assertEqual(2, frame_count(start_frame=1, stride=2))
+        self.assertEqual(2, frame_count(max_frames=2))
+        self.assertEqual(1, frame_count(start_frame=1, stride=3,
+                                        max_frames=1))
+        self.assertEqual(0, frame_count(start_frame=7))
@@ -1,12 +1,19 @@
-from unittest import TestCase
+import os
+import tempfile
+from unittest import TestCase, mock
 
 import numpy as np
 
+from traits.api import TraitError
 from traits.testing.unittest_tools import UnittestTools
 
 from force_bdss.api import DataValue
 from force_gromacs.tests.fixtures import gromacs_coordinate_file
 
+from surfactant_example.data.kpi_memo import KPIMemo
+from surfactant_example.micelle.micelle_data_source import (
+    MicelleDataSource
+)
 from surfactant_example.surfactant_plugin import SurfactantPlugin
 from surfactant_example.tests.probe_classes.probe_formulations import (
     ProbeFormulation,
@@ -55,6 +62,67 @@ class TestMicelleDataSource(TestCase, UnittestTools):
 
         self.assertEqual(2, res[0].value)
 
+    def test_kpi_memo(self):
+
+        model = self.factory.create_model()
+        model.fragment_symbols = ["PS1", "SS"]
+        in_slots = self.data_source.slots(model)[0]
+        data_values = [
+            DataValue(type=slot.type, value=value)
+            for slot, value in zip(
+                in_slots, [self.formulation, self.traj_file])
+        ]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model.kpi_memo_file = os.path.join(tmp_dir, 'memo.db')
+            memo = KPIMemo(file_path=model.kpi_memo_file)
+            memo.add_simulation('simulation', self.traj_file)
+
+            res = self.data_source.run(model, data_values)
+            self.assertEqual(2, res[0].value)
+
+            # Memoised aggregation number is returned without
+            # analysing the trajectory again
+            with mock.patch.object(
+                    MicelleDataSource,
+                    'calculate_aggregation_numbers') as mock_calculate:
+                with self.assertTraitChanges(model, "event", count=1):
+                    res = self.data_source.run(model, data_values)
+            mock_calculate.assert_not_called()
+            self.assertEqual(2, res[0].value)
+
+            self.assertEqual(1, memo.statistics()['aggregation_hits'])
+            self.assertEqual(1, memo.statistics()['aggregation_misses'])
+
+            # Changing analysis parameters invalidates the memo
+            model.r_thresh = 1.5
+            self.data_source.run(model, data_values)
+            self.assertEqual(2, memo.statistics()['aggregation_misses'])
+
+    def test_frame_selection(self):
+
+        model = self.factory.create_model()
+        with self.assertRaises(TraitError):
+            model.start_frame = -1
+        with self.assertRaises(TraitError):
+            model.max_frames = -1
+
+        model.fragment_symbols = ["PS1", "SS"]
+        model.start_frame = 1000
+        in_slots = self.data_source.slots(model)[0]
+        data_values = [
+            DataValue(type=slot.type, value=value)
+            for slot, value in zip(
+                in_slots, [self.formulation, self.traj_file])
+        ]
+
+        # Selecting no trajectory frames raises a clear error
+        for n_workers in [1, 2]:
+            model.n_workers = n_workers
+            with self.assertRaisesRegex(
+                    ValueError, 'No frames of trajectory'):
+                self.data_source.run(model, data_values)
+
     def test_calculate_aggregation_numbers(self):
 
         trajectory_data = {
@@ -98,6 +166,82 @@ class TestMicelleDataSource(TestCase, UnittestTools):
         self.assertEqual((2,), agg_num.shape)
         self.assertTrue(np.allclose(np.array([2, 2]), agg_num))
 
+        agg_num = self.data_source.calculate_aggregation_numbers(
+            trajectory_data,
+            [primary_surfactant, secondary_surfactant],
+            cluster_thresh=1,
+            noise_thresh=1,
+            n_workers=2,
+        )
+        self.assertEqual((2,), agg_num.shape)
+        self.assertTrue(np.allclose(np.array([2, 2]), agg_num))
+
+        agg_num, histogram = self.data_source.calculate_aggregation_numbers(
+            trajectory_data,
+            [primary_surfactant, secondary_surfactant],
+            cluster_thresh=1,
+            noise_thresh=1,
+            averaging="windowed",
+            averaging_window=1,
+            return_histogram=True,
+        )
+        self.assertTrue(np.allclose(np.array([2, 2]), agg_num))
+        self.assertListEqual([[0, 0, 1], [0, 0, 1]], histogram.tolist())
+
+        agg_num = self.data_source.calculate_aggregation_numbers(
+            trajectory_data,
+            [primary_surfactant, secondary_surfactant],
+            cluster_thresh=1,
+            noise_thresh=1,
+            start_frame=1,
+            equilibrate=True,
+        )
+        self.assertTrue(np.allclose(np.array([2]), agg_num))
+
+        agg_num = self.data_source.calculate_aggregation_numbers(
+            trajectory_data,
+            [primary_surfactant, secondary_surfactant],
+            cluster_thresh=1,
+            noise_thresh=1,
+            incremental=True,
+        )
+        self.assertTrue(np.allclose(np.array([2, 2]), agg_num))
+
+    def test_stream_aggregation_numbers(self):
+
+        trajectory_data = self.data_source._reader.read(
+            self.traj_file, symbols=["PS1", "SS"]
+        )
+        fragments = self.formulation.fragment_search(["PS1", "SS"])
+
+        expected = self.data_source.calculate_aggregation_numbers(
+            trajectory_data, fragments
+        )
+
+        for n_workers, window in [(1, 1), (2, 2)]:
+            agg_num = self.data_source.stream_aggregation_numbers(
+                self.traj_file,
+                fragments,
+                symbols=["PS1", "SS"],
+                n_workers=n_workers,
+                window=window,
+            )
+            self.assertTrue(np.allclose(expected, agg_num))
+
+        # Test streaming in the data source
+        model = self.factory.create_model()
+        model.fragment_symbols = ["PS1", "SS"]
+        model.stream_trajectory = True
+        data_values = [
+            DataValue(type=slot.type, value=value)
+            for slot, value in zip(
+                self.data_source.slots(model)[0],
+                [self.formulation, self.traj_file]
+            )
+        ]
+        res = self.data_source.run(model, data_values)
+        self.assertEqual(2, res[0].value)
+
     def test_notify_pass_mark(self):
         model = self.factory.create_model()
         pass_mark = True
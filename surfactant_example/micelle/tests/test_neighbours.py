@@ -0,0 +1,144 @@
+from unittest import TestCase
+
+import numpy as np
+from scipy.sparse import spmatrix
+
+from surfactant_example.micelle.neighbours import (
+    minimum_image, wrap_coordinates, cell_neighbour_offsets,
+    cell_list_adjacency, kdtree_adjacency, neighbour_adjacency
+)
+
+
+def reference_adjacency(coord, cell_dim, r_thresh):
+    """Reference adjacency matrix calculated from the full
+    N x N distance matrix"""
+
+    vectors = minimum_image(
+        coord[:, np.newaxis] - coord[np.newaxis, :], cell_dim)
+    r2_coord = np.sum(vectors ** 2, axis=-1)
+
+    return np.where(
+        (r2_coord < r_thresh ** 2) * (r2_coord > 0), 1, 0)
+
+
+class NeighboursTestCase(TestCase):
+
+    def setUp(self):
+
+        self.coord = np.array([[0, 0, 0],
+                               [1, 1, 1],
+                               [4, 4, 4],
+                               [5, 5, 5],
+                               [2, 0, 2]])
+
+        self.cell_dim = np.array([6, 6, 6])
+
+    def test_minimum_image(self):
+
+        vectors = np.array([[4, -4, 1],
+                            [-3.5, 2.5, 0]])
+
+        self.assertTrue(
+            np.allclose(
+                np.array([[-2, 2, 1],
+                          [2.5, 2.5, 0]]),
+                minimum_image(vectors, self.cell_dim)
+            )
+        )
+
+    def test_wrap_coordinates(self):
+
+        coord = np.array([[-1, 7, 3],
+                          [6, 0, -1e-20]])
+
+        wrapped = wrap_coordinates(coord, self.cell_dim)
+        self.assertTrue(
+            np.allclose(
+                np.array([[5, 1, 3],
+                          [0, 0, 0]]),
+                wrapped
+            )
+        )
+        self.assertTrue(np.all(wrapped < self.cell_dim))
+
+    def test_cell_neighbour_offsets(self):
+
+        offsets = cell_neighbour_offsets([1, 2, 5])
+
+        self.assertListEqual([0], offsets[0].tolist())
+        self.assertListEqual([0, 1], offsets[1].tolist())
+        self.assertListEqual([0, 1, 4], offsets[2].tolist())
+
+    def test_cell_list_adjacency(self):
+
+        adjacency_matrix = cell_list_adjacency(
+            self.coord, self.cell_dim, 1.74)
+
+        self.assertIsInstance(adjacency_matrix, spmatrix)
+        self.assertEqual((5, 5), adjacency_matrix.shape)
+        self.assertTrue(
+            np.allclose(
+                np.array([[0, 1, 0, 1, 0],
+                          [1, 0, 0, 0, 1],
+                          [0, 0, 0, 1, 0],
+                          [1, 0, 1, 0, 0],
+                          [0, 1, 0, 0, 0]]),
+                adjacency_matrix.toarray()
+            )
+        )
+
+        adjacency_matrix = cell_list_adjacency(
+            self.coord, self.cell_dim, 1.0)
+        self.assertEqual(0, adjacency_matrix.nnz)
+
+    def test_kdtree_adjacency(self):
+
+        adjacency_matrix = kdtree_adjacency(
+            self.coord, self.cell_dim, 1.74)
+
+        self.assertIsInstance(adjacency_matrix, spmatrix)
+        self.assertTrue(
+            np.allclose(
+                np.array([[0, 1, 0, 1, 0],
+                          [1, 0, 0, 0, 1],
+                          [0, 0, 0, 1, 0],
+                          [1, 0, 1, 0, 0],
+                          [0, 1, 0, 0, 0]]),
+                adjacency_matrix.toarray()
+            )
+        )
+
+        # Pairs lying exactly at r_thresh are not neighbours
+        adjacency_matrix = kdtree_adjacency(
+            self.coord, self.cell_dim, np.sqrt(3))
+        self.assertEqual(0, adjacency_matrix.nnz)
+
+    def test_neighbour_adjacency(self):
+
+        for backend in ['cell_list', 'kdtree']:
+            adjacency_matrix = neighbour_adjacency(
+                self.coord, self.cell_dim, 1.74, backend=backend)
+            self.assertTrue(
+                np.array_equal(
+                    reference_adjacency(self.coord, self.cell_dim, 1.74),
+                    adjacency_matrix.toarray()
+                )
+            )
+
+        with self.assertRaises(AssertionError):
+            neighbour_adjacency(
+                self.coord, self.cell_dim, 1.74, backend='not_a_backend')
+
+    def test_random_coordinates(self):
+
+        random = np.random.RandomState(42)
+        cell_dim = np.array([7.5, 6.2, 9.1])
+        coord = random.uniform(-1, 10, size=(400, 3))
+
+        for r_thresh in [0.9, 1.25, 2.5, 4.0]:
+            reference = reference_adjacency(coord, cell_dim, r_thresh)
+            for backend in [cell_list_adjacency, kdtree_adjacency]:
+                adjacency_matrix = backend(coord, cell_dim, r_thresh)
+                self.assertTrue(
+                    np.array_equal(reference, adjacency_matrix.toarray())
+                )
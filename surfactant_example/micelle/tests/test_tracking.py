@@ -0,0 +1,144 @@
+from unittest import TestCase
+
+import numpy as np
+
+from surfactant_example.micelle.cluster import cluster
+from surfactant_example.micelle.tests.test_neighbours import (
+    reference_adjacency
+)
+from surfactant_example.micelle.tracking import (
+    VerletList, DisjointSet, MicelleTracker
+)
+
+
+class VerletListTestCase(TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(3)
+        self.cell_dim = np.array([6.0, 6.0, 6.0])
+        self.coord = random.uniform(0, 6, size=(200, 3))
+        self.random = random
+
+    def test_adjacency(self):
+
+        verlet_list = VerletList(1.0, skin=0.4)
+        coord = self.coord
+
+        for _ in range(10):
+            adjacency_matrix = verlet_list.adjacency(coord, self.cell_dim)
+            self.assertTrue(
+                np.array_equal(
+                    reference_adjacency(coord, self.cell_dim, 1.0),
+                    adjacency_matrix.toarray()
+                )
+            )
+            coord = coord + self.random.normal(0, 0.02, coord.shape)
+
+        # Candidate pairs are not rebuilt every frame
+        self.assertLess(verlet_list.n_builds, 10)
+
+    def test_requires_rebuild(self):
+
+        verlet_list = VerletList(1.0, skin=0.4)
+        self.assertTrue(
+            verlet_list.requires_rebuild(self.coord, self.cell_dim))
+
+        verlet_list.build(self.coord, self.cell_dim)
+        self.assertFalse(
+            verlet_list.requires_rebuild(self.coord, self.cell_dim))
+
+        coord = self.coord.copy()
+        coord[0] += [0.15, 0, 0]
+        self.assertFalse(verlet_list.requires_rebuild(coord, self.cell_dim))
+        coord[0] += [0.1, 0, 0]
+        self.assertTrue(verlet_list.requires_rebuild(coord, self.cell_dim))
+
+        # Periodic displacements are not considered
+        coord = self.coord + [6.0, 0, 0]
+        self.assertFalse(verlet_list.requires_rebuild(coord, self.cell_dim))
+
+        self.assertTrue(
+            verlet_list.requires_rebuild(self.coord, self.cell_dim + 0.5))
+
+
+class DisjointSetTestCase(TestCase):
+
+    def test_union(self):
+
+        disjoint_set = DisjointSet(7)
+        disjoint_set.union([5, 3, 6], [4, 1, 5])
+
+        self.assertListEqual(
+            [0, 1, 2, 1, 4, 4, 4], disjoint_set.find(np.arange(7)).tolist())
+
+        disjoint_set.union([3], [6])
+        self.assertListEqual(
+            [0, 1, 2, 1, 1, 1, 1], disjoint_set.find(np.arange(7)).tolist())
+
+        disjoint_set.union([], [])
+        self.assertEqual(2, disjoint_set.find(2))
+
+
+class MicelleTrackerTestCase(TestCase):
+
+    def assertSamePartition(self, labels, other_labels):
+        clustered = labels > 0
+        self.assertTrue(np.array_equal(clustered, other_labels > 0))
+        pairs = set(zip(labels[clustered], other_labels[clustered]))
+        self.assertEqual(len(pairs), len(set(labels[clustered])))
+        self.assertEqual(len(pairs), len(set(other_labels[clustered])))
+
+    def test_update(self):
+
+        random = np.random.RandomState(1)
+        cell_dim = np.array([8.0, 8.0, 8.0])
+        coord = random.uniform(0, 8, size=(300, 3))
+        mol_ref = [f"{index // 3}A" for index in range(300)]
+        kwargs = dict(r_thresh=0.9, noise_thresh=2, cluster_thresh=3)
+
+        for method in ['molecular', 'atomic']:
+            tracker = MicelleTracker(
+                method=method, mol_ref=mol_ref, skin=0.3, **kwargs)
+            frame_coord = coord
+
+            for _ in range(15):
+                frame_coord = (
+                    frame_coord + random.normal(0, 0.03, coord.shape))
+                frame_dim = cell_dim * (1 + 0.001 * random.normal())
+
+                self.assertSamePartition(
+                    tracker.update(frame_coord, frame_dim),
+                    cluster(frame_coord, frame_dim, method=method,
+                            mol_ref=mol_ref, **kwargs)
+                )
+
+            self.assertEqual(15, tracker.n_frames)
+
+    def test_cluster_identity(self):
+
+        cell_dim = np.array([10.0, 10.0, 10.0])
+        micelle = np.array([[0, 0, 0], [0.5, 0, 0], [0, 0.5, 0]])
+        tracker = MicelleTracker(r_thresh=0.8, cluster_thresh=3)
+
+        coord = np.concatenate([micelle + 1, micelle + 5])
+        ids = tracker.update(coord, cell_dim)
+        self.assertListEqual([1, 1, 1, 2, 2, 2], ids.tolist())
+
+        # Identities follow the members of each micelle, rather than
+        # their positions
+        coord = np.concatenate([micelle + 5.1, micelle + 1.1])
+        ids = tracker.update(coord, cell_dim)
+        self.assertListEqual([1, 1, 1, 2, 2, 2], ids.tolist())
+        self.assertDictEqual({1: 2, 2: 2}, tracker.active_lifetimes)
+
+        # Second micelle dissolves
+        coord = np.concatenate([micelle + 5.1, micelle * 3 + 1.1])
+        ids = tracker.update(coord, cell_dim)
+        self.assertListEqual([1, 1, 1, 0, 0, 0], ids.tolist())
+        self.assertListEqual([2], tracker.lifetimes)
+
+        # A new micelle forms
+        coord = np.concatenate([micelle + 5.1, micelle + 8])
+        ids = tracker.update(coord, cell_dim)
+        self.assertListEqual([1, 1, 1, 3, 3, 3], ids.tolist())
+        self.assertDictEqual({1: 4, 3: 1}, tracker.active_lifetimes)
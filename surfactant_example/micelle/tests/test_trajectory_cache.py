@@ -0,0 +1,107 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import numpy as np
+
+from surfactant_example.micelle.gro_stream import iter_gro_frames
+from surfactant_example.micelle.tests.test_gro_stream import GRO_FRAME
+from surfactant_example.micelle.trajectory_cache import (
+    trajectory_cache_key, trajectory_cache_paths, count_gro_frames,
+    load_trajectory_cache, read_cache_key
+)
+
+
+class TrajectoryCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.file_path = os.path.join(self.directory.name, 'test.gro')
+        with open(self.file_path, 'w') as outfile:
+            for time in range(3):
+                outfile.write(GRO_FRAME.format(time))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_trajectory_cache_key(self):
+
+        key = trajectory_cache_key(self.file_path)
+        self.assertEqual(key, trajectory_cache_key(self.file_path))
+        self.assertEqual(
+            trajectory_cache_key(self.file_path, symbols=["SS", "PS1"]),
+            trajectory_cache_key(self.file_path, symbols=["PS1", "SS"]))
+        self.assertNotEqual(
+            key, trajectory_cache_key(self.file_path, symbols=["SS"]))
+
+        # Key changes when the trajectory file is modified
+        with open(self.file_path, 'a') as outfile:
+            outfile.write(GRO_FRAME.format(3))
+        self.assertNotEqual(key, trajectory_cache_key(self.file_path))
+
+    def test_trajectory_cache_paths(self):
+
+        coord_path, index_path = trajectory_cache_paths(self.file_path)
+        self.assertEqual(self.directory.name, os.path.dirname(coord_path))
+        self.assertTrue(coord_path.endswith('.coord.npy'))
+        self.assertTrue(index_path.endswith('.index.npz'))
+
+        with TemporaryDirectory() as cache_dir:
+            coord_path, _ = trajectory_cache_paths(
+                self.file_path, cache_dir=cache_dir)
+            self.assertEqual(cache_dir, os.path.dirname(coord_path))
+
+        # Paths depend on the selected residue names, but not on the
+        # contents of the trajectory file
+        self.assertNotEqual(
+            index_path,
+            trajectory_cache_paths(self.file_path, symbols=["SS"])[1])
+        with open(self.file_path, 'a') as outfile:
+            outfile.write(GRO_FRAME.format(3))
+        self.assertEqual(
+            index_path, trajectory_cache_paths(self.file_path)[1])
+
+    def test_count_gro_frames(self):
+        self.assertEqual(3, count_gro_frames(self.file_path))
+
+    def test_load_trajectory_cache(self):
+
+        symbols = ["PS1", "SS"]
+        trajectory = load_trajectory_cache(self.file_path, symbols=symbols)
+        frames = list(iter_gro_frames(self.file_path, symbols=symbols))
+
+        self.assertListEqual(frames[0]["mol_ref"], trajectory["mol_ref"])
+        self.assertIsInstance(trajectory["coord"], np.memmap)
+        self.assertEqual(np.float32, trajectory["coord"].dtype)
+        self.assertEqual((3, 3, 3), trajectory["coord"].shape)
+        self.assertEqual((3, 3), trajectory["dim"].shape)
+        for frame, coord, dim in zip(
+                frames, trajectory["coord"], trajectory["dim"]):
+            self.assertTrue(np.allclose(frame["coord"], coord))
+            self.assertTrue(np.allclose(frame["dim"], dim))
+
+        # Cache files are reused on subsequent loads
+        coord_path, index_path = trajectory_cache_paths(
+            self.file_path, symbols=symbols)
+        mtime = os.stat(coord_path).st_mtime_ns
+        load_trajectory_cache(self.file_path, symbols=symbols)
+        self.assertEqual(mtime, os.stat(coord_path).st_mtime_ns)
+
+        # Cache is rebuilt when the trajectory file changes
+        with open(self.file_path, 'a') as outfile:
+            outfile.write(GRO_FRAME.format(3))
+        self.assertNotEqual(
+            trajectory_cache_key(self.file_path, symbols=symbols),
+            read_cache_key(index_path))
+        trajectory = load_trajectory_cache(self.file_path, symbols=symbols)
+        self.assertEqual((4, 3, 3), trajectory["coord"].shape)
+        self.assertEqual(
+            trajectory_cache_key(self.file_path, symbols=symbols),
+            read_cache_key(index_path))
+
+        # Previous cache files are overwritten rather than accumulated
+        self.assertListEqual(
+            sorted(os.path.basename(path)
+                   for path in [coord_path, index_path]),
+            sorted(name for name in os.listdir(self.directory.name)
+                   if name.startswith('.')))
@@ -0,0 +1,434 @@
+import numpy as np
+from scipy.sparse import csr_matrix, triu
+from scipy.sparse.csgraph import connected_components
+
+from surfactant_example.micelle.cluster import (
+    molecular_criteria, molecular_incidence
+)
+from surfactant_example.micelle.neighbours import (
+    NEIGHBOUR_BACKENDS, minimum_image, neighbour_adjacency,
+    sparse_adjacency
+)
+
+
+class VerletList:
+    """Verlet neighbour list, containing all pairs of particles lying
+    within r_thresh + skin of each other. Candidate pairs are reused
+    between frames, and are only rebuilt once particles have moved far
+    enough that a new neighbour could have entered r_thresh.
+
+    Parameters
+    ----------
+    r_thresh: float
+        Upper threshold on radial distance to consider whether two
+        particles are neighbours
+    skin: float, optional, default: 0.3
+        Additional radial distance included in the list of candidate
+        pairs
+    backend: str, optional, default: 'cell_list'
+        Neighbour search method used to build the list, either
+        'dense', 'cell_list' or 'kdtree'
+    """
+
+    def __init__(self, r_thresh, skin=0.3, backend='cell_list'):
+
+        assert skin >= 0
+        assert backend in NEIGHBOUR_BACKENDS
+
+        self.r_thresh = r_thresh
+        self.skin = skin
+        self.backend = backend
+
+        #: Number of times the list of candidate pairs has been built
+        self.n_builds = 0
+
+        self._reference_coord = None
+        self._reference_dim = None
+        self._pairs = None
+
+    def requires_rebuild(self, coord, cell_dim):
+        """Whether the list of candidate pairs must be rebuilt for
+        coord. The separation of any pair can change by at most twice
+        the largest particle displacement, plus the change in cell
+        dimensions for pairs across a periodic boundary. The list
+        remains valid whilst this is lower than the skin distance."""
+
+        if self._reference_coord is None:
+            return True
+        if coord.shape != self._reference_coord.shape:
+            return True
+
+        displacement = minimum_image(
+            coord - self._reference_coord, cell_dim)
+        max_displacement = np.sqrt(
+            np.max(np.sum(displacement ** 2, axis=-1), initial=0))
+        box_change = np.linalg.norm(cell_dim - self._reference_dim)
+
+        return 2 * max_displacement + box_change > self.skin
+
+    def build(self, coord, cell_dim):
+        """Builds the list of candidate pairs lying within
+        r_thresh + skin for coord"""
+
+        candidates = neighbour_adjacency(
+            coord, cell_dim, self.r_thresh + self.skin,
+            backend=self.backend)
+        candidates = triu(csr_matrix(candidates), k=1).tocsr()
+        candidates.sort_indices()
+        candidates = candidates.tocoo()
+
+        self._pairs = (candidates.row, candidates.col)
+        self._reference_coord = coord.copy()
+        self._reference_dim = cell_dim.copy()
+        self.n_builds += 1
+
+    def pairs(self, coord, cell_dim):
+        """Returns the indices of all unique pairs of particles (i < j)
+        in coord lying within r_thresh of each other, in ascending
+        order of i, then j"""
+
+        coord = np.asarray(coord, dtype=float)
+        cell_dim = np.asarray(cell_dim, dtype=float)
+
+        if self.requires_rebuild(coord, cell_dim):
+            self.build(coord, cell_dim)
+
+        # Only evaluate distances between candidate pairs
+        indices_i, indices_j = self._pairs
+        vectors = minimum_image(
+            coord[indices_i] - coord[indices_j], cell_dim)
+        r2_coord = np.sum(vectors ** 2, axis=-1)
+        keep = (r2_coord < self.r_thresh ** 2) * (r2_coord > 0)
+
+        return indices_i[keep], indices_j[keep]
+
+    def adjacency(self, coord, cell_dim):
+        """Returns a sparse adjacency matrix of all particles in coord
+        lying within r_thresh of each other, equivalent to that
+        returned by `neighbour_adjacency`"""
+
+        indices_i, indices_j = self.pairs(coord, cell_dim)
+
+        return sparse_adjacency(
+            np.concatenate([indices_i, indices_j]),
+            np.concatenate([indices_j, indices_i]),
+            len(coord)
+        )
+
+
+class DisjointSet:
+    """Union-find data structure over n_elements. Unions are applied
+    to arrays of pairs at once by repeatedly hooking each root onto the
+    smallest root that it is joined to, followed by path compression,
+    so that the root of each set is always its lowest index element.
+    """
+
+    def __init__(self, n_elements):
+        self.parent = np.arange(n_elements)
+
+    def find(self, elements):
+        """Returns the root of each set containing elements"""
+        self.compress()
+        return self.parent[elements]
+
+    def compress(self):
+        """Points each element directly at the root of its set"""
+        while True:
+            grandparent = self.parent[self.parent]
+            if np.array_equal(grandparent, self.parent):
+                return
+            self.parent = grandparent
+
+    def union(self, elements_i, elements_j):
+        """Merges the sets containing each pair of elements_i and
+        elements_j"""
+
+        elements_i = np.asarray(elements_i, dtype=int)
+        elements_j = np.asarray(elements_j, dtype=int)
+
+        while elements_i.size > 0:
+            roots_i = self.find(elements_i)
+            roots_j = self.find(elements_j)
+
+            # Discard pairs that already belong to the same set
+            joined = roots_i != roots_j
+            elements_i = elements_i[joined]
+            elements_j = elements_j[joined]
+            roots_i = roots_i[joined]
+            roots_j = roots_j[joined]
+
+            np.minimum.at(
+                self.parent,
+                np.maximum(roots_i, roots_j),
+                np.minimum(roots_i, roots_j)
+            )
+
+
+class MicelleTracker:
+    """Clusters consecutive frames of a trajectory incrementally, and
+    tracks the identity of each cluster between frames.
+
+    Neighbours are found using a `VerletList`. Connected components are
+    updated from the previous frame: only components that have lost an
+    edge are relabelled, and components joined by new edges are merged
+    with a `DisjointSet`. Each cluster is then assigned the identity of
+    the previous cluster with which it shares the most members, so that
+    micelle lifetimes can be recorded.
+
+    Parameters
+    ----------
+    r_thresh: float, optional, default: 1.5
+        Upper threshold on radial distance to consider whether two
+        particles are neighbours
+    noise_thresh: int, optional, default: 1
+        Lower threshold on number of neighbouring particles to
+        be considered part of a cluster
+    cluster_thresh: int, optional, default: 2
+        Lower threshold on cluster size
+    method: str, optional, default: 'molecular'
+        Selects the method to perform the clustering, either 'molecular'
+        or 'atomic', as described in `cluster`
+    atom_thresh: int, optional, default: 1
+        Threshold number of atomic neighbours between a pair
+        of molecules for the molecules themselves to be considered
+        neighbours
+    mol_ref: list of str, optional
+        Reference symbols for each molecular species in a single
+        frame. Only required by the 'atomic' method if incidence_matrix
+        is not provided
+    skin: float, optional, default: 0.3
+        Skin distance of the Verlet neighbour list
+    neighbour_backend: str, optional, default: 'cell_list'
+        Neighbour search method used to build the Verlet list
+    incidence_matrix: scipy.sparse.spmatrix of int, optional
+        Precalculated atom to molecule incidence matrix used by the
+        'atomic' method, as returned by `molecular_incidence`
+    """
+
+    def __init__(self, r_thresh=1.5, noise_thresh=1, cluster_thresh=2,
+                 method='molecular', atom_thresh=1, mol_ref=None,
+                 skin=0.3, neighbour_backend='cell_list',
+                 incidence_matrix=None):
+
+        assert method in ['molecular', 'atomic']
+
+        if method == 'atomic' and incidence_matrix is None:
+            assert mol_ref is not None
+            incidence_matrix = molecular_incidence(mol_ref)
+
+        self.noise_thresh = noise_thresh
+        self.cluster_thresh = cluster_thresh
+        self.method = method
+        self.atom_thresh = atom_thresh
+        self.incidence_matrix = incidence_matrix
+
+        self.verlet_list = VerletList(
+            r_thresh, skin=skin, backend=neighbour_backend)
+
+        #: Number of frames analysed
+        self.n_frames = 0
+
+        #: Number of frames that each cluster existed for, recorded
+        #: once it is no longer present
+        self.lifetimes = []
+
+        self._edges = None
+        self._components = None
+        self._cluster_ids = None
+        self._births = {}
+        self._next_id = 1
+
+    @property
+    def active_lifetimes(self):
+        """Number of frames that each cluster present in the latest
+        frame has existed for"""
+        return {
+            cluster_id: self.n_frames - birth
+            for cluster_id, birth in self._births.items()
+        }
+
+    def update(self, coord, cell_dim):
+        """Clusters the next frame of a trajectory
+
+        Parameters
+        ----------
+        coord:  array_like of floats
+            Positions of particles in 3 dimensions
+        cell_dim:  array_like of floats
+            Simulation cell dimensions in 3 dimensions
+
+        Returns
+        -------
+        cluster_ids: array_like of int
+            Identity of the cluster that each element belongs to, which
+            is preserved between frames. Elements that do not belong to
+            a cluster are labelled 0
+        """
+
+        if self.method == 'atomic':
+            adjacency_matrix = molecular_criteria(
+                self.verlet_list.adjacency(coord, cell_dim),
+                atom_thresh=self.atom_thresh,
+                incidence_matrix=self.incidence_matrix)
+            adjacency_matrix = triu(adjacency_matrix, k=1).tocsr()
+            adjacency_matrix.sort_indices()
+            adjacency_matrix = adjacency_matrix.tocoo()
+            indices_i, indices_j = adjacency_matrix.row, adjacency_matrix.col
+            n_elements = adjacency_matrix.shape[0]
+        else:
+            indices_i, indices_j = self.verlet_list.pairs(coord, cell_dim)
+            n_elements = len(coord)
+
+        edges, retained = self._retained_edges(
+            indices_i, indices_j, n_elements)
+        components = self._update_components(edges, n_elements)
+
+        # Identify components containing at least cluster_thresh
+        # elements, excluding noise
+        indices = np.flatnonzero(retained)
+        sizes = np.bincount(components[indices], minlength=n_elements)
+        clustered = np.zeros(n_elements, dtype=bool)
+        clustered[indices] = (
+            sizes[components[indices]] >= self.cluster_thresh)
+
+        cluster_ids = self._track_clusters(components, clustered)
+
+        self._edges = edges
+        self._components = components
+        self._cluster_ids = cluster_ids
+        self.n_frames += 1
+
+        return cluster_ids
+
+    def _retained_edges(self, indices_i, indices_j, n_elements):
+        """Returns an ascending array of edge keys i * n + j between
+        each pair of elements (i < j) that are not considered noise, as
+        well as a mask of the retained elements"""
+
+        n_neighbours = (
+            np.bincount(indices_i, minlength=n_elements)
+            + np.bincount(indices_j, minlength=n_elements)
+        )
+        retained = n_neighbours >= self.noise_thresh
+
+        edges = retained[indices_i] * retained[indices_j]
+        keys = indices_i[edges].astype(np.int64) * n_elements
+        keys += indices_j[edges]
+
+        return keys, retained
+
+    def _update_components(self, edges, n_elements):
+        """Returns the connected component of each element for the
+        current edges, updating the components of the previous frame"""
+
+        indices_i = edges // n_elements
+        indices_j = edges % n_elements
+
+        if (self._components is None
+                or self._components.size != n_elements):
+            network = csr_matrix(
+                (np.ones(edges.size, dtype=int), (indices_i, indices_j)),
+                shape=(n_elements, n_elements)
+            )
+            _, components = connected_components(network, directed=False)
+            return components
+
+        components = self._components.copy()
+
+        # Components that have lost an edge may have split, so
+        # relabel their elements from the current edges between them
+        removed = sorted_difference(self._edges, edges)
+        if removed.size > 0:
+            affected = np.isin(
+                components, components[removed // n_elements])
+            elements = np.flatnonzero(affected)
+            local_index = np.full(n_elements, -1)
+            local_index[elements] = np.arange(elements.size)
+
+            internal = affected[indices_i] * affected[indices_j]
+            network = csr_matrix(
+                (np.ones(np.count_nonzero(internal), dtype=int),
+                 (local_index[indices_i[internal]],
+                  local_index[indices_j[internal]])),
+                shape=(elements.size, elements.size)
+            )
+            _, local_components = connected_components(
+                network, directed=False)
+            components[elements] = (
+                components.max() + 1 + local_components)
+
+        # Merge any components that have been joined by a new edge
+        added = sorted_difference(edges, self._edges)
+        if added.size > 0:
+            disjoint_set = DisjointSet(components.max() + 1)
+            disjoint_set.union(
+                components[added // n_elements],
+                components[added % n_elements]
+            )
+            components = disjoint_set.find(components)
+
+        # Relabel components with consecutive integers
+        _, components = np.unique(components, return_inverse=True)
+
+        return components.flatten()
+
+    def _track_clusters(self, components, clustered):
+        """Assigns each cluster the identity of the cluster in the
+        previous frame that it shares the most elements with, and
+        records the lifetimes of any clusters that have disappeared"""
+
+        n_elements = components.size
+        cluster_ids = np.zeros(n_elements, dtype=int)
+        if n_elements == 0:
+            return cluster_ids
+
+        new_clusters = np.flatnonzero(
+            np.bincount(components[clustered], minlength=n_elements))
+        assigned = {}
+
+        if self._cluster_ids is not None and new_clusters.size > 0:
+            shared = clustered * (self._cluster_ids > 0)
+            keys = (
+                self._cluster_ids[shared].astype(np.int64) * n_elements
+                + components[shared]
+            )
+            keys, overlap = np.unique(keys, return_counts=True)
+
+            # Greedily match clusters with the largest overlap first
+            matched_ids = set()
+            for index in np.argsort(-overlap, kind='mergesort'):
+                old_id, component = divmod(int(keys[index]), n_elements)
+                if old_id in matched_ids or component in assigned:
+                    continue
+                matched_ids.add(old_id)
+                assigned[component] = old_id
+
+        component_ids = np.zeros(components.max() + 1, dtype=int)
+        for component in new_clusters:
+            if component not in assigned:
+                assigned[component] = self._next_id
+                self._births[self._next_id] = self.n_frames
+                self._next_id += 1
+            component_ids[component] = assigned[component]
+        cluster_ids[clustered] = component_ids[components[clustered]]
+
+        # Record lifetimes of clusters that are no longer present
+        active_ids = set(assigned.values())
+        for cluster_id in list(self._births):
+            if cluster_id not in active_ids:
+                self.lifetimes.append(
+                    self.n_frames - self._births.pop(cluster_id))
+
+        return cluster_ids
+
+
+def sorted_difference(array, other):
+    """Returns the elements of a sorted array of unique values that are
+    not present in another sorted array of unique values"""
+
+    if other.size == 0:
+        return array
+
+    indices = np.minimum(np.searchsorted(other, array), other.size - 1)
+
+    return array[other[indices] != array]
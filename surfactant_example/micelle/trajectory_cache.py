@@ -0,0 +1,190 @@
+"""Binary caches of Gromacs .gro trajectory files, stored as hidden
+`.<trajectory>.<selection>.coord.npy` and `.index.npz` files alongside
+each trajectory by default.
+
+Each trajectory has at most one cache for every selection of residue
+names, which is overwritten whenever the trajectory file changes. The
+coordinates occupy 12 bytes per atom per frame (3 float32 values), so
+a cache uses less disk space than the .gro file it was built from.
+Caches are not deleted along with their trajectory files, and can be
+removed at any time to reclaim space.
+"""
+import hashlib
+import os
+from itertools import chain
+
+import numpy as np
+
+from .gro_stream import iter_gro_frames, skip_gro_frame
+
+
+def trajectory_cache_key(file_path, symbols=None):
+    """Returns a unique key for a Gromacs .gro trajectory file, based
+    on its absolute path, modification time and size, as well as the
+    residue names of molecules included in the cache
+
+    Parameters
+    ----------
+    file_path: str
+        File path of Gromacs .gro trajectory file
+    symbols: list of str, optional
+        Residue names of molecules to include
+
+    Returns
+    -------
+    key: str
+        Hexadecimal digest identifying the cached trajectory
+    """
+
+    stat = os.stat(file_path)
+    identity = [
+        os.path.abspath(file_path),
+        str(stat.st_mtime_ns),
+        str(stat.st_size),
+        _selection(symbols)
+    ]
+
+    return hashlib.sha1('|'.join(identity).encode('utf-8')).hexdigest()
+
+
+def _selection(symbols):
+    """Returns a string identifying a selection of residue names"""
+    return ','.join(sorted(symbols)) if symbols is not None else '*'
+
+
+def trajectory_cache_paths(file_path, symbols=None, cache_dir=None):
+    """Returns the file paths of the binary coordinate array and sidecar
+    index for a cached Gromacs .gro trajectory file. By default, cache
+    files are stored alongside the trajectory file. Paths only depend
+    on the trajectory file path and selected residue names, so that a
+    modified trajectory replaces its previous cache.
+
+    Returns
+    -------
+    coord_path: str
+        File path of cached coordinates in numpy .npy format
+    index_path: str
+        File path of cached box dimensions and molecular references in
+        numpy .npz format
+    """
+
+    if cache_dir is None:
+        cache_dir = os.path.dirname(os.path.abspath(file_path))
+
+    identity = '|'.join([os.path.abspath(file_path), _selection(symbols)])
+    digest = hashlib.sha1(identity.encode('utf-8')).hexdigest()
+    prefix = os.path.join(
+        cache_dir, f".{os.path.basename(file_path)}.{digest[:16]}")
+
+    return f"{prefix}.coord.npy", f"{prefix}.index.npz"
+
+
+def count_gro_frames(file_path):
+    """Counts the number of frames in a Gromacs .gro trajectory file
+    without parsing any atomic data"""
+
+    n_frames = 0
+    with open(file_path, 'r') as infile:
+        while skip_gro_frame(infile):
+            n_frames += 1
+
+    return n_frames
+
+
+def write_trajectory_cache(file_path, coord_path, index_path,
+                           symbols=None):
+    """Converts a Gromacs .gro trajectory file into a binary cache,
+    containing float32 coordinates of each atom in each frame and a
+    sidecar index of box dimensions, molecular references and the
+    trajectory cache key. Frames are streamed from the trajectory file
+    directly into a memory mapped array, so that the full trajectory is
+    never held in memory. Any existing cache files are replaced."""
+
+    key = trajectory_cache_key(file_path, symbols=symbols)
+    n_frames = count_gro_frames(file_path)
+    frames = iter_gro_frames(file_path, symbols=symbols)
+
+    first_frame = next(frames, None)
+    n_atoms = 0 if first_frame is None else len(first_frame["mol_ref"])
+    mol_ref = [] if first_frame is None else first_frame["mol_ref"]
+
+    # Write to temporary files first, so that incomplete caches are
+    # never opened by other processes
+    tmp_coord_path = f"{coord_path}.{os.getpid()}.tmp"
+    tmp_index_path = f"{index_path}.{os.getpid()}.tmp"
+
+    coord = np.lib.format.open_memmap(
+        tmp_coord_path, mode='w+', dtype=np.float32,
+        shape=(n_frames, n_atoms, 3))
+    dim = np.zeros((n_frames, 3))
+
+    if first_frame is not None:
+        for index, frame in enumerate(chain([first_frame], frames)):
+            coord[index] = frame["coord"]
+            dim[index] = frame["dim"]
+
+    coord.flush()
+    del coord
+
+    with open(tmp_index_path, 'wb') as outfile:
+        np.savez(outfile, dim=dim, mol_ref=np.asarray(mol_ref, dtype=str),
+                 key=key)
+
+    os.replace(tmp_coord_path, coord_path)
+    os.replace(tmp_index_path, index_path)
+
+
+def read_cache_key(index_path):
+    """Returns the trajectory cache key stored in a sidecar index, or
+    None if the index does not exist or is incomplete"""
+
+    try:
+        with np.load(index_path) as index:
+            return str(index["key"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def load_trajectory_cache(file_path, symbols=None, cache_dir=None):
+    """Opens a binary cache of a Gromacs .gro trajectory file, creating
+    it on first use. Coordinates are memory mapped, so that they are
+    read from disk on demand without parsing or copying. The cache is
+    overwritten whenever the modification time or size of the
+    trajectory file changes.
+
+    Parameters
+    ----------
+    file_path: str
+        File path of Gromacs .gro trajectory file
+    symbols: list of str, optional
+        Residue names of molecules to include. All atoms are included
+        by default
+    cache_dir: str, optional
+        Directory containing cache files. Defaults to the directory
+        containing the trajectory file
+
+    Returns
+    -------
+    trajectory: dict
+        Contains the molecular reference ('mol_ref') of each atom, the
+        coordinates of each atom in each frame ('coord') and the
+        simulation cell dimensions in each frame ('dim')
+    """
+
+    coord_path, index_path = trajectory_cache_paths(
+        file_path, symbols=symbols, cache_dir=cache_dir)
+    key = trajectory_cache_key(file_path, symbols=symbols)
+
+    if read_cache_key(index_path) != key or not os.path.exists(coord_path):
+        write_trajectory_cache(
+            file_path, coord_path, index_path, symbols=symbols)
+
+    with np.load(index_path) as index:
+        dim = index["dim"]
+        mol_ref = index["mol_ref"].tolist()
+
+    return {
+        "mol_ref": mol_ref,
+        "coord": np.load(coord_path, mmap_mode='r'),
+        "dim": dim
+    }
@@ -1,6 +1,12 @@
-from force_bdss.api import Slot
+import os
+import threading
+
+from force_bdss.api import DataValue, Slot
 from force_gromacs.data_sources import SimulationDataSource
 
+from surfactant_example.data.kpi_memo import get_kpi_memo, memo_key
+
+from .stage_cache import StageCache, file_hash
 from .surfactant_simulation_builder import (
     SurfactantSimulationBuilder
 )
@@ -11,13 +17,122 @@ class SurfactantSimulationDataSource(SimulationDataSource):
     a defined `create_simulation_builder` method that sets up a Gromacs
     simulation specific to the surfactant formulation use case."""
 
+    #: Stage caches shared between simulations, indexed by directory
+    _stage_caches = {}
+
+    #: Locks held while simulating in each experiment folder, so that
+    #: concurrent evaluations of the same formulation never share one
+    _folder_locks = {}
+
+    def get_stage_cache(self, model):
+        """Returns the StageCache for the directory specified on the
+        model, or None if caching is disabled"""
+
+        directory = model.stage_cache_directory
+        if not directory:
+            return None
+
+        if directory not in self._stage_caches:
+            self._stage_caches[directory] = StageCache(directory=directory)
+        return self._stage_caches[directory]
+
+    def get_kpi_memo(self, model):
+        """Returns the KPIMemo specified on the model, or None if
+        memoisation is disabled"""
+
+        if not model.kpi_memo_file or model.dry_run:
+            return None
+
+        return get_kpi_memo(model.kpi_memo_file)
+
+    def experiment_name(self, model, formulation):
+        """Returns a simulation name that is unique to the surfactant
+        and salt concentrations of a formulation"""
+        return '_'.join([model.name, formulation.ref])
+
+    def experiment_folder(self, model, formulation):
+        """Returns the folder that a formulation is simulated in"""
+        return os.path.abspath(os.path.join(
+            model.output_directory,
+            self.experiment_name(model, formulation)))
+
+    def folder_lock(self, model, formulation):
+        """Returns the lock that must be held while simulating a
+        formulation, shared by all simulations in the same folder"""
+        return self._folder_locks.setdefault(
+            self.experiment_folder(model, formulation), threading.Lock())
+
+    def simulation_key(self, model, formulation):
+        """Returns a key identifying the results of a simulation, based
+        on the formulation and all model settings that affect them"""
+
+        return memo_key(
+            formulation.ref,
+            model.size,
+            model.n_steps,
+            file_hash(model.martini_parameters),
+            file_hash(model.md_min_parameters),
+            file_hash(model.md_prod_parameters)
+        )
+
+    def lookup_simulation(self, model, parameters):
+        """Returns the memo key of a simulation, along with the results
+        file of an identical simulation stored in the KPI memo. Either
+        may be None if memoisation is disabled or no results exist."""
+
+        memo = self.get_kpi_memo(model)
+        if memo is None:
+            return None, None
+
+        key = self.simulation_key(model, parameters[0].value)
+        return key, memo.get_simulation(key)
+
+    def record_simulation(self, model, key, results_path):
+        """Stores the results file of a completed simulation in the
+        KPI memo, if memoisation is enabled"""
+
+        memo = self.get_kpi_memo(model)
+        if memo is not None and key is not None:
+            memo.add_simulation(key, results_path)
+
+    def results_data_values(self, model, results_path):
+        """Returns the output DataValues of a simulation that produced
+        results_path"""
+
+        _, output_slots = self.slots(model)
+        return [DataValue(type=output_slots[0].type, value=results_path)]
+
+    def run(self, model, parameters):
+        """Overloads method on parent class to return the results of
+        an identical simulation stored in the KPI memo, if possible,
+        rather than running it again. Simulations of formulations with
+        the same reference are run one at a time, since they share an
+        experiment folder."""
+
+        with self.folder_lock(model, parameters[0].value):
+            key, results_path = self.lookup_simulation(model, parameters)
+
+            if results_path is None:
+                data_values = super(
+                    SurfactantSimulationDataSource, self).run(
+                        model, parameters)
+                self.record_simulation(model, key, data_values[0].value)
+                return data_values
+
+        return self.results_data_values(model, results_path)
+
     def create_simulation_builder(self, model, parameters):
 
         formulation = parameters[0].value
 
         # Create unique simulation name based on surfactant and
         # salt concentration
-        experiment_name = '_'.join([model.name, formulation.ref])
+        experiment_name = self.experiment_name(model, formulation)
+
+        # Only resume checkpoints written with identical settings
+        resume_key = ''
+        if model.resume:
+            resume_key = self.simulation_key(model, formulation)
 
         # Generate `GromacsSimulationBuilder` object for a surfactant
         # simulation simulation
@@ -32,7 +147,10 @@ class SurfactantSimulationDataSource(SimulationDataSource):
             mpi_run=model.mpi_run,
             n_proc=model.n_proc,
             dry_run=model.dry_run,
-            formulation=formulation
+            formulation=formulation,
+            stage_cache=self.get_stage_cache(model),
+            resume=model.resume,
+            resume_key=resume_key
         )
 
         return simulation
@@ -1,4 +1,7 @@
 import os
+
+from traits.api import Bool, Unicode
+
 from force_gromacs.data_sources.simulation.simulation_model import (
     SimulationDataSourceModel)
 
@@ -7,6 +10,25 @@ from surfactant_example.data.gromacs_files.path import get_file
 
 class SimulationModel(SimulationDataSourceModel):
 
+    #: Directory used to cache the outputs of Gromacs commands, so that
+    #: stages shared between simulations are only run once
+    stage_cache_directory = Unicode(
+        desc='Directory used to cache Gromacs command outputs. '
+             'Caching is disabled if left empty')
+
+    #: Whether to continue interrupted production runs from their
+    #: checkpoint state files
+    resume = Bool(
+        False,
+        desc='Continue interrupted production runs from the checkpoint '
+             'state files in their simulation directories')
+
+    #: File path of a KPI memo, used to skip simulations that have
+    #: already been run with identical inputs
+    kpi_memo_file = Unicode(
+        desc='SQLite file that memoises simulation results and KPIs. '
+             'Memoisation is disabled if left empty')
+
     def _martini_parameters_default(self):
         return get_file(os.path.join('topologies', 'martini_v2.2.itp'))
 
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import shutil
+
+from traits.api import HasStrictTraits, Any, Instance, Int, Unicode
+
+from force_gromacs.api import (
+    Gromacs_solvate, Gromacs_insert_molecules, Gromacs_grompp, Gromacs_genion,
+    Gromacs_mdrun, Gromacs_select, Gromacs_trjconv
+)
+
+#: Command line options of each Gromacs command that refer to output
+#: files. Only commands listed here can be cached.
+OUTPUT_OPTIONS = {
+    Gromacs_insert_molecules: ('-o',),
+    Gromacs_solvate: ('-o',),
+    Gromacs_grompp: ('-o', '-po'),
+    Gromacs_genion: ('-o', '-p'),
+    Gromacs_mdrun: ('-o', '-e', '-c', '-g', '-cpo', '-x'),
+    Gromacs_select: ('-on',),
+    Gromacs_trjconv: ('-o',),
+}
+
+#: Command line options of each Gromacs command that refer to input
+#: files which are also modified in place
+IN_PLACE_OPTIONS = {
+    Gromacs_genion: ('-p',)
+}
+
+#: Name of file in each cache entry that lists the stored outputs
+MANIFEST_FILE = 'manifest.json'
+
+
+def file_hash(file_path, block_size=1 << 20):
+    """Returns the SHA1 digest of the contents of a file"""
+
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as infile:
+        for block in iter(lambda: infile.read(block_size), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def link_file(source, destination):
+    """Hard links source to destination, replacing any existing file.
+    Falls back to copying if hard links are not supported, for
+    instance across file systems."""
+
+    if os.path.lexists(destination):
+        os.remove(destination)
+
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def copy_file(source, destination):
+    """Copies source to destination, replacing any existing file. The
+    destination is removed first, so that any hard links to it are
+    left unmodified."""
+
+    if os.path.lexists(destination):
+        os.remove(destination)
+
+    shutil.copy2(source, destination)
+
+
+def detach_file(file_path):
+    """Ensures a file does not share its contents with any hard links,
+    so that it can safely be modified in place"""
+
+    if os.path.exists(file_path) and os.stat(file_path).st_nlink > 1:
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        shutil.copy2(file_path, tmp_path)
+        os.replace(tmp_path, file_path)
+
+
+class StageCache(HasStrictTraits):
+    """Content addressed cache of Gromacs pipeline stage outputs. Each
+    command is keyed by its type, command options and a hash of each
+    input file, but not the file paths of its outputs. When a command
+    with a matching key has already been run, its stored outputs are
+    hard linked into place instead of running it again. Files that
+    are modified in place are copied rather than linked, since they
+    may be overwritten by later pipeline steps."""
+
+    #: Directory containing cached stage outputs
+    directory = Unicode()
+
+    #: Number of commands whose outputs were restored from the cache
+    hits = Int(0)
+
+    #: Number of commands that were run
+    misses = Int(0)
+
+    def is_cacheable(self, command):
+        """Whether the outputs of a command can be cached"""
+        return type(command) in OUTPUT_OPTIONS
+
+    def _output_options(self, command):
+        """Returns all command line options that refer to output files
+        of command, including those modified in place"""
+        output_options = OUTPUT_OPTIONS[type(command)]
+        return [
+            flag for flag, value in command.command_options.items()
+            if flag in output_options and isinstance(value, str)
+        ]
+
+    def stage_key(self, command):
+        """Returns a key identifying the outputs of a Gromacs command,
+        based on its type, options and the contents of its input
+        files. Must be called once all input files exist."""
+
+        output_options = OUTPUT_OPTIONS[type(command)]
+        in_place = IN_PLACE_OPTIONS.get(type(command), ())
+        identity = [
+            type(command).__name__,
+            repr(getattr(command, 'user_input', None))
+        ]
+
+        for flag, value in sorted(command.command_options.items()):
+            if flag in output_options and flag not in in_place:
+                identity.append(flag)
+            elif isinstance(value, str) and os.path.isfile(value):
+                identity.append(f"{flag}={file_hash(value)}")
+            else:
+                identity.append(f"{flag}={value!r}")
+
+        return hashlib.sha1(
+            '\n'.join(identity).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _transfers(self, command):
+        """Returns the function used to store or restore the output of
+        each command line option"""
+        in_place = IN_PLACE_OPTIONS.get(type(command), ())
+        return {
+            flag: copy_file if flag in in_place else link_file
+            for flag in self._output_options(command)
+        }
+
+    def _outputs(self, command):
+        return {
+            flag: command.command_options[flag]
+            for flag in self._output_options(command)
+        }
+
+    def restore(self, command):
+        """Restores the outputs of a Gromacs command from the cache, if
+        an identical command has already been run. Otherwise prepares
+        the outputs to be generated by running the command.
+
+        Returns
+        -------
+        entry: str or None
+            Path of the cache entry that the outputs of command should
+            be stored in once it has run, or None if they were restored
+        """
+
+        entry = self._entry_path(self.stage_key(command))
+        manifest = os.path.join(entry, MANIFEST_FILE)
+        outputs = self._outputs(command)
+        transfers = self._transfers(command)
+
+        if os.path.exists(manifest):
+            with open(manifest, 'r') as infile:
+                stored = json.load(infile)
+            for flag in stored:
+                if flag in outputs:
+                    transfers[flag](
+                        os.path.join(entry, flag), outputs[flag])
+            self.hits += 1
+            return None
+
+        # Never modify files shared with the cache in place
+        for file_path in outputs.values():
+            detach_file(file_path)
+
+        return entry
+
+    def store(self, command, entry):
+        """Stores the outputs of a Gromacs command that has been run
+        in the cache entry returned by `restore`"""
+        self.misses += 1
+        self._store(
+            entry, self._outputs(command), self._transfers(command))
+
+    def run(self, command):
+        """Runs a Gromacs command, unless its outputs can be restored
+        from the cache
+
+        Returns
+        -------
+        hit: bool
+            Whether the command outputs were restored from the cache
+        """
+
+        entry = self.restore(command)
+        if entry is None:
+            return True
+
+        command.run()
+        self.store(command, entry)
+
+        return False
+
+    def _store(self, entry, outputs, transfers):
+        """Stores the outputs of a command in a new cache entry, using
+        the transfer function of each output. The manifest is written
+        last, so that incomplete entries are never used."""
+
+        os.makedirs(entry, exist_ok=True)
+
+        stored = []
+        for flag, file_path in outputs.items():
+            if os.path.exists(file_path):
+                transfers[flag](file_path, os.path.join(entry, flag))
+                stored.append(flag)
+
+        tmp_manifest = os.path.join(
+            entry, f"{MANIFEST_FILE}.{os.getpid()}.tmp")
+        with open(tmp_manifest, 'w') as outfile:
+            json.dump(stored, outfile)
+        os.replace(tmp_manifest, os.path.join(entry, MANIFEST_FILE))
+
+
+class CachedStage(HasStrictTraits):
+    """Pipeline step that runs a Gromacs command through a
+    StageCache"""
+
+    #: Gromacs command to run
+    command = Any()
+
+    #: Cache of Gromacs command outputs
+    cache = Instance(StageCache)
+
+    def __getattr__(self, name):
+        # Expose all other attributes of the wrapped command
+        if name == 'command':
+            raise AttributeError(name)
+        return getattr(self.command, name)
+
+    def bash_script(self):
+        return self.command.bash_script()
+
+    def run(self):
+        return self.cache.run(self.command)
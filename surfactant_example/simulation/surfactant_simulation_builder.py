@@ -1,10 +1,10 @@
 import os
-from operator import itemgetter
 
+import numpy as np
 from scipy.constants import N_A
 
 from traits.api import (
-    List, Unicode, Property, Instance
+    Bool, HasStrictTraits, List, Unicode, Property, Instance
 )
 
 from force_gromacs.api import (
@@ -19,9 +19,37 @@ from surfactant_example.ingredient import Ingredient
 from .simulation_utilities import (
     calculate_n_mols
 )
+from .stage_cache import CachedStage, StageCache
 from surfactant_example.formulation.formulation import Formulation
 
 
+class CheckpointKeyWriter(HasStrictTraits):
+    """Pipeline step that records the key of the simulation that will
+    write a checkpoint state file, removing any stale checkpoint left
+    by a simulation with different settings"""
+
+    #: File path of the checkpoint state file
+    state_file = Unicode()
+
+    #: File path that the key is written to
+    key_file = Unicode()
+
+    #: Key identifying the simulation settings
+    key = Unicode()
+
+    def bash_script(self):
+        return f"rm -f {self.state_file}\necho {self.key} > {self.key_file}"
+
+    def run(self):
+        if os.path.exists(self.state_file):
+            os.remove(self.state_file)
+
+        tmp_file = f"{self.key_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as outfile:
+            outfile.write(self.key)
+        os.replace(tmp_file, self.key_file)
+
+
 class SurfactantSimulationBuilder(BaseGromacsSimulationBuilder):
 
     # --------------------
@@ -61,6 +89,19 @@ class SurfactantSimulationBuilder(BaseGromacsSimulationBuilder):
     # further postprocessing
     results_file = Unicode()
 
+    #: Optional cache of Gromacs command outputs, allowing stages that
+    #: are shared between simulations to be skipped
+    stage_cache = Instance(StageCache)
+
+    #: Whether to continue an interrupted production run from its
+    #: checkpoint state file, if one exists
+    resume = Bool(False)
+
+    #: Key identifying all settings that affect the simulation results.
+    #: A checkpoint is only resumed if it was written by a simulation
+    #: with the same key
+    resume_key = Unicode()
+
     # --------------------
     #     Properties
     # --------------------
@@ -359,6 +400,57 @@ class SurfactantSimulationBuilder(BaseGromacsSimulationBuilder):
             )
         )
 
+    def _cache_stages(self):
+        """Wrap each cacheable Gromacs command in the pipeline, so that
+        its outputs are restored from the stage cache if they have
+        already been generated by an identical command"""
+
+        steps = self._pipeline.steps
+        for index, (name, command) in enumerate(steps):
+            if self.stage_cache.is_cacheable(command):
+                steps[index] = (
+                    name,
+                    CachedStage(command=command, cache=self.stage_cache)
+                )
+
+    def _resume_production(self):
+        """If an earlier production run with the same `resume_key` was
+        interrupted, skip all preceding steps, since their outputs
+        already exist, and continue the run from its checkpoint state
+        file. Otherwise, record the key before the production run, so
+        that its checkpoint can be resumed later."""
+
+        state_file = os.path.join(
+            self.production_folder, self.file_registry.state_file)
+        key_file = os.path.splitext(state_file)[0] + '.key'
+
+        steps = self._pipeline.steps
+        names = [name for name, _ in steps]
+        index = names.index('mdrun_production')
+
+        if (self.resume_key and os.path.exists(state_file)
+                and self._read_resume_key(key_file) == self.resume_key):
+            _, command = steps[index]
+            command.command_options['-cpi'] = state_file
+            del steps[:index]
+        else:
+            steps.insert(
+                index,
+                ('checkpoint_key',
+                 CheckpointKeyWriter(
+                     state_file=state_file,
+                     key_file=key_file,
+                     key=self.resume_key))
+            )
+
+    def _read_resume_key(self, key_file):
+        """Returns the key recorded for a checkpoint, or None"""
+        try:
+            with open(key_file, 'r') as infile:
+                return infile.read()
+        except OSError:
+            return None
+
     def _file_tree_builder(self):
         """Add generation of file tree simulation files to be stored
         in to pipeline"""
@@ -578,23 +670,18 @@ class SurfactantSimulationBuilder(BaseGromacsSimulationBuilder):
             concentration values (high to low)
         """
 
-        # Extract fragments whose role == key, and group with their
-        # ingredient parameters
-        key_ingredients = self.formulation.ingredient_search([key])
-        key_concentrations = [
-            self.formulation.concentrations[
-                self.formulation.ingredients.index(ingredient)]
-            for ingredient in key_ingredients
-        ]
+        # Extract indices of ingredients whose role == key, and group
+        # with their concentrations
+        indices = self.formulation.ingredient_indices([key])
+        key_concentrations = (
+            self.formulation.ingredient_concentrations[indices])
 
         # Return an ordered version of ingredients, sorted by
-        # concentrations (high to low)
+        # concentrations (high to low). A stable sort retains the
+        # original ordering of equal concentrations
         ordered_ingredients = [
-            ingredient for _, ingredient in sorted(
-                zip(key_concentrations, key_ingredients),
-                key=itemgetter(0),
-                reverse=True
-            )
+            self.formulation.ingredients[indices[order]]
+            for order in np.argsort(-key_concentrations, kind='mergesort')
         ]
 
         return ordered_ingredients
@@ -637,6 +724,14 @@ class SurfactantSimulationBuilder(BaseGromacsSimulationBuilder):
         # file for clustering
         self._post_process_results()
 
+        # Continue from an interrupted production run, if requested
+        if self.resume:
+            self._resume_production()
+
+        # Run Gromacs commands through the stage cache, if provided
+        if self.stage_cache is not None:
+            self._cache_stages()
+
         return self._pipeline
 
     def get_results_path(self):
@@ -1,9 +1,13 @@
-from unittest import TestCase
+import os
+import tempfile
+from unittest import TestCase, mock
 
 from traits.testing.unittest_tools import UnittestTools
 
 from force_bdss.api import DataValue
+from force_gromacs.data_sources import SimulationDataSource
 
+from surfactant_example.data.kpi_memo import KPIMemo
 from surfactant_example.surfactant_plugin import SurfactantPlugin
 from surfactant_example.formulation.formulation import Formulation
 from surfactant_example.tests.probe_classes.probe_ingredients import (
@@ -90,3 +94,106 @@ class TestSimulationDataSource(TestCase, UnittestTools):
         self.assertEqual(33, self.surfactants[1].n_mol)
         self.assertEqual(8, self.salt.n_mol)
         self.assertEqual(3888, self.solvent.n_mol)
+        self.assertEqual('', sim_builder.resume_key)
+
+    def test_create_simulation_builder_resume(self):
+        in_slots = self.data_source.slots(self.model)[0]
+        data_values = [
+            DataValue(type=slot.type, value=value)
+            for slot, value in zip(in_slots, self.input_values)
+        ]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for attr in ['martini_parameters', 'md_min_parameters',
+                         'md_prod_parameters']:
+                file_path = os.path.join(tmp_dir, f'{attr}.txt')
+                with open(file_path, 'w') as outfile:
+                    outfile.write(attr)
+                setattr(self.model, attr, file_path)
+
+            self.model.resume = True
+            sim_builder = self.data_source.create_simulation_builder(
+                self.model, data_values)
+            key = self.data_source.simulation_key(
+                self.model, self.formulation)
+            self.assertEqual(key, sim_builder.resume_key)
+
+            # Checkpoints are not resumed after changing settings
+            self.model.n_steps += 1
+            self.assertNotEqual(
+                key, self.data_source.simulation_key(
+                    self.model, self.formulation))
+
+    def test_folder_lock(self):
+        in_slots = self.data_source.slots(self.model)[0]
+        data_values = [
+            DataValue(type=slot.type, value=value)
+            for slot, value in zip(in_slots, self.input_values)
+        ]
+        lock = self.data_source.folder_lock(self.model, self.formulation)
+
+        # Formulations with the same reference share a lock
+        formulation = Formulation(
+            ingredients=self.ingredients,
+            concentrations=[12.001, 4, 0.5, 83.499])
+        self.assertIs(
+            lock, self.data_source.folder_lock(self.model, formulation))
+
+        self.model.name = 'other_experiment'
+        self.assertIsNot(
+            lock, self.data_source.folder_lock(self.model, formulation))
+        self.model.name = self.name
+
+        def run(model, parameters):
+            # The lock is held while simulating
+            self.assertTrue(lock.locked())
+            return [DataValue(value='results.gro')]
+
+        with mock.patch.object(
+                SimulationDataSource, 'run', side_effect=run) as mock_run:
+            self.data_source.run(self.model, data_values)
+        mock_run.assert_called_once()
+        self.assertFalse(lock.locked())
+
+    def test_kpi_memo(self):
+        in_slots = self.data_source.slots(self.model)[0]
+        data_values = [
+            DataValue(type=slot.type, value=value)
+            for slot, value in zip(in_slots, self.input_values)
+        ]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for attr in ['martini_parameters', 'md_min_parameters',
+                         'md_prod_parameters']:
+                file_path = os.path.join(tmp_dir, f'{attr}.txt')
+                with open(file_path, 'w') as outfile:
+                    outfile.write(attr)
+                setattr(self.model, attr, file_path)
+            results_path = os.path.join(tmp_dir, 'results.gro')
+            with open(results_path, 'w'):
+                pass
+
+            self.model.dry_run = False
+            self.model.kpi_memo_file = os.path.join(tmp_dir, 'memo.db')
+            memo = KPIMemo(file_path=self.model.kpi_memo_file)
+
+            with mock.patch.object(
+                    SimulationDataSource, 'run',
+                    return_value=[DataValue(value=results_path)]
+            ) as mock_run:
+                res = self.data_source.run(self.model, data_values)
+                self.assertEqual(results_path, res[0].value)
+
+                # Identical simulations are only run once
+                res = self.data_source.run(self.model, data_values)
+                self.assertEqual(results_path, res[0].value)
+                self.assertEqual(1, mock_run.call_count)
+
+                # Changing a simulation setting invalidates the memo
+                self.model.n_steps += 1
+                self.data_source.run(self.model, data_values)
+                self.assertEqual(2, mock_run.call_count)
+
+            statistics = memo.statistics()
+            self.assertEqual(1, statistics['simulation_hits'])
+            self.assertEqual(2, statistics['simulation_misses'])
@@ -0,0 +1,183 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+
+from force_gromacs.api import Gromacs_genion, Gromacs_insert_molecules
+
+from surfactant_example.simulation.stage_cache import (
+    CachedStage, StageCache
+)
+
+
+def write_output(command):
+    """Mimics a Gromacs command by writing its input options into its
+    output file"""
+    with open(command.command_options['-o'], 'w') as outfile:
+        outfile.write(str(command.command_options['-nmol']))
+
+
+class TestStageCache(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.directory = self.tmp_dir.name
+
+        self.input_coord = os.path.join(self.directory, 'input.gro')
+        with open(self.input_coord, 'w') as outfile:
+            outfile.write('input')
+
+        self.stage_cache = StageCache(
+            directory=os.path.join(self.directory, 'cache'))
+
+    def create_command(self, experiment, n_mol=4):
+        os.makedirs(
+            os.path.join(self.directory, experiment), exist_ok=True)
+        return Gromacs_insert_molecules(
+            command_options={
+                '-f': self.input_coord,
+                '-ci': self.input_coord,
+                '-nmol': n_mol,
+                '-o': os.path.join(self.directory, experiment, 'out.gro'),
+                '-box': [10, 10, 10]}
+        )
+
+    def test_stage_key(self):
+
+        first = self.create_command('first')
+        second = self.create_command('second')
+
+        # Output file paths do not contribute to the key
+        self.assertEqual(
+            self.stage_cache.stage_key(first),
+            self.stage_cache.stage_key(second))
+
+        # Command options and input file contents do
+        third = self.create_command('third', n_mol=5)
+        self.assertNotEqual(
+            self.stage_cache.stage_key(first),
+            self.stage_cache.stage_key(third))
+
+        key = self.stage_cache.stage_key(first)
+        with open(self.input_coord, 'w') as outfile:
+            outfile.write('updated')
+        self.assertNotEqual(key, self.stage_cache.stage_key(first))
+
+    def test_in_place_options(self):
+
+        topology = os.path.join(self.directory, 'topology.top')
+        with open(topology, 'w') as outfile:
+            outfile.write('topology')
+
+        command = Gromacs_genion(
+            command_options={
+                '-s': self.input_coord,
+                '-p': topology,
+                '-o': os.path.join(self.directory, 'out.gro')}
+        )
+        key = self.stage_cache.stage_key(command)
+
+        with open(topology, 'w') as outfile:
+            outfile.write('updated')
+        self.assertNotEqual(key, self.stage_cache.stage_key(command))
+
+    def test_run(self):
+
+        first = self.create_command('first')
+        second = self.create_command('second')
+
+        with mock.patch.object(
+                Gromacs_insert_molecules, 'run', autospec=True,
+                side_effect=write_output) as mock_run:
+            self.assertFalse(self.stage_cache.run(first))
+            self.assertTrue(self.stage_cache.run(second))
+            self.assertEqual(1, mock_run.call_count)
+
+        self.assertEqual(1, self.stage_cache.hits)
+        self.assertEqual(1, self.stage_cache.misses)
+
+        # Outputs are hard linked into the second experiment
+        output = second.command_options['-o']
+        with open(output, 'r') as infile:
+            self.assertEqual('4', infile.read())
+        self.assertEqual(
+            os.stat(first.command_options['-o']).st_ino,
+            os.stat(output).st_ino)
+
+    def test_run_detaches_outputs(self):
+
+        first = self.create_command('first')
+        second = self.create_command('second')
+
+        with mock.patch.object(
+                Gromacs_insert_molecules, 'run', autospec=True,
+                side_effect=write_output):
+            self.stage_cache.run(first)
+            self.stage_cache.run(second)
+
+            # Running a new command over a linked output does not
+            # modify the cached file
+            third = self.create_command('second', n_mol=5)
+            self.stage_cache.run(third)
+
+        with open(first.command_options['-o'], 'r') as infile:
+            self.assertEqual('4', infile.read())
+        with open(third.command_options['-o'], 'r') as infile:
+            self.assertEqual('5', infile.read())
+
+    def test_cached_stage(self):
+
+        command = self.create_command('first')
+        stage = CachedStage(command=command, cache=self.stage_cache)
+
+        self.assertIs(command.command_options, stage.command_options)
+
+        with mock.patch.object(
+                Gromacs_insert_molecules, 'run', autospec=True,
+                side_effect=write_output):
+            self.assertFalse(stage.run())
+            self.assertTrue(stage.run())
+
+    def test_rebuild_in_place_outputs(self):
+
+        experiment = os.path.join(self.directory, 'experiment')
+        os.makedirs(experiment)
+        topology = os.path.join(experiment, 'topology.top')
+
+        def write_topology():
+            # Mimics the topology writer, which overwrites the file
+            # in place each time the pipeline is built
+            with open(topology, 'w') as outfile:
+                outfile.write('topology')
+
+        def add_ions(command):
+            with open(command.command_options['-p'], 'a') as outfile:
+                outfile.write(' ions')
+            with open(command.command_options['-o'], 'w') as outfile:
+                outfile.write('ions')
+
+        command = Gromacs_genion(
+            command_options={
+                '-s': self.input_coord,
+                '-p': topology,
+                '-o': os.path.join(experiment, 'out.gro')}
+        )
+
+        with mock.patch.object(
+                Gromacs_genion, 'run', autospec=True,
+                side_effect=add_ions) as mock_run:
+            # Build and run the same experiment folder twice
+            for _ in range(2):
+                write_topology()
+                self.stage_cache.run(command)
+            self.assertEqual(1, mock_run.call_count)
+
+        # Topologies modified in place are never shared with the cache
+        with open(topology, 'r') as infile:
+            self.assertEqual('topology ions', infile.read())
+        self.assertEqual(1, os.stat(topology).st_nlink)
+
+        write_topology()
+        self.assertTrue(self.stage_cache.run(command))
+        with open(topology, 'r') as infile:
+            self.assertEqual('topology ions', infile.read())
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from unittest import TestCase
 
 from traits.testing.api import UnittestTools
@@ -9,6 +10,9 @@ from force_gromacs.api import (
 )
 
 from surfactant_example.ingredient import Ingredient
+from surfactant_example.simulation.stage_cache import (
+    CachedStage, StageCache
+)
 from surfactant_example.simulation.surfactant_simulation_builder import (
     SurfactantSimulationBuilder
 )
@@ -686,3 +690,82 @@ class TestSurfactantSimulationBuilder(TestCase, UnittestTools):
              'trjconv_nojump', 'trjconv_whole'],
             list(names)
         )
+
+    def test_build_pipeline_stage_cache(self):
+
+        self.sim_builder.stage_cache = StageCache(directory='cache')
+        pipeline = self.sim_builder.build_pipeline()
+
+        self.assertEqual(16, len(pipeline))
+
+        # Only Gromacs commands are run through the stage cache
+        for name, command in pipeline.steps:
+            if name in ['file_tree', 'top_file']:
+                self.assertNotIsInstance(command, CachedStage)
+            else:
+                self.assertIsInstance(command, CachedStage)
+                self.assertIs(
+                    self.sim_builder.stage_cache, command.cache)
+
+    def test_build_pipeline_resume(self):
+
+        self.sim_builder.resume = True
+        self.sim_builder.resume_key = 'key'
+
+        # No checkpoint exists, so the full pipeline is run after
+        # recording the key of the production run
+        pipeline = self.sim_builder.build_pipeline()
+        self.assertEqual(17, len(pipeline))
+        names, commands = zip(*pipeline.steps)
+        index = names.index('checkpoint_key')
+        self.assertEqual('mdrun_production', names[index + 1])
+        self.assertEqual('key', commands[index].key)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.sim_builder.production_folder = tmp_dir
+            state_file = os.path.join(
+                tmp_dir, 'test_experiment_state.cpt')
+            with open(state_file, 'w'):
+                pass
+            key_file = os.path.join(tmp_dir, 'test_experiment_state.key')
+            with open(key_file, 'w') as outfile:
+                outfile.write('key')
+
+            pipeline = self.sim_builder.build_pipeline()
+
+        names, commands = zip(*pipeline.steps)
+        self.assertListEqual(
+            ['mdrun_production', 'g_select',
+             'trjconv_nojump', 'trjconv_whole'],
+            list(names)
+        )
+        self.assertEqual(state_file, commands[0].command_options['-cpi'])
+
+    def test_build_pipeline_resume_mismatch(self):
+
+        self.sim_builder.resume = True
+        self.sim_builder.resume_key = 'new key'
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.sim_builder.production_folder = tmp_dir
+            state_file = os.path.join(
+                tmp_dir, 'test_experiment_state.cpt')
+            with open(state_file, 'w'):
+                pass
+            key_file = os.path.join(tmp_dir, 'test_experiment_state.key')
+            with open(key_file, 'w') as outfile:
+                outfile.write('old key')
+
+            # A checkpoint left by a run with different settings is
+            # not resumed, but rebuilt from scratch
+            pipeline = self.sim_builder.build_pipeline()
+            self.assertEqual(17, len(pipeline))
+            names, commands = zip(*pipeline.steps)
+            production = commands[names.index('mdrun_production')]
+            self.assertNotIn('-cpi', production.command_options)
+
+            # The stale checkpoint is removed before the production run
+            commands[names.index('checkpoint_key')].run()
+            self.assertFalse(os.path.exists(state_file))
+            with open(key_file, 'r') as infile:
+                self.assertEqual('new key', infile.read())
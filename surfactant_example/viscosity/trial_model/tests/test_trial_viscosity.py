@@ -1,12 +1,14 @@
 from unittest import TestCase
 
+import numpy as np
+
 from force_bdss.api import DataValue
 
 from surfactant_example.tests.probe_classes.probe_formulations import (
     ProbeFormulation)
 
 from .. trial_viscosity_model import ViscosityModelParameters
-from .. trial_viscosity_data_source import SQRT2PI
+from .. trial_viscosity_data_source import SQRT2PI, trial_viscosity
 from .. trial_viscosity_factory import TrialViscosityFactory
 
 
@@ -91,6 +93,56 @@ class TestTrialViscosityDataSource(TestCase):
         self.assertAlmostEqual(
             3 / SQRT2PI, res[0].value)
 
+    def test_batch_viscosity(self):
+
+        model = self.factory.create_model(self.state)
+        concentrations = [[12, 4, 0.5, 83.5],
+                          [11, 4, 0.5, 84.5]]
+
+        viscosity = self.data_source.batch_viscosity(
+            model, self.formulation.ingredients, concentrations)
+
+        self.assertEqual((2,), viscosity.shape)
+        self.assertAlmostEqual(1 / SQRT2PI, viscosity[0])
+        self.assertAlmostEqual(
+            np.exp(-0.5) / SQRT2PI, viscosity[1])
+
+    def test_trial_viscosity(self):
+
+        means = [1, 2]
+        sigmas = [1, 1]
+
+        self.assertAlmostEqual(
+            2 / SQRT2PI, trial_viscosity([1, 2], means, sigmas, 'Sum'))
+        self.assertAlmostEqual(
+            1 / SQRT2PI ** 2,
+            trial_viscosity([1, 2], means, sigmas, 'Product'))
+
+        viscosity = trial_viscosity(
+            [[1, 2], [1, 2], [2, 2]], means, sigmas, 'Product')
+        self.assertEqual((3,), viscosity.shape)
+
+    def test_compile_parameters(self):
+
+        model = self.factory.create_model(self.state)
+        names = [ingredient.name
+                 for ingredient in self.formulation.ingredients]
+
+        columns, means, sigmas = model.compile_parameters(names)
+        self.assertListEqual([0], columns.tolist())
+        self.assertListEqual([12.0], means.tolist())
+        self.assertListEqual([1.0], sigmas.tolist())
+        self.assertIs(columns, model.compile_parameters(names)[0])
+
+        # Updating model parameters invalidates compiled values
+        model.ingredient_models[0].mean = 4.0
+        self.assertListEqual(
+            [4.0], model.compile_parameters(names)[1].tolist())
+
+        model.ingredient_models[0].name = 'Salt'
+        self.assertListEqual(
+            [2], model.compile_parameters(names)[0].tolist())
+
     def test_get_state(self):
 
         # Test serialisation of model object
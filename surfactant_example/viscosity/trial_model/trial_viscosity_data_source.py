@@ -12,6 +12,39 @@ def gaussian(x, mean, sigma):
     return np.exp(- 0.5 * ((mean - x) / sigma) ** 2) / (sigma * SQRT2PI)
 
 
+def trial_viscosity(concentrations, means, sigmas, calculation_mode):
+    """Calculates viscosity of one or more formulations from the
+    Gaussian contributions of each ingredient
+
+    Parameters
+    ----------
+    concentrations: array_like of float
+        Concentrations of each contributing ingredient. If 2D, each
+        row corresponds to a separate formulation
+    means: array_like of float
+        Mean of Gaussian model for each contributing ingredient
+    sigmas: array_like of float
+        Sigma of Gaussian model for each contributing ingredient
+    calculation_mode: str
+        Either 'Sum' or 'Product' of the viscosity contributions
+
+    Returns
+    -------
+    viscosity: float or numpy.array of float
+        Viscosity of each formulation
+    """
+
+    viscosities = gaussian(
+        np.asarray(concentrations),
+        np.asarray(means),
+        np.asarray(sigmas)
+    )
+
+    if calculation_mode == 'Sum':
+        return viscosities.sum(axis=-1)
+    return viscosities.prod(axis=-1)
+
+
 class TrialViscosityDataSource(BaseDataSource):
     """Calculates formulation viscosity from a simple toy model
     using Formulation ingredients"""
@@ -20,37 +53,29 @@ class TrialViscosityDataSource(BaseDataSource):
         """Calculates viscosity of formulation from contributions of
         ingredients present. The total viscosity is obtained by either
         the sum or product of each contribution"""
-        names = [ingredient.name for ingredient in formulation.ingredients]
-        means = []
-        sigmas = []
-        concentrations = []
-
-        for parameters in model.ingredient_models:
-            if parameters.name in names:
+        return self.batch_viscosity(
+            model, formulation.ingredients,
+            formulation.ingredient_concentrations)
 
-                sigmas.append(parameters.sigma)
-                means.append(parameters.mean)
-
-                index = names.index(parameters.name)
-                concentrations.append(formulation.concentrations[index])
-
-        # Generate viscosity contributions from simple Gaussian model
-        viscosities = gaussian(
-            np.asarray(concentrations),
-            np.asarray(means),
-            np.asarray(sigmas)
-        )
+    def batch_viscosity(self, model, ingredients, concentrations):
+        """Calculates viscosity of many formulations sharing the same
+        ingredients, from a matrix of concentrations where each row
+        corresponds to a separate formulation"""
+        names = [ingredient.name for ingredient in ingredients]
+        columns, means, sigmas = model.compile_parameters(names)
 
-        if model.calculation_mode == 'Sum':
-            return viscosities.sum()
-        return viscosities.prod()
+        return trial_viscosity(
+            np.asarray(concentrations)[..., columns],
+            means, sigmas, model.calculation_mode)
 
     def run(self, model, parameters):
 
         formulation = parameters[0].value
 
-        viscosity = self.formulation_viscosity(
-            model, formulation)
+        # Both Formulation and FormulationBatch objects are supported
+        viscosity = self.batch_viscosity(
+            model, formulation.ingredients,
+            formulation.concentrations)
 
         return [
             DataValue(type="VISCOSITY", value=viscosity)
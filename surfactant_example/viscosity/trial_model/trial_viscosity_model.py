@@ -1,5 +1,8 @@
+import numpy as np
+
 from traits.api import (
-    List, Unicode, Float, HasTraits, Enum, Int, Button)
+    List, Unicode, Float, HasTraits, Enum, Int, Button, Dict, Property,
+    Tuple, cached_property, on_trait_change)
 from traitsui.api import (
     View, Item, TableEditor, ObjectColumn, HGroup)
 
@@ -51,6 +54,15 @@ class TrialViscosityDataSourceModel(BaseDataSourceModel):
     # either as a Summation or a Product
     calculation_mode = Enum('Sum', 'Product')
 
+    # Names, means and sigmas of all ingredient_models, compiled into
+    # arrays for vectorised evaluation
+    parameter_arrays = Property(
+        Tuple, depends_on='ingredient_models.[name,mean,sigma]')
+
+    # Cache of compiled parameters for each sequence of Formulation
+    # ingredient names
+    _compiled_parameters = Dict(transient=True)
+
     # UI selected ViscosityModelParameters objects, used as a
     # reference for editing / deleting items from the UI table
     selected_table_index = Int(transient=True)
@@ -102,6 +114,69 @@ class TrialViscosityDataSourceModel(BaseDataSourceModel):
                 for kwargs in ingredient_models
             ]
 
+    @cached_property
+    def _get_parameter_arrays(self):
+        return (
+            [parameters.name for parameters in self.ingredient_models],
+            np.array([parameters.mean
+                      for parameters in self.ingredient_models]),
+            np.array([parameters.sigma
+                      for parameters in self.ingredient_models])
+        )
+
+    def compile_parameters(self, names):
+        """Returns the model parameters that apply to a Formulation
+        containing Ingredients with the given names. Results are
+        cached, so that each sequence of names is only looked up once.
+
+        Parameters
+        ----------
+        names: sequence of str
+            Names of each Ingredient in a Formulation
+
+        Returns
+        -------
+        columns: numpy.array of int
+            Index of the Ingredient concentration corresponding to each
+            contributing ViscosityModelParameters
+        means: numpy.array of float
+            Mean of each contributing ViscosityModelParameters
+        sigmas: numpy.array of float
+            Sigma of each contributing ViscosityModelParameters
+        """
+        model_names, means, sigmas = self.parameter_arrays
+        names = tuple(names)
+
+        try:
+            return self._compiled_parameters[names]
+        except KeyError:
+            pass
+
+        # Index of first Ingredient with each name
+        lookup = {}
+        for index, name in enumerate(names):
+            lookup.setdefault(name, index)
+
+        indices = [
+            index for index, name in enumerate(model_names)
+            if name in lookup
+        ]
+        compiled = (
+            np.array([lookup[model_names[index]] for index in indices],
+                     dtype=int),
+            means[indices],
+            sigmas[indices]
+        )
+        self._compiled_parameters[names] = compiled
+
+        return compiled
+
+    @on_trait_change('ingredient_models.[name,mean,sigma]')
+    def _reset_compiled_parameters(self):
+        """Clear all compiled parameters when ingredient_models
+        change"""
+        self._compiled_parameters = {}
+
     def _selected_table_index_default(self):
         """Selects last element in ingredient_models list"""
         return len(self.ingredient_models) - 1